@@ -1,5 +1,5 @@
 from autogen_agentchat.agents import AssistantAgent
-from config.settings import google_cfg, app_cfg
+from utils.validation import ItineraryPlan
 
 
 SYSTEM_MSG = """
@@ -31,6 +31,7 @@ Example:
 ## CONSTRAINTS:
 - Respect budget level; minimize transit friction; cluster POIs geographically in Iranian cities.
 - You MUST find the user's original requested travel date in the conversation history and use that exact date as the start of the itinerary. Do not alter or estimate it.
+- If a PARSED TRIP REQUEST message is present, its start_date is the user's requested date already converted to Gregorian: use it verbatim for the first day (and end_date / duration_days for the trip length). Do not convert Jalali dates yourself.
 - Consider opening hours, prayer times where relevant, domestic transport (flight/train/bus/metro/taxi apps), and seasonal variations.
 - Add buffer time; avoid backtracking; ensure activities are culturally appropriate.
 
@@ -44,30 +45,29 @@ Example:
 """
 
 
-async def build_planner(model_client) -> AssistantAgent:
+async def build_planner(model_client, name: str = "planner") -> AssistantAgent:
     """
     Create and configure the Iran-focused planner agent.
 
-    The agent converts the request + research notes into a day-by-day itinerary,
-    enforcing strict JSON with TOMAN budgeting via response_format and default kwargs.
+    The agent converts the request + research notes into a day-by-day itinerary.
+    Its output is generated under the ItineraryPlan JSON schema (structured
+    output), so it arrives as a parsed StructuredMessage.
 
     Args:
-        model_client: OpenAI-compatible Gemini client used for chat completions.
+        model_client: Client of the planner's model route; temperature, max_tokens and
+            reasoning effort are set on the client (see AgentModelConfig).
+        name: Agent name; extra planners for chunks of long trips are named "planner_<n>".
 
     Returns:
-        AssistantAgent: Configured "planner" agent with JSON output and reasoning effort presets.
+        AssistantAgent: Configured planner agent with structured output.
     """
     agent = AssistantAgent(
-        name="planner",
+        name=name,
         model_client=model_client,
         description="Plans geographically-efficient itineraries in Iran with TOMAN budgeting.",
         system_message=SYSTEM_MSG,
+        output_content_type=ItineraryPlan,
+        # Streamed so the pipeline can validate items while they are generated.
+        model_client_stream=True,
     )
-
-    agent.extra_create_kwargs = {
-      "response_format": {"type": "json_object"},
-      "extra_body": {"reasoning": {"effort": google_cfg.REASONING_EFFORT}},
-      "temperature": app_cfg.TEMPERATURE
-}
-
     return agent
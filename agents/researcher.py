@@ -1,16 +1,21 @@
 # agents/researcher.py (Final Corrected Version)
 
+from typing import Dict
+
 from autogen_agentchat.agents import AssistantAgent
-from config.settings import google_cfg, app_cfg
-from tools.web_search import web_search
+from models.structured import ToolCompatibleStructuredClient
+from tools.web_search import web_search, web_search_many
+from utils.validation import ResearchReport
 
 SYSTEM_MSG = """
 You are a world-class travel research agent for Iran. Your workflow is to first use tools to gather live facts, and then synthesize the results into a single, final JSON report.
 
 **1. Tool Use:**
-- First, use the `web_search` tool to find up-to-date information.
-- The tool returns a dictionary: `web_search(query: str) -> { ok: bool, answer: str, sources: [{name,url}] }`
-- You can use the tool multiple times if needed.
+- First, gather up-to-date information. Prefer ONE call to `web_search_many` with all your queries at once
+  (transport, weather, attractions, costs, risks, visa rules, ...); they run in parallel.
+- `web_search_many(queries: list[str]) -> { ok: bool, results: [{query, ok, answer}], sources: [{name,url}] }`
+- `web_search(query: str) -> { ok: bool, answer: str, sources: [{name,url}] }` is also available for a single query.
+- If a PARSED TRIP REQUEST message is present, use its destination and Gregorian dates for seasonal and event queries.
 
 **2. Final Output:**
 - After you have gathered all necessary information, your FINAL response MUST be a single JSON object.
@@ -31,26 +36,67 @@ You are a world-class travel research agent for Iran. Your workflow is to first
 }
 """
 
-async def build_researcher(model_client) -> AssistantAgent:
+# Topic shards for parallel research: id → what that sub-agent covers
+RESEARCH_TOPICS: Dict[str, str] = {
+    "transport": "getting there and getting around: intercity buses, trains and flights, local transport, travel times",
+    "weather": "weather and season for the travel dates, local events and holidays, what to pack",
+    "attractions": "attractions and day trips, opening hours, ticket prices, local food",
+    "costs": "accommodation and meal costs in Toman, risks and common scams, visa and entry rules",
+}
+
+TOPIC_FOCUS = """
+**3. Your Topic:**
+- You are one of several researchers working in parallel; the others cover the remaining topics.
+- Research ONLY this topic: {focus}.
+- Use ONE `web_search_many` call with at most 3 queries.
+- Keep `risks` and `verification` to your topic (empty lists are fine).
+"""
+
+async def build_researcher(model_client, tools=None) -> AssistantAgent:
     """
     Builds and configures the Research Agent, equipping it with a web search tool
     and instructing it to reflect on the tool's output to generate a final JSON report.
+
+    The final (reflection) call is constrained to the ResearchReport JSON schema;
+    the tool-calling calls before it run without the schema, which Gemini can't
+    combine with tools.
+
+    `tools` overrides the default search tools (e.g. offline fakes for benchmarks).
     """
-    agent = AssistantAgent(
+    return _researcher_agent(
+        model_client,
         name="researcher",
-        model_client=model_client,
         description="Uses web search to find up-to-date travel info for Iran and returns a structured JSON report.",
         system_message=SYSTEM_MSG,
-        tools=[web_search],
-        # CRITICAL: Must be True for the agent to process tool results and then generate a final answer.
-        reflect_on_tool_use=True, 
+        tools=tools,
     )
 
-    # CRITICAL: We remove 'response_format' to allow the agent to freely choose
-    # between outputting a tool call or a final JSON response.
-    agent.extra_create_kwargs = {
-        "extra_body": {"reasoning": {"effort": google_cfg.REASONING_EFFORT}},
-        "temperature": min(app_cfg.TEMPERATURE, 0.35)
-    }
 
-    return agent
\ No newline at end of file
+async def build_topic_researcher(model_client, topic: str, tools=None) -> AssistantAgent:
+    """
+    Builds a lightweight researcher limited to one of RESEARCH_TOPICS, named
+    `researcher_<topic>`. Several of them run concurrently in the pipeline's
+    research stage and their reports are merged into one ResearchReport.
+    """
+    return _researcher_agent(
+        model_client,
+        name=f"researcher_{topic}",
+        description=f"Researches {topic} for the trip and returns a structured JSON report.",
+        system_message=SYSTEM_MSG + TOPIC_FOCUS.format(focus=RESEARCH_TOPICS[topic]),
+        tools=tools,
+    )
+
+
+def _researcher_agent(model_client, name: str, description: str, system_message: str, tools) -> AssistantAgent:
+    return AssistantAgent(
+        name=name,
+        model_client=ToolCompatibleStructuredClient(model_client),
+        description=description,
+        system_message=system_message,
+        tools=tools if tools is not None else [web_search_many, web_search],
+        # CRITICAL: Must be True for the agent to process tool results and then generate a final answer.
+        reflect_on_tool_use=True,
+        output_content_type=ResearchReport,
+        # Streamed so the pipeline can validate items while they are generated.
+        model_client_stream=True,
+    )
\ No newline at end of file
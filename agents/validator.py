@@ -1,20 +1,41 @@
 # agents/validator.py
 
-import re
-import json
-from typing import Sequence, Optional, Type
+import logging
+from typing import Sequence, Optional, Tuple, Type
+from pydantic import BaseModel
 from autogen_agentchat.agents import BaseChatAgent
-from autogen_agentchat.messages import TextMessage, BaseChatMessage
+from autogen_agentchat.messages import TextMessage, BaseChatMessage, StructuredMessage
 from autogen_agentchat.base import Response
 from autogen_core import CancellationToken
 
 from utils.validation import ResearchReport, ItineraryPlan
-from utils.validation_utils import validate_json_with_model
+from utils import telemetry
+from utils.json_repair import reconcile_plan_total
+from utils.validation_utils import StreamingValidator, parse_json_with_model, extract_json
+
+logger = logging.getLogger(__name__)
+
+# Which schema each producing agent's output must satisfy
+SCHEMAS = {
+    "researcher": ResearchReport,
+    "planner": ItineraryPlan,
+}
+
+
+def schema_for(source: Optional[str]) -> Optional[Type[BaseModel]]:
+    """
+    The schema `source`'s output must satisfy; topic sub-agents ("researcher_transport") share their base agent's.
+    """
+    name = (source or "").lower()
+    return SCHEMAS.get(name) or SCHEMAS.get(name.split("_", 1)[0])
 
 class ValidatorAgent(BaseChatAgent):
     """
     A robust, code-based validator for JSON messages (AutoGen v0.4+).
-    It intelligently extracts JSON from markdown blocks before validation.
+    It intelligently extracts JSON from markdown blocks before validation,
+    repairs mechanical mistakes locally (digits, number formats, trailing
+    commas, plan totals) and only rejects output it cannot fix, naming just
+    the failing fields.
     """
 
     async def on_messages(
@@ -23,36 +44,59 @@ class ValidatorAgent(BaseChatAgent):
         cancellation_token: CancellationToken,
     ) -> Response:
         last_message = messages[-1] if messages else None
+        verdict, _ = self.check(last_message)
+        return Response(chat_message=verdict)
 
-        if not isinstance(last_message, TextMessage):
-            reply_content = "VALIDATION_SKIPPED: Last message was not text."
-            return Response(chat_message=TextMessage(content=reply_content, source=self.name))
+    def check(self, message: Optional[BaseChatMessage]) -> Tuple[TextMessage, Optional[BaseModel]]:
+        """
+        Validates one agent message against the schema registered for its sender.
 
-        # --- INTELLIGENT JSON EXTRACTION ---
-        # This new block makes the agent much more robust.
-        content_to_validate = last_message.content.strip()
-        # Find JSON within markdown code blocks (e.g., ```json ... ```)
-        match = re.search(r"```(json)?\s*({.*})", content_to_validate, re.DOTALL)
-        if match:
-            # If found, extract the pure JSON part.
-            content_to_validate = match.group(2)
-        # ------------------------------------
+        Args:
+            message: The message to validate (typically the researcher's or planner's output).
+
+        Returns:
+            (verdict, artifact): the validator's reply message and the parsed,
+            validated model instance (None unless validation succeeded).
+        """
+        sender_name = getattr(message, "source", None)
+        model_to_use = schema_for(sender_name)
+
+        # Structured output was already parsed against the schema by the agent; only the
+        # consistency repairs a schema can't express (plan totals) are left to apply.
+        if isinstance(message, StructuredMessage) and model_to_use and isinstance(message.content, model_to_use):
+            artifact, fixes = reconcile_plan_total(message.content)
+            outcome = "repaired" if fixes else "structured"
+            telemetry.current().count("travel_validations_total", schema=model_to_use.__name__, outcome=outcome)
+            reply_content = f"VALIDATION_SUCCESS: Structured output conforms to the {model_to_use.__name__} schema."
+            if fixes:
+                logger.info(f"Repaired structured {model_to_use.__name__} locally: {'; '.join(fixes)}")
+                reply_content = (
+                    f"VALIDATION_SUCCESS: Structured output conforms to the {model_to_use.__name__} schema "
+                    f"after {len(fixes)} local fix(es)."
+                )
+            return TextMessage(content=reply_content, source=self.name), artifact
 
-        sender_name = getattr(last_message, "source", None)
-        sender_name_lc = (sender_name or "").lower()
+        if not isinstance(message, TextMessage):
+            reply_content = "VALIDATION_SKIPPED: Last message was not text."
+            return TextMessage(content=reply_content, source=self.name), None
 
-        model_to_use: Optional[Type] = None
-        if sender_name_lc == "researcher":
-            model_to_use = ResearchReport
-        elif sender_name_lc == "planner":
-            model_to_use = ItineraryPlan
+        # Find JSON within markdown code blocks (e.g., ```json ... ```)
+        content_to_validate = extract_json(message.content)
 
+        artifact = None
         if model_to_use:
-            validation_result = validate_json_with_model(content_to_validate, model_to_use)
+            artifact, validation_result = parse_json_with_model(content_to_validate, model_to_use)
         else:
             validation_result = f"VALIDATION_SKIPPED: No validation rule for sender '{sender_name}'."
 
-        return Response(chat_message=TextMessage(content=validation_result, source=self.name))
+        return TextMessage(content=validation_result, source=self.name), artifact
+
+    def stream_validator(self, source: str) -> Optional[StreamingValidator]:
+        """
+        An incremental validator for `source`'s streamed output (None if it has no schema).
+        """
+        model = schema_for(source)
+        return StreamingValidator(model) if model else None
 
     async def on_reset(self, cancellation_token: CancellationToken) -> None:
         return None
@@ -1,5 +1,4 @@
 from autogen_agentchat.agents import AssistantAgent
-from config.settings import app_cfg
 
 SYSTEM_MSG = """
 You are a Persian travel writer. 
@@ -11,15 +10,16 @@ Write a concise, friendly Farsi brief for the user:
 - IMPORTANT: When your final report is complete and you are finished, add 'پایان' to the end of your message.
 """
 
-async def build_writer(model_client) -> AssistantAgent:
+async def build_writer(model_client, name: str = "writer") -> AssistantAgent:
+    """
+    `name` distinguishes the extra writers that write long briefs per chunk ("writer_<n>").
+    """
     agent = AssistantAgent(
-        name="writer",
+        name=name,
         model_client=model_client,
         description="Turns structured JSON into a friendly Persian brief.",
         system_message=SYSTEM_MSG,
+        # Stream tokens so callers can show the brief while it is being written.
+        model_client_stream=True,
     )
-    agent.extra_create_kwargs = {
-        "temperature": max(0.5, app_cfg.TEMPERATURE),
-        "max_tokens": 4096
-    }
     return agent
@@ -0,0 +1,185 @@
+"""
+Batch trip-planning runner.
+
+Reads trip requests from a JSONL file (or stdin with "-"), one object per line:
+
+    {"id": "trip-1", "prompt": "یک برنامه سفر به همدان بهم بده؛ ..."}
+
+Each request gets its own isolated team from `build_travel_team`; up to
+`--concurrency` teams run at once under a single asyncio loop. Results are
+appended to the output JSONL as soon as each request finishes, and throughput,
+p50/p95 latency and failure counts are printed at the end.
+
+Every run is checkpointed under its request id after each validated stage.
+With --resume, requests already answered successfully in the output file are
+skipped and the others restart at their first incomplete stage, so rerunning
+a crashed or partially failed batch only repeats the missing work.
+
+Usage:
+    python batch.py requests.jsonl -o results.jsonl -c 8
+    python batch.py requests.jsonl -o results.jsonl --resume
+    cat requests.jsonl | python batch.py - -o results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Set, TextIO
+
+from autogen_agentchat.messages import TextMessage
+from models.GoogleModel import close_model_clients
+from teams.travel_team import build_travel_team, extract_outputs
+from tools.web_search import close_search_pool
+from utils.telemetry import percentile
+
+
+logging.basicConfig(level=logging.WARNING)
+
+
+def read_requests(stream: TextIO) -> List[Dict[str, Any]]:
+    """
+    Parse JSONL trip requests; lines without a usable prompt are reported and skipped.
+    """
+    requests = []
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"[WARN] Skipping line {line_no}: invalid JSON ({e})", file=sys.stderr)
+            continue
+        prompt = item.get("prompt") if isinstance(item, dict) else None
+        if not prompt:
+            print(f"[WARN] Skipping line {line_no}: missing 'prompt'", file=sys.stderr)
+            continue
+        requests.append({"id": str(item.get("id", line_no)), "prompt": prompt})
+    return requests
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids of requests that already have a successful record in an output JSONL file.
+    """
+    done: Set[str] = set()
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and record.get("ok"):
+                    done.add(str(record.get("id")))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+async def plan_one(request: Dict[str, Any], resume: bool = False) -> Dict[str, Any]:
+    """
+    Run one request on a freshly built team and return its output record.
+    The request id is the run id, so stage checkpoints survive a crash.
+    """
+    started = time.perf_counter()
+    record: Dict[str, Any] = {"id": request["id"], "ok": False}
+    try:
+        team = await build_travel_team()
+        result = await team.run(
+            task=TextMessage(content=request["prompt"], source="user"), run_id=request["id"], resume=resume
+        )
+        brief, plan = extract_outputs(result.messages)
+        record.update(
+            ok=brief is not None and plan is not None,
+            brief=brief,
+            plan=plan.model_dump() if plan else None,
+            stop_reason=result.stop_reason,
+        )
+        if not record["ok"]:
+            record["error"] = "Run finished without a validated plan and brief."
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def run_batch(
+    requests: List[Dict[str, Any]], out: TextIO, concurrency: int, resume: bool = False
+) -> Dict[str, Any]:
+    """
+    Plan all requests with at most `concurrency` teams in flight, streaming records to `out`.
+
+    Returns:
+        Summary statistics for the batch.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    latencies: List[float] = []
+    failures = 0
+
+    async def worker(request: Dict[str, Any]) -> None:
+        nonlocal failures
+        async with slots:
+            record = await plan_one(request, resume=resume)
+        async with write_lock:
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            latencies.append(record["latency_s"])
+            if not record["ok"]:
+                failures += 1
+            print(f"{'✅' if record['ok'] else '❌'} {record['id']} ({record['latency_s']}s)", file=sys.stderr)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(r) for r in requests))
+    wall = time.perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "succeeded": len(requests) - failures,
+        "failed": failures,
+        "wall_s": round(wall, 3),
+        "throughput_per_min": round(len(requests) / wall * 60, 2) if wall else 0.0,
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p95_s": percentile(latencies, 95),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Plan many trips concurrently from a JSONL file.")
+    parser.add_argument("input", help="JSONL file with {id, prompt} objects, or '-' for stdin")
+    parser.add_argument("-o", "--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Maximum teams running at once")
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="Skip requests already answered in the output file; resume the rest from their checkpoints",
+    )
+    args = parser.parse_args()
+
+    if args.input == "-":
+        requests = read_requests(sys.stdin)
+    else:
+        with open(args.input, "r", encoding="utf-8") as f:
+            requests = read_requests(f)
+
+    if args.resume and args.output != "-":
+        done = completed_ids(args.output)
+        requests = [r for r in requests if r["id"] not in done]
+        print(f"Resuming: {len(done)} request(s) already done, {len(requests)} to run.", file=sys.stderr)
+
+    out = sys.stdout if args.output == "-" else open(args.output, "a", encoding="utf-8")
+    try:
+        summary = await run_batch(requests, out, max(1, args.concurrency), resume=args.resume)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        await close_search_pool()
+        await close_model_clients()
+
+    print("📊 Batch summary:", json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,250 @@
+"""
+Offline stand-ins for Gemini and Tavily used by the benchmark harness.
+
+`FakeChatCompletionClient` recognizes which agent is calling from its system
+prompt and returns canned researcher / planner / writer output with
+configurable latency and failure injection, so the orchestration layer can be
+measured without network access or API keys. Chunk planners (long trips) get
+a plan with the day range their trip skeleton asks for.
+"""
+import asyncio
+import json
+import random
+import re
+from datetime import date, timedelta
+from typing import Any, AsyncGenerator, Dict, List, Literal, Mapping, Optional, Sequence, Union
+
+from pydantic import BaseModel
+from autogen_core import CancellationToken, FunctionCall
+from autogen_core.models import (
+    AssistantMessage,
+    ChatCompletionClient,
+    CreateResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore
+    ModelInfo,
+    RequestUsage,
+    SystemMessage,
+)
+from autogen_core.tools import Tool, ToolSchema
+
+from utils.context import estimate_tokens
+
+FAKE_MODEL_INFO = ModelInfo(
+    vision=False,
+    json_output=True,
+    structured_output=True,
+    function_calling=True,
+    family="gemini",
+)
+
+RESEARCH_REPORT: Dict[str, Any] = {
+    "currency": "TOMAN",
+    "findings": [
+        {
+            "topic": topic,
+            "bullets": [f"{topic} fact {i}" for i in range(3)],
+            "sources": [{"name": "Example", "url": f"https://example.com/{topic.lower()}"}],
+            "confidence": conf,
+        }
+        for topic, conf in [("Transport", 0.8), ("Weather", 0.7), ("Attractions", 0.9), ("Costs", 0.6)]
+    ],
+    "risks": ["Hot afternoons in late summer"],
+    "verification": ["Check opening hours before visiting"],
+}
+
+ITINERARY_PLAN: Dict[str, Any] = {
+    "currency": "TOMAN",
+    "overview": "سفر سه روزه به همدان",
+    "days": [
+        {
+            "date": f"2025-09-0{d + 2}",
+            "summary": f"Day {d + 1}",
+            "morning": ["Ganjnameh"],
+            "afternoon": ["Ali Sadr Cave"],
+            "evening": ["Bu-Ali Sina Mausoleum"],
+            "est_cost_toman": 1_500_000,
+        }
+        for d in range(3)
+    ],
+    "total_est_cost_toman": 4_500_000,
+}
+
+# The day range a chunk planner is asked for (utils.plan_chunks.skeleton_prompt)
+_CHUNK_REQUEST = re.compile(r"exactly (\d+) days, dated (\d{4}-\d{2}-\d{2})")
+
+
+def chunk_plan(days: int, start: str) -> Dict[str, Any]:
+    """ITINERARY_PLAN's days repeated over `days` days from `start`."""
+    first = date.fromisoformat(start)
+    plan_days = [
+        dict(ITINERARY_PLAN["days"][d % 3], date=(first + timedelta(days=d)).isoformat(), summary=f"Day {d + 1}")
+        for d in range(days)
+    ]
+    return dict(ITINERARY_PLAN, days=plan_days, total_est_cost_toman=sum(d["est_cost_toman"] for d in plan_days))
+
+
+WRITER_BRIEF = "«روز ۱» بازدید از گنجنامه و غار علیصدر. «بودجه تقریبی» ۴٬۵۰۰٬۰۰۰ تومان. پایان"
+
+
+class FakeChatCompletionClient(ChatCompletionClient):
+    """
+    Scripted chat completion client.
+
+    Args:
+        latency: Seconds to sleep per call (simulated model time).
+        invalid_rate: Probability that a researcher/planner reply is malformed JSON
+            (exercises the validation correction loop).
+        error_rate: Probability that a call raises (simulated API failure).
+        seed: Seed for the failure injection RNG.
+        straggler_rate: Probability that a call takes `straggler_latency` seconds instead of `latency`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        invalid_rate: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        straggler_rate: float = 0.0,
+        straggler_latency: float = 0.0,
+    ):
+        self.latency = latency
+        self.straggler_rate = straggler_rate
+        self.straggler_latency = straggler_latency
+        self.invalid_rate = invalid_rate
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self.calls = 0
+
+    @staticmethod
+    def _agent_for(messages: Sequence[LLMMessage]) -> str:
+        system = next((m.content for m in messages if isinstance(m, SystemMessage)), "")
+        if "travel research agent" in system:
+            return "researcher"
+        if "travel planner agent" in system:
+            return "planner"
+        return "writer"
+
+    def _reply(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema]) -> Union[str, List[FunctionCall]]:
+        agent = self._agent_for(messages)
+        if agent == "researcher":
+            searched = any(isinstance(m, FunctionExecutionResultMessage) for m in messages)
+            if tools and not searched:
+                name = tools[0].name if isinstance(tools[0], Tool) else tools[0]["name"]
+                args = {"queries": ["Hamedan weather", "Hamedan bus", "Hamedan attractions"]}
+                if name != "web_search_many":
+                    args = {"query": "Hamedan travel"}
+                return [FunctionCall(id=f"call_{self.calls}", name=name, arguments=json.dumps(args))]
+            payload = json.dumps(RESEARCH_REPORT, ensure_ascii=False)
+        elif agent == "planner":
+            chunk = next((_CHUNK_REQUEST.search(m.content) for m in reversed(messages)
+                          if isinstance(m.content, str) and _CHUNK_REQUEST.search(m.content)), None)
+            plan = chunk_plan(int(chunk.group(1)), chunk.group(2)) if chunk else ITINERARY_PLAN
+            payload = json.dumps(plan, ensure_ascii=False)
+        else:
+            return WRITER_BRIEF
+        if self._rng.random() < self.invalid_rate:
+            return payload[: len(payload) // 2]
+        return payload
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        self.calls += 1
+        latency = self.latency
+        if self.straggler_rate and self._rng.random() < self.straggler_rate:
+            latency = self.straggler_latency
+        if latency:
+            # Cancellable like a real request: the pipeline's deadline cancels the token.
+            sleep = asyncio.ensure_future(asyncio.sleep(latency))
+            if cancellation_token is not None:
+                cancellation_token.link_future(sleep)
+            await sleep
+        if self._rng.random() < self.error_rate:
+            raise RuntimeError("Injected model failure")
+        content = self._reply(messages, tools)
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(content if isinstance(content, str) else str(content))
+        usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self._usage = RequestUsage(
+            prompt_tokens=self._usage.prompt_tokens + prompt_tokens,
+            completion_tokens=self._usage.completion_tokens + completion_tokens,
+        )
+        return CreateResult(
+            finish_reason="function_calls" if isinstance(content, list) else "stop",
+            content=content,
+            usage=usage,
+            cached=False,
+        )
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        result = await self.create(messages, tools=tools, json_output=json_output, cancellation_token=cancellation_token)
+        if isinstance(result.content, str):
+            for i in range(0, len(result.content), 16):
+                yield result.content[i : i + 16]
+        yield result
+
+    async def close(self) -> None:
+        return None
+
+    def actual_usage(self) -> RequestUsage:
+        return self._usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return sum(estimate_tokens(str(m.content)) for m in messages)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 1_000_000 - self.count_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return {"vision": False, "function_calling": True, "json_output": True}  # type: ignore
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return FAKE_MODEL_INFO
+
+
+def make_fake_search_tools(latency: float = 0.0):
+    """
+    Offline replacements for `web_search_many` / `web_search` with the same signatures.
+    """
+
+    async def web_search(query: str) -> Dict[str, Any]:
+        """Offline fake of the Tavily web search tool."""
+        if latency:
+            await asyncio.sleep(latency)
+        return {"ok": True, "answer": f"Fake answer for {query}", "sources": [{"name": "Example", "url": "https://example.com"}]}
+
+    async def web_search_many(queries: List[str]) -> Dict[str, Any]:
+        """Offline fake of the batched web search tool."""
+        results = await asyncio.gather(*(web_search(q) for q in queries))
+        return {
+            "ok": True,
+            "results": [{"query": q, "ok": True, "answer": r["answer"]} for q, r in zip(queries, results)],
+            "sources": [{"name": "Example", "url": "https://example.com"}],
+        }
+
+    return [web_search_many, web_search]
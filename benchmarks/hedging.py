@@ -0,0 +1,87 @@
+"""
+Tail-latency benchmark of hedged model requests.
+
+Sends the same sequence of calls to the offline fake client twice, once
+directly and once through `HedgedChatCompletionClient`, with a small share
+of straggler calls (e.g. 3% of calls taking 20x the usual latency), and
+reports p50 / p99 latency, the hedge rate and how often the hedge won.
+
+Usage:
+    python -m benchmarks.hedging --calls 400 --straggler-rate 0.03
+    python -m benchmarks.hedging --json hedging.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from autogen_core.models import SystemMessage, UserMessage
+
+from benchmarks.fakes import FakeChatCompletionClient
+from models.hedging import HedgedChatCompletionClient
+from utils.telemetry import percentile
+
+MESSAGES = [SystemMessage(content="You are a travel planner agent."), UserMessage(content="trip", source="user")]
+
+
+async def run_calls(client, calls: int, concurrency: int) -> List[float]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one() -> float:
+        async with slots:
+            started = time.perf_counter()
+            await client.create(MESSAGES)
+            return time.perf_counter() - started
+
+    return await asyncio.gather(*(one() for _ in range(calls)))
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, Any]:
+    def fake() -> FakeChatCompletionClient:
+        return FakeChatCompletionClient(
+            latency=args.latency, seed=args.seed,
+            straggler_rate=args.straggler_rate, straggler_latency=args.latency * args.straggler_factor,
+        )
+
+    plain = await run_calls(fake(), args.calls, args.concurrency)
+    hedged_client = HedgedChatCompletionClient(
+        fake(), pct=args.pct, min_delay=args.latency, min_samples=args.min_samples, max_ratio=args.max_ratio
+    )
+    hedged = await run_calls(hedged_client, args.calls, args.concurrency)
+    stats = hedged_client.stats()
+    p99_plain, p99_hedged = percentile(plain, 99), percentile(hedged, 99)
+    return {
+        "calls": args.calls,
+        "straggler_rate": args.straggler_rate,
+        "p50_ms": {"plain": round(percentile(plain, 50) * 1000, 1), "hedged": round(percentile(hedged, 50) * 1000, 1)},
+        "p99_ms": {"plain": round(p99_plain * 1000, 1), "hedged": round(p99_hedged * 1000, 1)},
+        "p99_improvement": round(1 - p99_hedged / p99_plain, 3) if p99_plain else 0.0,
+        "hedge_rate": round(stats["hedge_rate"], 3),
+        "hedge_wins": stats["hedge_wins"],
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="p99 latency with and without request hedging (offline).")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02, help="Usual seconds per call")
+    parser.add_argument("--straggler-rate", type=float, default=0.03, help="Share of calls that straggle")
+    parser.add_argument("--straggler-factor", type=float, default=20, help="Straggler latency / usual latency")
+    parser.add_argument("--pct", type=float, default=95, help="Hedge after this latency percentile")
+    parser.add_argument("--min-samples", type=int, default=20)
+    parser.add_argument("--max-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    summary = await bench(args)
+    print(json.dumps(summary, ensure_ascii=False))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
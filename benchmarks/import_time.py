@@ -0,0 +1,82 @@
+"""
+Cold-start benchmark: how long the entry points take to import.
+
+Each target is imported in a fresh interpreter (no GOOGLE_API_KEY, so nothing
+can reach the network) and timed from inside the child, excluding interpreter
+startup. Also lists which heavy modules the import pulled in and which config
+objects it read; the CLI, the service and the test suite should not load the
+OpenAI SDK or Tavily, or read the environment, until they actually need to.
+
+Usage:
+    python -m benchmarks.import_time --repeat 5
+    python -m benchmarks.import_time --json import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+TARGETS = ["config.settings", "models.GoogleModel", "teams.travel_team", "main", "service", "batch"]
+HEAVY_MODULES = ["openai", "autogen_ext.models.openai", "tavily", "httpx"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+settings = sys.modules.get("config.settings")
+configs = [f for f in ("get_app_config", "get_google_config", "get_tavily_config")
+           if settings and getattr(settings, f).cache_info().currsize]
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules], "configs_read": configs}}))
+"""
+
+
+def measure(target: str) -> Dict[str, Any]:
+    """
+    Import `target` once in a clean interpreter and return {"seconds", "loaded", "configs_read"}.
+    """
+    env = {k: v for k, v in os.environ.items() if k != "GOOGLE_API_KEY"}
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(target=target, heavy=HEAVY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench(targets: List[str], repeat: int) -> List[Dict[str, Any]]:
+    results = []
+    for target in targets:
+        samples = [measure(target) for _ in range(repeat)]
+        seconds = [s["seconds"] for s in samples]
+        results.append({
+            "target": target,
+            "median_ms": round(statistics.median(seconds) * 1000, 1),
+            "min_ms": round(min(seconds) * 1000, 1),
+            "loaded": samples[-1]["loaded"],
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cold import time of the application entry points.")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument("--targets", default=",".join(TARGETS), help="Comma-separated modules to import")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    results = bench([t for t in args.targets.split(",") if t], args.repeat)
+    print(f"{'module':<22}{'median ms':>10}{'min ms':>9}  heavy modules loaded")
+    for r in results:
+        print(f"{r['target']:<22}{r['median_ms']:>10}{r['min_ms']:>9}  {', '.join(r['loaded']) or '-'}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Offline end-to-end benchmark of the orchestration layer.
+
+Drives `build_travel_team` with the scripted fake model client and fake search
+tools from `benchmarks/fakes.py`, so every number below is orchestration
+overhead plus the configured simulated latency — no network, no API keys.
+
+Reported per concurrency level:
+    runs/sec, p50/p95 run latency, failures, average pipeline turns,
+    average per-stage wall time (research / planning / writing),
+    average validator time, and the process memory high-water mark.
+
+Usage:
+    python -m benchmarks.run_bench --runs 50 --concurrency 1,4,16 --latency 0.05
+    python -m benchmarks.run_bench --invalid-rate 0.2 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import resource
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseChatMessage
+
+from benchmarks.fakes import FakeChatCompletionClient, make_fake_search_tools
+from teams.pipeline import StageEvent
+from teams.travel_team import build_travel_team, extract_outputs
+from utils.telemetry import percentile
+
+TASK = "یک برنامه سفر به همدان بهم بده؛ من در تاریخ 11 شهریور 1404 می‌رم همدان"
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def bench_one(args: argparse.Namespace, seed: int) -> Dict[str, Any]:
+    """
+    Run one request through a fresh team and collect timing metrics from its stream.
+    """
+    client = FakeChatCompletionClient(
+        latency=args.latency, invalid_rate=args.invalid_rate, error_rate=args.error_rate, seed=seed
+    )
+    team = await build_travel_team(client, search_tools=make_fake_search_tools(args.search_latency))
+
+    stage_time: Dict[str, float] = defaultdict(float)
+    stage_started: Dict[str, float] = {}
+    validator_time = 0.0
+    turns = 0
+    last_output_at = None
+    started = time.perf_counter()
+    result = None
+    try:
+        async for item in team.run_stream(task=TASK):
+            now = time.perf_counter()
+            if isinstance(item, TaskResult):
+                result = item
+            elif isinstance(item, StageEvent):
+                if item.status == "started":
+                    stage_started[item.stage] = now
+                elif item.status in ("validated", "completed"):
+                    stage_time[item.stage] += now - stage_started.pop(item.stage, now)
+            elif isinstance(item, BaseChatMessage) and item.source != "user":
+                turns += 1
+                if item.source == "validator" and last_output_at is not None:
+                    validator_time += now - last_output_at
+                last_output_at = now
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "latency": time.perf_counter() - started}
+
+    brief, plan = extract_outputs(result.messages)
+    return {
+        "ok": brief is not None and plan is not None,
+        "latency": time.perf_counter() - started,
+        "turns": turns,
+        "stages": dict(stage_time),
+        "validator": validator_time,
+        "model_calls": client.calls,
+    }
+
+
+async def bench_level(args: argparse.Namespace, concurrency: int) -> Dict[str, Any]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def guarded(i: int) -> Dict[str, Any]:
+        async with slots:
+            return await bench_one(args, seed=args.seed + i)
+
+    started = time.perf_counter()
+    runs = await asyncio.gather(*(guarded(i) for i in range(args.runs)))
+    wall = time.perf_counter() - started
+
+    ok_runs = [r for r in runs if r["ok"]]
+    n = len(ok_runs) or 1
+    stages = defaultdict(float)
+    for r in ok_runs:
+        for stage, t in r["stages"].items():
+            stages[stage] += t
+    return {
+        "concurrency": concurrency,
+        "runs": args.runs,
+        "failures": len(runs) - len(ok_runs),
+        "runs_per_sec": round(args.runs / wall, 2) if wall else 0.0,
+        "latency_p50_ms": round(percentile([r["latency"] for r in runs], 50) * 1000, 2),
+        "latency_p95_ms": round(percentile([r["latency"] for r in runs], 95) * 1000, 2),
+        "avg_turns": round(sum(r["turns"] for r in ok_runs) / n, 2),
+        "avg_model_calls": round(sum(r["model_calls"] for r in ok_runs) / n, 2),
+        "avg_stage_ms": {k: round(v / n * 1000, 2) for k, v in stages.items()},
+        "avg_validator_ms": round(sum(r["validator"] for r in ok_runs) / n * 1000, 3),
+        "max_rss_mb": round(_max_rss_mb(), 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the travel planning pipeline.")
+    parser.add_argument("--runs", type=int, default=20, help="Runs per concurrency level")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per model call")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Simulated seconds per search")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Probability of malformed JSON replies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a model call raising")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = []
+    for level in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        summary = await bench_level(args, level)
+        results.append(summary)
+        print(json.dumps(summary, ensure_ascii=False))
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,13 +1,41 @@
-from dataclasses import dataclass
+"""
+Application configuration.
+
+Nothing happens at import time: the .env file is loaded and environment
+variables are read when a config object is first used (`app_cfg`,
+`google_cfg` and `tavily_cfg` are created on first access, or explicitly
+through the `get_*_config()` factories). Missing API keys are only reported
+when something actually needs them (see `require_google_api_key`), so any
+module can be imported, e.g. for tests or `--help`, without credentials.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Dict
 import os
 
-# Optional: if you are using a .env file, enable this loader
-try:
-    from dotenv import load_dotenv  # pip install python-dotenv
-    load_dotenv()
-except Exception:
-    # If dotenv is not installed or .env file is missing, ignore
-    pass
+
+@lru_cache(maxsize=None)
+def _load_dotenv() -> None:
+    # Optional: if you are using a .env file, enable this loader
+    try:
+        from dotenv import load_dotenv  # pip install python-dotenv
+        load_dotenv()
+    except Exception:
+        # If dotenv is not installed or .env file is missing, ignore
+        pass
+
+
+def _env(name: str, default: str, cast: Callable[[str], Any] = str) -> Any:
+    """Dataclass field read from the environment when the config is instantiated."""
+    def read() -> Any:
+        _load_dotenv()
+        return cast(os.getenv(name, default))
+    return field(default_factory=read)
+
+
+def _env_flag(name: str, default: str) -> Any:
+    # Convert string to bool: "true", "1", "yes" → True
+    return _env(name, default, lambda value: value.lower() in {"1", "true", "yes"})
 
 
 @dataclass
@@ -16,48 +44,201 @@ class AppConfig:
     General application settings.
     Values are read from environment variables, falling back to defaults if not set.
     """
-    MAX_TURNS: int = int(os.getenv("MAX_TURNS", "7"))
-    TEMPERATURE: float = float(os.getenv("TEMPERATURE", "0.4"))
-    # Default termination word if environment variable is missing
-    TERMINATION_WORD: str = os.getenv("TERMINATION_WORD", "end")
-    # Convert string to bool: "true", "1", "yes" → True
-    RESPONSE_JSON: bool = os.getenv("RESPONSE_JSON", "true").lower() in {"1", "true", "yes"}
+    # Run limits: agent turns, tries per validated stage, tokens (0 = unlimited), wall-clock seconds (0 = unlimited).
+    # MAX_TURNS is for the sequential stages; build_travel_team adds the turns of concurrent researchers/planners/writers.
+    MAX_TURNS: int = _env("MAX_TURNS", "7", int)
+    MAX_STAGE_ATTEMPTS: int = _env("MAX_STAGE_ATTEMPTS", "3", int)
+    RUN_TOKEN_BUDGET: int = _env("RUN_TOKEN_BUDGET", "200000", int)
+    RUN_DEADLINE_S: float = _env("RUN_DEADLINE_S", "300", float)
+    TEMPERATURE: float = _env("TEMPERATURE", "0.4", float)
+    # Default termination word if environment variable is missing (the writer's closing marker)
+    TERMINATION_WORD: str = _env("TERMINATION_WORD", "پایان")
+    RESPONSE_JSON: bool = _env_flag("RESPONSE_JSON", "true")
+    # Prompt-token budget for the research report handed to the planner
+    PLANNER_CONTEXT_TOKENS: int = _env("PLANNER_CONTEXT_TOKENS", "3000", int)
+    # Per-run instrumentation (spans, token counts); disabled = cheap no-op
+    TELEMETRY_ENABLED: bool = _env_flag("TELEMETRY_ENABLED", "true")
+    # If set, each run's telemetry is written as <TELEMETRY_DIR>/<run_id>.json
+    TELEMETRY_DIR: str = _env("TELEMETRY_DIR", "")
+    # Planning service: number of warm teams and how many requests may wait for one
+    POOL_SIZE: int = _env("POOL_SIZE", "4", int)
+    POOL_MAX_QUEUE: int = _env("POOL_MAX_QUEUE", "16", int)
+    # Stage checkpoints for runs with an id (batch jobs); empty disables them
+    CHECKPOINT_DIR: str = _env("CHECKPOINT_DIR", ".cache/checkpoints")
+    # Research with one concurrent sub-agent per topic (agents/researcher.py RESEARCH_TOPICS)
+    RESEARCH_SHARDED: bool = _env_flag("RESEARCH_SHARDED", "false")
+    # Trips longer than PLAN_CHUNK_DAYS are planned and written in up to PLAN_CHUNK_WORKERS
+    # concurrent day ranges (0 = never split)
+    PLAN_CHUNK_DAYS: int = _env("PLAN_CHUNK_DAYS", "5", int)
+    PLAN_CHUNK_WORKERS: int = _env("PLAN_CHUNK_WORKERS", "3", int)
+    # Reuse validated research reports / plans of earlier runs for the same trip (see utils/plan_cache.py)
+    PLAN_CACHE_ENABLED: bool = _env_flag("PLAN_CACHE_ENABLED", "false")
+    PLAN_CACHE_PATH: str = _env("PLAN_CACHE_PATH", ".cache/plans.sqlite3")
+    PLAN_CACHE_MAX_ENTRIES: int = _env("PLAN_CACHE_MAX_ENTRIES", "2000", int)
+    # Freshness in hours: research stays valid longer than a plan's prices
+    RESEARCH_CACHE_TTL_H: float = _env("RESEARCH_CACHE_TTL_H", "168", float)
+    PLAN_CACHE_TTL_H: float = _env("PLAN_CACHE_TTL_H", "24", float)
 
 
 @dataclass
 class GoogleConfig:
     """
     Gemini model settings through the OpenAI-compatible Google endpoint.
-    GOOGLE_API_KEY must always be set, otherwise the program will raise an error.
-    """
-    API_KEY: str = os.getenv("GOOGLE_API_KEY", "")
-    MODEL: str = os.getenv("GOOGLE_MODEL", "gemini-2.5-flash")
-    BASE_URL: str = os.getenv(
-        "GOOGLE_OPENAI_BASE_URL",
-        "https://generativelanguage.googleapis.com/v1beta/openai/"
-    )
-    TIMEOUT: float = float(os.getenv("GEMINI_TIMEOUT", "30"))
+    GOOGLE_API_KEY must be set before a model client is created (see `require_google_api_key`).
+    """
+    API_KEY: str = _env("GOOGLE_API_KEY", "")
+    MODEL: str = _env("GOOGLE_MODEL", "gemini-2.5-flash")
+    BASE_URL: str = _env("GOOGLE_OPENAI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/openai/")
+    TIMEOUT: float = _env("GEMINI_TIMEOUT", "30", float)
     # Optional: reasoning effort level for Gemini (none|low|medium|high)
-    REASONING_EFFORT: str = os.getenv("REASONING_EFFORT", "low")
+    REASONING_EFFORT: str = _env("REASONING_EFFORT", "low")
+    # Completion cache: record | replay | passthrough (see models/cached_client.py)
+    CACHE_MODE: str = _env("MODEL_CACHE_MODE", "passthrough", str.lower)
+    CACHE_PATH: str = _env("MODEL_CACHE_PATH", ".cache/completions.sqlite3")
+    CACHE_MAX_ENTRIES: int = _env("MODEL_CACHE_MAX_ENTRIES", "20000", int)
+    # Process-wide quota for all Gemini calls (0 = unlimited); see models/scheduler.py
+    RPM: int = _env("GEMINI_RPM", "0", int)
+    TPM: int = _env("GEMINI_TPM", "0", int)
+    # Retries on 429 / timeouts, with jittered exponential backoff starting at RETRY_BASE_DELAY seconds
+    MAX_RETRIES: int = _env("GEMINI_MAX_RETRIES", "5", int)
+    RETRY_BASE_DELAY: float = _env("GEMINI_RETRY_BASE_DELAY", "1.0", float)
+    # Completion tokens assumed per call when reserving TPM budget
+    OUTPUT_TOKENS_ESTIMATE: int = _env("GEMINI_OUTPUT_TOKENS_ESTIMATE", "1024", int)
+    MAX_TOKENS: int = _env("GEMINI_MAX_TOKENS", "4096", int)
+    # Hedged requests (see models/hedging.py): a call slower than the HEDGE_PERCENTILE latency of
+    # recent calls (at least HEDGE_MIN_DELAY s) gets a duplicate; at most HEDGE_MAX_RATIO of calls, and only
+    # while GEMINI_RPM/TPM have headroom (duplicates take quota like any call)
+    HEDGE_ENABLED: bool = _env_flag("GEMINI_HEDGE_ENABLED", "false")
+    HEDGE_PERCENTILE: float = _env("GEMINI_HEDGE_PERCENTILE", "95", float)
+    HEDGE_MIN_DELAY: float = _env("GEMINI_HEDGE_MIN_DELAY", "2.0", float)
+    HEDGE_MIN_SAMPLES: int = _env("GEMINI_HEDGE_MIN_SAMPLES", "20", int)
+    HEDGE_MAX_RATIO: float = _env("GEMINI_HEDGE_MAX_RATIO", "0.1", float)
+    # Per-agent model routing preset (see ROUTING_PROFILES) and the cheaper model it may route to
+    ROUTING_PROFILE: str = _env("MODEL_ROUTING_PROFILE", "uniform", str.lower)
+    FAST_MODEL: str = _env("GOOGLE_FAST_MODEL", "gemini-2.5-flash-lite")
+
+
+@dataclass(frozen=True)
+class AgentModelConfig:
+    """
+    Model settings of one route: an agent ("researcher", "planner", "writer")
+    or "retry", used for the correction attempts after a rejected draft.
+    """
+    MODEL: str
+    REASONING_EFFORT: str
+    MAX_TOKENS: int
+    TIMEOUT: float
+    TEMPERATURE: float
+
+
+MODEL_ROUTES = ("researcher", "planner", "writer", "retry")
+
+# Overrides per route on top of the GoogleConfig defaults; "fast" means GOOGLE_FAST_MODEL.
+# Single fields can still be overridden per route, e.g. WRITER_MODEL or RETRY_REASONING_EFFORT.
+ROUTING_PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "uniform": {},
+    # The writer only rephrases validated JSON, and corrections only fix the listed fields.
+    "tiered": {
+        "writer": {"MODEL": "fast", "REASONING_EFFORT": "none"},
+        "retry": {"MODEL": "fast", "REASONING_EFFORT": "low"},
+    },
+}
+
 
 @dataclass
 class TavilyConfig:
     """
     Tavily API settings.
     """
-    API_KEY: str = os.getenv("TAVILY_API_KEY", "")
+    API_KEY: str = _env("TAVILY_API_KEY", "")
+    # Per-call timeout (seconds) for a single search request
+    TIMEOUT: float = _env("TAVILY_TIMEOUT", "15", float)
+    # Upper bound on concurrent in-flight searches across the whole process
+    MAX_CONCURRENCY: int = _env("TAVILY_MAX_CONCURRENCY", "8", int)
+    # Keep-alive connection pool size of the shared HTTP client
+    MAX_CONNECTIONS: int = _env("TAVILY_MAX_CONNECTIONS", "16", int)
+    # Maximum number of queries accepted by a single web_search_many call
+    MAX_BATCH: int = _env("TAVILY_MAX_BATCH", "8", int)
+    # On-disk search result cache shared across runs
+    CACHE_ENABLED: bool = _env_flag("SEARCH_CACHE_ENABLED", "true")
+    CACHE_PATH: str = _env("SEARCH_CACHE_PATH", ".cache/search.sqlite3")
+    CACHE_MAX_ENTRIES: int = _env("SEARCH_CACHE_MAX_ENTRIES", "5000", int)
+    # Bypass cached entries and re-fetch (results are still written back)
+    CACHE_REFRESH: bool = _env_flag("SEARCH_CACHE_REFRESH", "false")
+
+
+@lru_cache(maxsize=None)
+def get_app_config() -> AppConfig:
+    return AppConfig()
+
+
+@lru_cache(maxsize=None)
+def get_google_config() -> GoogleConfig:
+    return GoogleConfig()
+
+
+@lru_cache(maxsize=None)
+def get_tavily_config() -> TavilyConfig:
+    cfg = TavilyConfig()
+    if not (cfg.API_KEY and cfg.API_KEY.strip()):
+        print("[WARN] TAVILY_API_KEY is not set. The Web Search tool will not be available.")
+    return cfg
+
+
+@lru_cache(maxsize=None)
+def get_agent_model_config(route: str) -> AgentModelConfig:
+    """
+    Resolved model settings of a route: GoogleConfig defaults, then the active
+    routing profile, then `<ROUTE>_MODEL` / `_REASONING_EFFORT` / `_MAX_TOKENS`
+    / `_TIMEOUT` / `_TEMPERATURE` environment overrides.
+    """
+    if route not in MODEL_ROUTES:
+        raise ValueError(f"Unknown model route: {route!r}")
+    google_cfg, app_cfg = get_google_config(), get_app_config()
+    if google_cfg.ROUTING_PROFILE not in ROUTING_PROFILES:
+        raise ValueError(f"Unknown MODEL_ROUTING_PROFILE: {google_cfg.ROUTING_PROFILE!r}")
+    # Structured stages run cooler than the prose writer.
+    temperature = {
+        "planner": app_cfg.TEMPERATURE,
+        "writer": max(0.5, app_cfg.TEMPERATURE),
+    }.get(route, min(app_cfg.TEMPERATURE, 0.35))
+    values: Dict[str, Any] = {
+        "MODEL": google_cfg.MODEL,
+        "REASONING_EFFORT": google_cfg.REASONING_EFFORT,
+        "MAX_TOKENS": google_cfg.MAX_TOKENS,
+        "TIMEOUT": google_cfg.TIMEOUT,
+        "TEMPERATURE": temperature,
+    }
+    values.update(ROUTING_PROFILES[google_cfg.ROUTING_PROFILE].get(route, {}))
+    _load_dotenv()
+    for name, default in list(values.items()):
+        raw = os.getenv(f"{route.upper()}_{name}")
+        if raw:
+            values[name] = type(default)(raw)
+    if values["MODEL"] == "fast":
+        values["MODEL"] = google_cfg.FAST_MODEL
+    return AgentModelConfig(**values)
+
+
+def require_google_api_key() -> str:
+    """
+    The Gemini API key; raises if it is missing. Called when the model client is built.
+    """
+    api_key = get_google_config().API_KEY
+    # Validation: API key must not be empty
+    if not (api_key and api_key.strip()):
+        raise RuntimeError(
+            "GOOGLE_API_KEY is not set. "
+            "Set it via environment variable or .env file, e.g. export GOOGLE_API_KEY='your_key'."
+        )
+    return api_key
 
 
-app_cfg = AppConfig()
-google_cfg = GoogleConfig()
-tavily_cfg = TavilyConfig()
+_LAZY = {"app_cfg": get_app_config, "google_cfg": get_google_config, "tavily_cfg": get_tavily_config}
 
-# Validation: API key must not be empty
-if not (google_cfg.API_KEY and google_cfg.API_KEY.strip()):
-    raise RuntimeError(
-        "GOOGLE_API_KEY is not set. "
-        "Set it via environment variable or .env file, e.g. export GOOGLE_API_KEY='your_key'."
-    )
 
-if not (tavily_cfg.API_KEY and tavily_cfg.API_KEY.strip()):
-    print("[WARN] TAVILY_API_KEY is not set. The Web Search tool will not be available.")
\ No newline at end of file
+def __getattr__(name: str) -> Any:
+    # `from config.settings import app_cfg` keeps working; the object is built on first access.
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
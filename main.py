@@ -1,14 +1,32 @@
 from autogen_agentchat.messages import TextMessage
-from teams.travel_team import build_travel_team
+from models.GoogleModel import close_model_clients
+from teams.travel_team import build_travel_team, stream_plan
+from tools.web_search import close_search_pool
 import logging
 import asyncio
-import openai
 
 
 logging.basicConfig(level=logging.INFO)
 
+STAGE_LABELS = {
+    "research_started": "🔎 Researching destination...",
+    "research_validated": "✅ Research report validated.",
+    "research_rejected": "🔁 Research report rejected, retrying...",
+    "research_failed": "⚠️ Research could not be validated, continuing with the last draft.",
+    "plan_started": "🗺️ Planning itinerary...",
+    "plan_validated": "✅ Itinerary validated.",
+    "plan_rejected": "🔁 Itinerary rejected, retrying...",
+    "plan_failed": "⚠️ Itinerary could not be validated, writing from the last draft.",
+    "routing_started": "🧭 Ordering stops by distance...",
+    "routing_validated": "🗺️ Stops grouped and ordered by distance.",
+    "writing_started": "✍️ Writing the brief:\n",
+}
+
 
 async def main():
+    # Imported here so `import main` stays cheap; the model client needs it anyway.
+    import openai
+
     try:
         print("🚀 Building the agent team...")
         team = await build_travel_team()
@@ -21,15 +39,27 @@ async def main():
         )
         
         print("⏳ Running task by the team...")
-        result = await team.run(task=task)
-        print("✅ Task completed.")
+        result = None
+        streamed = False
+        async for event in stream_plan(team, task):
+            if event.kind == "stage":
+                print(STAGE_LABELS.get(event.text, event.text), flush=True)
+            elif event.kind == "token":
+                streamed = True
+                print(event.text, end="", flush=True)
+            elif event.kind == "done":
+                result = event.result
+        print("\n✅ Task completed.")
+        if result is not None:
+            print(f"   Stop reason: {result.stop_reason}")
 
 
         if result and result.messages:
-            for message in result.messages:
-                print(f"--- Message from {message.source} ---")
-                print(message.content)
-                print("---------------------------------\n")
+            if not streamed:
+                for message in result.messages:
+                    print(f"--- Message from {message.source} ---")
+                    print(message.content)
+                    print("---------------------------------\n")
         else:
             print("⚠️ No result received from team execution.")
 
@@ -49,6 +79,9 @@ async def main():
         print(f"   Details: {e}")
     except Exception as e:
         print(f"\n❌ An unexpected error occurred: {e}")
+    finally:
+        await close_search_pool()
+        await close_model_clients()
 
 
 if __name__ == "__main__": 
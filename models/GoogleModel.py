@@ -1,6 +1,30 @@
-from autogen_ext.models.openai import OpenAIChatCompletionClient
-from config.settings import google_cfg, app_cfg
-from autogen_core.models import ModelInfo
+"""
+The process-wide Gemini client.
+
+Nothing is built at import time: `get_model_client()` creates the client
+chain on first use (cache → optional hedging → scheduler → Gemini) and returns the same object
+afterwards. The OpenAI SDK is only imported then, and a missing
+GOOGLE_API_KEY is reported then. `model_client`, `gemini_client` and
+`scheduler` are still importable from this module and resolve lazily.
+
+`get_agent_client(route)` builds the client of one agent from its
+`AgentModelConfig` (model, reasoning effort, max_tokens, timeout). All
+clients with the same base URL share one HTTP connection pool, and all of
+them share the scheduler's quota.
+"""
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+from autogen_core.models import ChatCompletionClient, ModelInfo
+from config.settings import (
+    AgentModelConfig,
+    get_agent_model_config,
+    get_app_config,
+    get_google_config,
+    require_google_api_key,
+)
+from models.routing import RoutedChatCompletionClient
+from models.scheduler import RateLimitScheduler, ScheduledChatCompletionClient
 
 MODEL_INFO = ModelInfo(
     vision=True,
@@ -10,20 +34,130 @@ MODEL_INFO = ModelInfo(
     family="gemini",
 )
 
-model_client = OpenAIChatCompletionClient(
-    model=google_cfg.MODEL,
-    api_key=google_cfg.API_KEY,
-    base_url=google_cfg.BASE_URL,
-    temperature=app_cfg.TEMPERATURE,
-    max_tokens=4096,
-    timeout=google_cfg.TIMEOUT, 
-    model_info=MODEL_INFO,
-)
 
-extra_create_kwargs = {
-    "extra_body": {
-        "reasoning": {
-            "effort": google_cfg.REASONING_EFFORT  # 👈 low/medium/high
-        }
+# One keep-alive HTTP pool per base URL, shared by every client that talks to it
+_http_pools: Dict[str, Any] = {}
+
+
+def _http_pool(base_url: str) -> Any:
+    if base_url not in _http_pools:
+        import openai
+
+        _http_pools[base_url] = openai.DefaultAsyncHttpxClient()
+    return _http_pools[base_url]
+
+
+@lru_cache(maxsize=None)
+def _gemini_client(cfg: Optional[AgentModelConfig]) -> ChatCompletionClient:
+    from autogen_ext.models.openai import OpenAIChatCompletionClient
+
+    google_cfg = get_google_config()
+    create_args: dict = {
+        "model": google_cfg.MODEL,
+        "temperature": get_app_config().TEMPERATURE,
+        "max_tokens": google_cfg.MAX_TOKENS,
+        "timeout": google_cfg.TIMEOUT,
     }
-}
+    if cfg is not None:
+        create_args.update(model=cfg.MODEL, temperature=cfg.TEMPERATURE, max_tokens=cfg.MAX_TOKENS, timeout=cfg.TIMEOUT)
+        if cfg.REASONING_EFFORT:
+            create_args["reasoning_effort"] = cfg.REASONING_EFFORT
+    return OpenAIChatCompletionClient(
+        api_key=require_google_api_key(),
+        base_url=google_cfg.BASE_URL,
+        http_client=_http_pool(google_cfg.BASE_URL),
+        # Retries are owned by the scheduler, which also pauses every caller on a 429.
+        max_retries=0,
+        model_info=MODEL_INFO,
+        **create_args,
+    )
+
+
+def get_gemini_client() -> ChatCompletionClient:
+    """The raw Gemini client with the GoogleConfig defaults (no scheduler, no cache)."""
+    return _gemini_client(None)
+
+
+@lru_cache(maxsize=None)
+def get_scheduler() -> RateLimitScheduler:
+    # Every team in the process shares this quota.
+    google_cfg = get_google_config()
+    return RateLimitScheduler(rpm=google_cfg.RPM, tpm=google_cfg.TPM)
+
+
+@lru_cache(maxsize=None)
+def _client_chain(cfg: Optional[AgentModelConfig]) -> ChatCompletionClient:
+    google_cfg = get_google_config()
+    client: ChatCompletionClient = ScheduledChatCompletionClient(
+        _gemini_client(cfg),
+        get_scheduler(),
+        max_retries=google_cfg.MAX_RETRIES,
+        base_delay=google_cfg.RETRY_BASE_DELAY,
+        output_tokens_estimate=google_cfg.OUTPUT_TOKENS_ESTIMATE,
+    )
+    # Hedging sits in front of the scheduler: a duplicate request takes RPM/TPM quota like any
+    # other call and is only sent while the scheduler has headroom for it.
+    if google_cfg.HEDGE_ENABLED:
+        from models.hedging import HedgedChatCompletionClient
+
+        client = HedgedChatCompletionClient(
+            client,
+            pct=google_cfg.HEDGE_PERCENTILE,
+            min_delay=google_cfg.HEDGE_MIN_DELAY,
+            min_samples=google_cfg.HEDGE_MIN_SAMPLES,
+            max_ratio=google_cfg.HEDGE_MAX_RATIO,
+            scheduler=get_scheduler(),
+        )
+    # Optional record/replay cache in front of Gemini (MODEL_CACHE_MODE=record|replay).
+    # It sits outside the scheduler so cache hits never wait for quota.
+    if google_cfg.CACHE_MODE == "passthrough":
+        return client
+    from models.cached_client import CachingChatCompletionClient
+    from utils.kv_store import SQLiteStore
+
+    return CachingChatCompletionClient(
+        client,
+        SQLiteStore(google_cfg.CACHE_PATH, google_cfg.CACHE_MAX_ENTRIES),
+        mode=google_cfg.CACHE_MODE,
+    )
+
+
+def get_model_client() -> ChatCompletionClient:
+    """The shared client with the GoogleConfig defaults."""
+    return _client_chain(None)
+
+
+@lru_cache(maxsize=None)
+def get_agent_client(route: str) -> ChatCompletionClient:
+    """
+    Client of one agent route ("researcher", "planner", "writer"). Its
+    correction attempts go to the "retry" route. Routes with identical
+    settings share one client.
+    """
+    return RoutedChatCompletionClient(
+        _client_chain(get_agent_model_config(route)),
+        retry_client=_client_chain(get_agent_model_config("retry")),
+        route=route,
+    )
+
+
+async def close_model_clients() -> None:
+    """
+    Close the shared connection pools (call on application shutdown). Clients
+    built afterwards start with fresh pools.
+    """
+    pools = list(_http_pools.values())
+    _http_pools.clear()
+    for cached in (_gemini_client, _client_chain, get_agent_client):
+        cached.cache_clear()
+    for pool in pools:
+        await pool.aclose()
+
+
+_LAZY = {"model_client": get_model_client, "gemini_client": get_gemini_client, "scheduler": get_scheduler}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,155 @@
+"""
+Record/replay cache for chat completions.
+
+Wraps any autogen `ChatCompletionClient` and stores completed `CreateResult`s
+in the local SQLite store, keyed on everything that determines the output:
+the wrapped client's model and default create args (temperature, max_tokens,
+...), the messages, tool schemas, tool choice, structured-output schema and
+per-call `extra_create_args` (response_format, reasoning effort, ...).
+
+Modes:
+    record       serve cached completions, call the model on a miss and store it
+    replay       serve cached completions only; a miss raises CacheMissError
+                 (offline runs and tests, no network)
+    passthrough  no caching at all
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncGenerator, Literal, Mapping, Optional, Sequence, Union
+
+from pydantic import BaseModel
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from models.wrapper import ChatCompletionClientWrapper
+from utils.kv_store import SQLiteStore
+
+CacheMode = Literal["record", "replay", "passthrough"]
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded completion."""
+
+
+class CachingChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Chat completion client wrapper with an on-disk record/replay cache.
+
+    Args:
+        client: The real model client to wrap.
+        store: Persistent store used for the cache (LRU-bounded).
+        mode: "record", "replay" or "passthrough".
+    """
+
+    NAMESPACE = "chat_completions"
+
+    def __init__(self, client: ChatCompletionClient, store: SQLiteStore, mode: CacheMode = "record"):
+        if mode not in ("record", "replay", "passthrough"):
+            raise ValueError(f"Unknown model cache mode: {mode!r}")
+        super().__init__(client)
+        self.store = store
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    def cache_key(
+        self,
+        messages: Sequence[LLMMessage],
+        tools: Sequence[Tool | ToolSchema],
+        tool_choice: Any,
+        json_output: Optional[bool | type[BaseModel]],
+        extra_create_args: Mapping[str, Any],
+    ) -> str:
+        if isinstance(json_output, type) and issubclass(json_output, BaseModel):
+            json_output_data: Any = json_output.model_json_schema()
+        else:
+            json_output_data = json_output
+        data = {
+            "client": dict(self.create_args),
+            "messages": [m.model_dump(mode="json") for m in messages],
+            "tools": [t.schema if isinstance(t, Tool) else t for t in tools],
+            "tool_choice": tool_choice.name if isinstance(tool_choice, Tool) else tool_choice,
+            "json_output": json_output_data,
+            "extra_create_args": dict(extra_create_args),
+        }
+        serialized = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+    async def _lookup(self, key: str) -> Optional[CreateResult]:
+        if self.mode == "passthrough":
+            return None
+        data = await asyncio.to_thread(self.store.get, self.NAMESPACE, key)
+        if data is None:
+            self.misses += 1
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded completion for request {key[:12]} (replay mode).")
+            return None
+        self.hits += 1
+        result = CreateResult.model_validate(data)
+        result.cached = True
+        return result
+
+    async def _record(self, key: str, result: CreateResult) -> None:
+        if self.mode == "record":
+            await asyncio.to_thread(self.store.set, self.NAMESPACE, key, result.model_dump(mode="json"))
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        key = self.cache_key(messages, tools, tool_choice, json_output, extra_create_args)
+        cached = await self._lookup(key)
+        if cached is not None:
+            return cached
+        result = await self.client.create(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        await self._record(key, result)
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        key = self.cache_key(messages, tools, tool_choice, json_output, extra_create_args)
+        cached = await self._lookup(key)
+        if cached is not None:
+            # Replay the whole text as one chunk so streaming consumers still see content first.
+            if isinstance(cached.content, str) and cached.content:
+                yield cached.content
+            yield cached
+            return
+        async for item in self.client.create_stream(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        ):
+            if isinstance(item, CreateResult):
+                await self._record(key, item)
+            yield item
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"mode": self.mode, "hits": self.hits, "misses": self.misses, "hit_rate": (self.hits / total) if total else 0.0}
@@ -0,0 +1,242 @@
+"""
+Hedged model requests.
+
+Tail latency of Gemini calls is dominated by a few stragglers, not by the
+average. `HedgedChatCompletionClient` fires a duplicate of a call that hasn't
+answered by a latency percentile of recent calls (time to first chunk for
+streams), uses whichever answers first and cancels the other through its own
+`CancellationToken`. Each attempt's token is linked to the caller's, so
+cancelling the run cancels both.
+
+Hedging starts once `min_samples` calls have been seen, and hedges are capped
+at `max_ratio` of calls, so a slow backend isn't hit with double the load.
+The client sits in front of the rate-limit scheduler, so a duplicate takes
+RPM/TPM quota like any other call, and it is only sent while the scheduler
+has headroom for it (nobody queued, no 429 pause, quota available now):
+hedging never turns spare latency into the 429s the scheduler prevents.
+Hedges, hedge wins and call latencies are recorded (`stats()` and the
+travel_model_* metrics); benchmarks/hedging.py measures the p99 improvement
+against unhedged calls on a simulated straggler distribution.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Deque, Dict, List, Literal, Mapping, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from models.scheduler import RateLimitScheduler
+from models.wrapper import ChatCompletionClientWrapper
+from utils import telemetry
+from utils.context import estimate_tokens
+from utils.telemetry import metrics, percentile
+
+
+class _Attempt:
+    """One in-flight request: its own cancellation token and the task awaiting its (first) result."""
+
+    def __init__(self, task: "asyncio.Future[Any]", token: CancellationToken, stream: Any = None):
+        self.task = task
+        self.token = token
+        self.stream = stream
+        self.started = time.monotonic()
+
+    async def cancel(self) -> None:
+        self.token.cancel()
+        self.task.cancel()
+        await asyncio.gather(self.task, return_exceptions=True)
+        if self.stream is not None:
+            await self.stream.aclose()
+
+
+class HedgedChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Fires a backup request for calls slower than the `pct` latency percentile.
+
+    Args:
+        client: The real model client.
+        pct: Latency percentile of recent calls after which a call is hedged.
+        min_delay: Never hedge earlier than this many seconds.
+        min_samples: Calls observed before hedging starts.
+        max_ratio: Upper bound of hedges per call.
+        window: Number of recent latencies the percentile is computed over.
+        scheduler: The rate-limit scheduler `client` calls go through; hedges
+            are only sent while it has headroom (None = no quota check).
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        pct: float = 95,
+        min_delay: float = 1.0,
+        min_samples: int = 20,
+        max_ratio: float = 0.1,
+        window: int = 500,
+        scheduler: Optional[RateLimitScheduler] = None,
+    ):
+        super().__init__(client)
+        self.scheduler = scheduler
+        self.pct = pct
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        # Full-call latencies for create(), time to first chunk for create_stream()
+        self._latencies: Dict[str, Deque[float]] = {"create": deque(maxlen=window), "stream": deque(maxlen=window)}
+        # Latency the caller saw, per call
+        self._effective: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        # Hedges that were due but skipped for lack of quota headroom
+        self.hedges_skipped = 0
+
+    def hedge_delay(self, kind: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call, or None if it may not be hedged (cold start or hedge budget spent).
+        """
+        samples = self._latencies[kind]
+        if len(samples) < self.min_samples or self.hedges + 1 > self.max_ratio * self.calls:
+            return None
+        return max(self.min_delay, percentile(samples, self.pct))
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        def start() -> _Attempt:
+            token = _linked_token(cancellation_token)
+            call = self.client.create(
+                messages, tools=tools, tool_choice=tool_choice, json_output=json_output,
+                extra_create_args=extra_create_args, cancellation_token=token,
+            )
+            return _Attempt(asyncio.ensure_future(call), token)
+
+        winner, _ = await self._race(start, "create", _prompt_cost(messages))
+        return winner.task.result()
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        def start() -> _Attempt:
+            token = _linked_token(cancellation_token)
+            stream = self.client.create_stream(
+                messages, tools=tools, tool_choice=tool_choice, json_output=json_output,
+                extra_create_args=extra_create_args, cancellation_token=token,
+            )
+            return _Attempt(asyncio.ensure_future(_first_item(stream)), token, stream)
+
+        # The race is over the first chunk; the winner's stream is then read to the end.
+        winner, _ = await self._race(start, "stream", _prompt_cost(messages))
+        try:
+            empty, first = winner.task.result()
+            if empty:
+                return
+            yield first
+            async for item in winner.stream:
+                yield item
+        finally:
+            await winner.stream.aclose()
+
+    async def _race(self, start, kind: str, cost: int) -> Tuple[_Attempt, bool]:
+        """
+        Runs the primary attempt, hedged once it is slower than the hedge delay
+        (if the scheduler can take a call of `cost` tokens right then).
+        Returns the first attempt that succeeded and whether the call was hedged;
+        if every attempt failed, the primary's error is raised.
+        """
+        self.calls += 1
+        delay = self.hedge_delay(kind)
+        attempts: List[_Attempt] = [start()]
+        try:
+            done, _ = await asyncio.wait([attempts[0].task], timeout=delay)
+            if not done and self.scheduler is not None and not self.scheduler.has_headroom(cost):
+                self.hedges_skipped += 1
+                telemetry.current().count("travel_model_hedges_skipped_total", kind=kind)
+            elif not done:
+                self.hedges += 1
+                telemetry.current().count("travel_model_hedges_total", kind=kind)
+                attempts.append(start())
+            winner = await _first_success(attempts)
+        except BaseException:
+            for attempt in attempts:
+                await attempt.cancel()
+            raise
+        hedged = len(attempts) > 1
+        elapsed = time.monotonic() - attempts[0].started
+        for attempt in attempts:
+            if attempt is not winner:
+                await attempt.cancel()
+        if winner is not attempts[0]:
+            self.hedge_wins += 1
+            telemetry.current().count("travel_model_hedge_wins_total", kind=kind)
+        # For a won hedge this is a lower bound of the straggler's latency, which keeps it in the tail.
+        self._latencies[kind].append(elapsed)
+        self._effective.append(elapsed)
+        if telemetry.current().enabled:
+            metrics.observe("travel_model_call_seconds", elapsed, kind=kind, hedged=hedged)
+        return winner, hedged
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedges": self.hedges,
+            "hedge_rate": (self.hedges / self.calls) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "hedges_skipped": self.hedges_skipped,
+            "p50_s": round(percentile(self._effective, 50), 3),
+            "p99_s": round(percentile(self._effective, 99), 3),
+        }
+
+
+def _prompt_cost(messages: Sequence[LLMMessage]) -> int:
+    """Estimated prompt tokens of a call, for the scheduler's headroom check."""
+    return sum(estimate_tokens(str(m.content)) for m in messages)
+
+
+def _linked_token(parent: Optional[CancellationToken]) -> CancellationToken:
+    token = CancellationToken()
+    if parent is not None:
+        if parent.is_cancelled():
+            token.cancel()
+        else:
+            parent.add_callback(token.cancel)
+    return token
+
+
+async def _first_item(stream: AsyncGenerator[Any, None]) -> Tuple[bool, Any]:
+    """(empty, first item) of a stream."""
+    try:
+        return False, await stream.__anext__()
+    except StopAsyncIteration:
+        return True, None
+
+
+async def _first_success(attempts: List[_Attempt]) -> _Attempt:
+    """
+    The first attempt to finish without an error; raises the primary's error if all of them failed.
+    """
+    pending = {attempt.task: attempt for attempt in attempts}
+    while pending:
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            attempt = pending.pop(task)
+            if not task.cancelled() and task.exception() is None:
+                return attempt
+    # Every attempt failed: surface the primary's error (retried by the scheduler if retryable).
+    raise attempts[0].task.exception()
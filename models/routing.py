@@ -0,0 +1,123 @@
+"""
+Per-call model routing.
+
+Each agent gets its own client (see `models.GoogleModel.get_agent_client`),
+so the writer can run on a cheaper model than the planner. Within one agent,
+`RoutedChatCompletionClient` sends correction attempts, i.e. the turns after a
+rejected draft, to the "retry" route: the pipeline marks them with
+`correction_attempt()`, a context variable like the scheduler's stage priority.
+Every call is counted per route and model, so latency and cost can be
+compared across routing profiles.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Iterator, Literal, Mapping, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from models.wrapper import ChatCompletionClientWrapper
+from utils import telemetry
+
+_correction: ContextVar[bool] = ContextVar("model_correction_attempt", default=False)
+
+
+@contextmanager
+def correction_attempt(active: bool = True) -> Iterator[None]:
+    """
+    Route model calls made inside the block to the "retry" client.
+    """
+    token = _correction.set(active)
+    try:
+        yield
+    finally:
+        try:
+            _correction.reset(token)
+        except ValueError:
+            # Held across the yields of a generator that was closed from another context.
+            _correction.set(False)
+
+
+class RoutedChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Sends calls to `client`, or to `retry_client` during a correction attempt.
+
+    Args:
+        client: Client of the agent's own route.
+        retry_client: Client for correction attempts (defaults to `client`).
+        route: Name of the agent's route, used as a metrics label.
+    """
+
+    def __init__(self, client: ChatCompletionClient, retry_client: Optional[ChatCompletionClient] = None, route: str = ""):
+        super().__init__(client)
+        self.retry_client = retry_client or client
+        self.route = route
+
+    def _select(self) -> Tuple[str, ChatCompletionClient]:
+        if _correction.get():
+            return "retry", self.retry_client
+        return self.route, self.client
+
+    @staticmethod
+    def _model(client: ChatCompletionClient) -> str:
+        if isinstance(client, ChatCompletionClientWrapper):
+            return client.create_args.get("model", "")
+        return getattr(client, "_create_args", {}).get("model", "")
+
+    def _record(self, route: str, client: ChatCompletionClient, result: CreateResult) -> None:
+        recorder = telemetry.current()
+        model = self._model(client)
+        recorder.count("travel_model_calls_total", route=route, model=model)
+        recorder.count(
+            "travel_model_tokens_total",
+            result.usage.prompt_tokens + result.usage.completion_tokens,
+            route=route,
+            model=model,
+        )
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        route, client = self._select()
+        result = await client.create(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+        self._record(route, client, result)
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        route, client = self._select()
+        async for item in client.create_stream(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=json_output,
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        ):
+            if isinstance(item, CreateResult):
+                self._record(route, client, item)
+            yield item
@@ -0,0 +1,323 @@
+"""
+Process-wide, rate-limit-aware scheduler for model calls.
+
+All teams in the process share one `RateLimitScheduler`, which keeps two token
+buckets (requests/min and tokens/min) and admits waiting calls in priority
+order: a team in its writing stage goes before one still planning, which goes
+before one just starting research, so runs that are nearly done finish first.
+Each call's token cost is estimated before sending and corrected with the
+actual usage afterwards. 429s and timeouts are retried with jittered
+exponential backoff, and a 429 pauses admission for every caller.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, AsyncGenerator, Iterator, List, Literal, Mapping, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient, CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from models.wrapper import ChatCompletionClientWrapper
+from utils import telemetry
+from utils.context import estimate_tokens
+
+# Lower value = served first
+STAGE_PRIORITY = {"writing": 0, "planning": 1, "research": 2}
+DEFAULT_PRIORITY = 1
+
+_call_priority: ContextVar[int] = ContextVar("model_call_priority", default=DEFAULT_PRIORITY)
+
+
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    """
+    Errors worth retrying. openai is imported on first use: it is slow to load
+    and only needed once a call has actually failed.
+    """
+    import openai
+    return (openai.RateLimitError, openai.APITimeoutError, asyncio.TimeoutError)
+
+
+def _is_rate_limit(error: Exception) -> bool:
+    import openai
+    return isinstance(error, openai.RateLimitError)
+
+
+@contextmanager
+def stage_priority(stage: str) -> Iterator[None]:
+    """
+    Model calls made inside this block are scheduled with the stage's priority.
+    """
+    token = _call_priority.set(STAGE_PRIORITY.get(stage, DEFAULT_PRIORITY))
+    try:
+        yield
+    finally:
+        try:
+            _call_priority.reset(token)
+        except ValueError:
+            _call_priority.set(DEFAULT_PRIORITY)
+
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket. `capacity` per minute; 0 disables the limit.
+    The level may go negative when actual usage exceeds the estimate.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available (0 if available now)."""
+        if self.unlimited:
+            return 0.0
+        self.refill()
+        # A request larger than the whole bucket is admitted once it is full.
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float) -> None:
+        if not self.unlimited:
+            self.level -= amount
+
+
+class RateLimitScheduler:
+    """
+    Admits model calls under RPM/TPM limits in priority order.
+
+    Args:
+        rpm: Requests per minute (0 = unlimited).
+        tpm: Tokens per minute, prompt + completion (0 = unlimited).
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._waiters: List[Tuple[int, int, float]] = []
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _event(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._wakeup is None or self._loop is not loop:
+            self._loop, self._wakeup = loop, asyncio.Event()
+        return self._wakeup
+
+    def _notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+            self._wakeup = asyncio.Event()
+
+    async def acquire(self, cost: float, priority: int) -> None:
+        """
+        Wait until this call is at the head of the queue and both buckets can cover it.
+        """
+        entry = (priority, next(self._seq), cost)
+        heapq.heappush(self._waiters, entry)
+        try:
+            while True:
+                event = self._event()
+                delay: Optional[float] = None
+                if self._waiters[0] is entry:
+                    delay = max(
+                        self._paused_until - time.monotonic(),
+                        self.requests.wait_time(1),
+                        self.tokens.wait_time(cost),
+                    )
+                    if delay <= 0:
+                        heapq.heappop(self._waiters)
+                        self.requests.take(1)
+                        self.tokens.take(cost)
+                        self._notify()
+                        return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if entry in self._waiters:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._notify()
+            raise
+
+    def has_headroom(self, cost: float = 0) -> bool:
+        """
+        Whether a call of `cost` tokens would be admitted right now without making anyone wait.
+        """
+        return (
+            not self._waiters
+            and self._paused_until <= time.monotonic()
+            and self.requests.wait_time(1) == 0
+            and self.tokens.wait_time(cost) == 0
+        )
+
+    def settle(self, estimated: float, actual: float) -> None:
+        """
+        Correct the token bucket once the real usage of a call is known.
+        """
+        self.tokens.take(actual - estimated)
+
+    def pause(self, seconds: float) -> None:
+        """
+        Stop admitting calls for `seconds` (after a 429, the quota is shared by everyone).
+        """
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def stats(self) -> dict:
+        self.requests.refill()
+        self.tokens.refill()
+        return {
+            "waiting": len(self._waiters),
+            "requests_available": self.requests.level,
+            "tokens_available": self.tokens.level,
+            "paused_for_s": max(0.0, self._paused_until - time.monotonic()),
+        }
+
+
+class ScheduledChatCompletionClient(ChatCompletionClientWrapper):
+    """
+    Routes every call through a shared `RateLimitScheduler` and retries
+    rate-limit and timeout errors with jittered exponential backoff.
+
+    Args:
+        client: The real model client.
+        scheduler: Process-wide scheduler shared by all clients on the same quota.
+        max_retries: Retries after the first attempt.
+        base_delay: First backoff delay in seconds (doubles per attempt, full jitter).
+        output_tokens_estimate: Completion tokens assumed when estimating a call's cost.
+    """
+
+    def __init__(
+        self,
+        client: ChatCompletionClient,
+        scheduler: RateLimitScheduler,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        output_tokens_estimate: int = 1024,
+    ):
+        super().__init__(client)
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.output_tokens_estimate = output_tokens_estimate
+
+    def estimate_cost(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema]) -> int:
+        prompt = sum(estimate_tokens(str(m.content)) for m in messages)
+        prompt += sum(estimate_tokens(str(t.schema if isinstance(t, Tool) else t)) for t in tools)
+        max_tokens = self.create_args.get("max_tokens") or self.output_tokens_estimate
+        return prompt + min(max_tokens, self.output_tokens_estimate)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after", ""))
+            except (TypeError, ValueError):
+                retry_after = None
+        delay = random.uniform(0, self.base_delay * (2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def _admit(self, cost: int) -> None:
+        with telemetry.current().span("rate_limit_wait", priority=_call_priority.get()):
+            await self.scheduler.acquire(cost, _call_priority.get())
+
+    async def _on_retryable(self, attempt: int, error: Exception) -> None:
+        if attempt >= self.max_retries:
+            raise error
+        delay = self._backoff(attempt, error)
+        if _is_rate_limit(error):
+            self.scheduler.pause(delay)
+        telemetry.current().count("travel_model_retries_total", reason=type(error).__name__)
+        logging.warning(f"Model call failed ({type(error).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        cost = self.estimate_cost(messages, tools)
+        attempt = 0
+        while True:
+            await self._admit(cost)
+            try:
+                result = await self.client.create(
+                    messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                )
+            except retryable_errors() as e:
+                await self._on_retryable(attempt, e)
+                attempt += 1
+                continue
+            self.scheduler.settle(cost, result.usage.prompt_tokens + result.usage.completion_tokens)
+            return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        cost = self.estimate_cost(messages, tools)
+        attempt = 0
+        while True:
+            await self._admit(cost)
+            started = False
+            try:
+                async for item in self.client.create_stream(
+                    messages,
+                    tools=tools,
+                    tool_choice=tool_choice,
+                    json_output=json_output,
+                    extra_create_args=extra_create_args,
+                    cancellation_token=cancellation_token,
+                ):
+                    started = True
+                    if isinstance(item, CreateResult):
+                        self.scheduler.settle(cost, item.usage.prompt_tokens + item.usage.completion_tokens)
+                    yield item
+                return
+            except retryable_errors() as e:
+                # Chunks already reached the caller; a retry would duplicate them.
+                if started:
+                    raise
+                await self._on_retryable(attempt, e)
+                attempt += 1
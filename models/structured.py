@@ -0,0 +1,70 @@
+"""
+Structured output for agents that also use tools.
+
+With `output_content_type` set, autogen's AssistantAgent requests the schema on
+every call, including the first one that offers tools. Gemini cannot combine
+function calling with a JSON response schema, so this wrapper drops the schema
+whenever tools are offered. The schema is then only enforced on the tool-free
+final "report" call (autogen's reflect-on-tool-use step), which is the one
+whose output we keep.
+"""
+from typing import Any, AsyncGenerator, Literal, Mapping, Optional, Sequence, Union
+
+from pydantic import BaseModel
+from autogen_core import CancellationToken
+from autogen_core.models import CreateResult, LLMMessage
+from autogen_core.tools import Tool, ToolSchema
+
+from models.wrapper import ChatCompletionClientWrapper
+
+
+def _without_schema_when_tools(
+    tools: Sequence[Tool | ToolSchema], json_output: Optional[bool | type[BaseModel]]
+) -> Optional[bool | type[BaseModel]]:
+    if tools and isinstance(json_output, type) and issubclass(json_output, BaseModel):
+        return None
+    return json_output
+
+
+class ToolCompatibleStructuredClient(ChatCompletionClientWrapper):
+    """
+    Sends the structured-output schema only on calls without tools.
+    """
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        return await super().create(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=_without_schema_when_tools(tools, json_output),
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        return super().create_stream(
+            messages,
+            tools=tools,
+            tool_choice=tool_choice,
+            json_output=_without_schema_when_tools(tools, json_output),
+            extra_create_args=extra_create_args,
+            cancellation_token=cancellation_token,
+        )
@@ -0,0 +1,124 @@
+"""
+Long-running HTTP planning service.
+
+Keeps a warm `TeamPool` of pre-built travel teams that share one model client
+connection pool, so each request only pays for the model calls themselves.
+
+Endpoints:
+    POST /plan      {"prompt": "...", "stream": false}
+                    → {"brief": str, "plan": {...}} or, with "stream": true,
+                      NDJSON PlanEvents ({"kind", "text"}) as they happen.
+                    → 503 with Retry-After when the wait queue is full.
+    GET  /health    → {"status": "ok"}
+    GET  /load      → pool statistics (idle/busy/waiting/served/rejected)
+    GET  /metrics   → aggregate run counters and histograms, pool and rate-limit
+                      scheduler gauges (Prometheus text)
+
+Usage:
+    python service.py --host 0.0.0.0 --port 8080
+"""
+import argparse
+import json
+import logging
+
+from aiohttp import web
+from autogen_agentchat.messages import TextMessage
+
+from config.settings import get_app_config
+from models.GoogleModel import close_model_clients, get_scheduler
+from teams.pool import TeamPool, PoolSaturatedError
+from teams.travel_team import extract_outputs, stream_plan
+from tools.web_search import close_search_pool
+from utils.plan_cache import get_plan_cache
+from utils.telemetry import metrics
+
+
+logging.basicConfig(level=logging.INFO)
+
+POOL_KEY = web.AppKey("pool", TeamPool)
+
+
+async def handle_plan(request: web.Request) -> web.StreamResponse:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return web.json_response({"error": "Body must be JSON."}, status=400)
+    prompt = body.get("prompt") if isinstance(body, dict) else None
+    if not prompt:
+        return web.json_response({"error": "Missing 'prompt'."}, status=400)
+
+    pool = request.app[POOL_KEY]
+    task = TextMessage(content=prompt, source="user")
+    try:
+        async with pool.team() as team:
+            if body.get("stream"):
+                return await _stream_response(request, team, task)
+            result = await team.run(task=task)
+    except PoolSaturatedError as e:
+        return web.json_response({"error": str(e)}, status=503, headers={"Retry-After": "5"})
+
+    brief, plan = extract_outputs(result.messages)
+    return web.json_response(
+        {"brief": brief, "plan": plan.model_dump() if plan else None, "stop_reason": result.stop_reason},
+        dumps=lambda obj: json.dumps(obj, ensure_ascii=False),
+    )
+
+
+async def _stream_response(request: web.Request, team, task: TextMessage) -> web.StreamResponse:
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson; charset=utf-8"})
+    await response.prepare(request)
+    async for event in stream_plan(team, task):
+        payload = {"kind": event.kind, "text": event.text}
+        if event.kind == "done":
+            brief, plan = extract_outputs(event.result.messages)
+            payload.update(brief=brief, plan=plan.model_dump() if plan else None)
+        await response.write((json.dumps(payload, ensure_ascii=False) + "\n").encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+async def handle_health(request: web.Request) -> web.Response:
+    return web.json_response({"status": "ok"})
+
+
+async def handle_load(request: web.Request) -> web.Response:
+    return web.json_response(request.app[POOL_KEY].stats())
+
+
+async def handle_metrics(request: web.Request) -> web.Response:
+    pool_lines = "".join(f"travel_pool_{key} {value}\n" for key, value in request.app[POOL_KEY].stats().items())
+    scheduler_lines = "".join(f"travel_scheduler_{key} {value}\n" for key, value in get_scheduler().stats().items())
+    plan_cache = get_plan_cache()
+    cache_lines = "".join(f"travel_plan_cache_{key} {value}\n" for key, value in (plan_cache.stats() if plan_cache else {}).items())
+    return web.Response(
+        text=metrics.render_prometheus() + pool_lines + scheduler_lines + cache_lines, content_type="text/plain"
+    )
+
+
+async def _lifecycle(app: web.Application):
+    app_cfg = get_app_config()
+    pool = TeamPool(size=app_cfg.POOL_SIZE, max_queue=app_cfg.POOL_MAX_QUEUE)
+    await pool.start()
+    app[POOL_KEY] = pool
+    logging.info(f"Team pool ready: {pool.stats()}")
+    yield
+    await close_search_pool()
+    await close_model_clients()
+
+
+def create_app() -> web.Application:
+    app = web.Application()
+    app.cleanup_ctx.append(_lifecycle)
+    app.router.add_post("/plan", handle_plan)
+    app.router.add_get("/health", handle_health)
+    app.router.add_get("/load", handle_load)
+    app.router.add_get("/metrics", handle_metrics)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve trip planning over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+    web.run_app(create_app(), host=args.host, port=args.port)
@@ -0,0 +1,933 @@
+"""
+A lightweight, deterministic orchestrator for the travel planning workflow.
+
+The workflow is a fixed sequence of typed stages:
+
+    research  → validate(ResearchReport) → planning → validate(ItineraryPlan) → routing → writing
+
+Each stage only receives the validated artifact it needs (the planner gets the
+user request plus the validated report, the writer gets only the validated
+plan) instead of the whole growing group-chat history, and no model call is
+spent on speaker selection. A failed validation sends the validator's verdict
+back to the same agent, which still has its own previous attempt in context.
+With `topic_researchers`, research is sharded: one lightweight researcher per
+topic (transport, weather, ...) runs concurrently, each validated on its
+own, and their reports are merged into a single ResearchReport, so research
+takes about as long as the slowest topic instead of the sum of all of them.
+Long trips are planned the same way: with `chunk_planners`, a trip longer
+than `plan_chunk_days` is split into day ranges planned concurrently from a
+shared skeleton (`utils.plan_chunks`) and merged into one plan, so no single
+generation has to fit the whole trip into max_tokens; `chunk_writers` write
+its brief per range, streamed in trip order.
+Before research, the request is pre-parsed locally (`utils.trip_request`):
+destination, dates converted from the Jalali calendar, duration and budget
+go to the researcher and planner as a context message, so no model
+reasoning is spent on calendar conversion. Between planning and writing, the
+routing stage (`utils.route_optimizer`) regroups and reorders the validated
+plan's stops by distance without a model call.
+
+Every run is bounded. A validated stage gets at most `max_stage_attempts`
+tries; after that its last draft is handed on, marked as unverified, instead
+of looping. The whole run is capped by `max_turns` agent turns, a
+`token_budget` and a wall-clock `deadline_s`: hitting any of them stops the
+run with what it has so far (validated artifacts stay in the transcript) and
+names the limit in `stop_reason`.
+
+With a `plan_cache`, validated research reports and plans of earlier runs
+for the same trip (same destination, date window, duration and budget; see
+`utils.plan_cache`) are reused: a hit skips the whole stage, and a cached
+plan also makes research unnecessary.
+
+Runs started with a `run_id` are checkpointed after each validated stage
+(via `save_state`, written atomically to `<checkpoint_dir>/<run_id>.json`;
+ids that aren't plain [A-Za-z0-9_-] names are hashed).
+`run(..., run_id=..., resume=True)` restores the validated artifacts and
+restarts at the first incomplete stage, so a crash or a timed-out writer
+costs one stage instead of the whole run. The checkpoint is removed once all
+stages have finished.
+
+The class mirrors the parts of autogen's Team API the app uses
+(`run`, `run_stream`, `reset`), so callers can treat it like any team.
+"""
+import asyncio
+import logging
+import os
+from datetime import date
+from typing import Any, AsyncGenerator, Dict, List, Literal, Optional, Sequence, Tuple, Union
+
+from pydantic import BaseModel, ValidationError
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.base import Response, TaskResult, TerminationCondition
+from autogen_agentchat.messages import (
+    BaseAgentEvent,
+    BaseChatMessage,
+    ModelClientStreamingChunkEvent,
+    TextMessage,
+    ToolCallExecutionEvent,
+    ToolCallRequestEvent,
+)
+from autogen_core import CancellationToken
+from autogen_core.models import AssistantMessage
+
+from agents.validator import ValidatorAgent
+from models.routing import correction_attempt
+from models.scheduler import stage_priority
+from utils.context import (
+    compact_plan,
+    compact_report,
+    estimate_messages_tokens,
+    estimate_tokens,
+    log_compaction,
+    truncate_to_tokens,
+)
+from utils.plan_cache import CACHED_STAGES, PlanCache
+from utils.plan_chunks import PlanChunk, assign_sights, merge_plans, plan_part, skeleton_prompt, split_trip, writer_prompt
+from utils.report_merge import merge_reports
+from utils.telemetry import end_run, metrics, start_run
+from utils.trip_request import TripRequest, parse_trip_request
+from utils.utils import load_state, save_state, state_file_name
+from utils.validation import ItineraryPlan, ResearchReport
+
+StreamItem = Union[BaseAgentEvent, BaseChatMessage, TaskResult]
+
+# Artifact schema of each checkpointed stage
+STAGE_SCHEMAS: Dict[str, type[BaseModel]] = {"research": ResearchReport, "planning": ItineraryPlan, "routing": ItineraryPlan}
+
+
+class StageEvent(BaseAgentEvent):
+    """
+    Emitted by the pipeline at stage boundaries.
+
+    `artifact` holds the validated ResearchReport / ItineraryPlan (as a dict)
+    on "validated" events, so results can be read from the transcript without
+    parsing agent text. `resumed` marks artifacts restored from a checkpoint,
+    `cached` artifacts reused from an earlier run's plan cache entry.
+    """
+    stage: Literal["research", "planning", "routing", "writing"]
+    status: Literal["started", "validated", "rejected", "failed", "completed"]
+    artifact: Optional[Dict[str, Any]] = None
+    resumed: bool = False
+    cached: bool = False
+    type: Literal["StageEvent"] = "StageEvent"
+
+    def to_text(self) -> str:
+        return f"{self.stage} {self.status}"
+
+
+class _StopRun(Exception):
+    """Internal signal: the termination condition fired or a run limit was hit."""
+
+    def __init__(self, reason: str, kind: str = "termination"):
+        super().__init__(reason)
+        self.reason = reason
+        self.kind = kind
+
+
+class TravelPipeline:
+    """
+    Runs researcher → planner → writer as explicit stages with code-based validation.
+
+    Args:
+        researcher: Agent producing a ResearchReport JSON (may use tools).
+        topic_researchers: Optional per-topic researchers (see
+            `agents.researcher.build_topic_researcher`); when given, they run
+            concurrently instead of `researcher` and their reports are merged.
+        chunk_planners: Optional extra planners for long trips: a trip longer
+            than `plan_chunk_days` (with parsed dates) is split into up to one
+            day range per chunk planner, planned concurrently and merged.
+        chunk_writers: Optional extra writers: briefs of plans longer than
+            `plan_chunk_days` are written per day range, concurrently.
+        plan_chunk_days: Longest trip planned / written in one generation (0 = never split).
+        planner: Agent producing an ItineraryPlan JSON.
+        writer: Agent turning the validated plan into the Persian brief.
+        validator: Code-based validator for researcher/planner output.
+        termination_condition: Optional autogen termination condition, checked
+            after every agent turn.
+        planner_context_tokens: Token budget for the research report passed to
+            the planner (lowest-confidence findings are trimmed first).
+        max_stage_attempts: Tries per validated stage before falling back to
+            the last draft.
+        max_turns: Maximum agent turns per run (0 = unlimited).
+        token_budget: Maximum prompt + completion tokens per run (0 = unlimited).
+        deadline_s: Wall-clock limit per run in seconds (0 = unlimited).
+        checkpoint_dir: Where runs with a `run_id` are checkpointed (None = off).
+        parse_request: Pre-parse the request (destination, dates converted from
+            Jalali, duration, budget) and give the result to the researcher and
+            planner as context.
+        plan_cache: Reuse validated research / plans of earlier runs for the
+            same trip (needs `parse_request`; None = off).
+        optimize_routes: Regroup and reorder the validated plan's stops by
+            distance before writing (see utils.route_optimizer).
+        routing_profile: Name of the model routing profile the agents' clients
+            were built with; run latency and tokens are reported under it.
+        name: Name used as the `source` of pipeline events.
+    """
+
+    def __init__(
+        self,
+        researcher: AssistantAgent,
+        planner: AssistantAgent,
+        writer: AssistantAgent,
+        validator: ValidatorAgent,
+        termination_condition: Optional[TerminationCondition] = None,
+        topic_researchers: Sequence[AssistantAgent] = (),
+        chunk_planners: Sequence[AssistantAgent] = (),
+        chunk_writers: Sequence[AssistantAgent] = (),
+        plan_chunk_days: int = 5,
+        planner_context_tokens: int = 3000,
+        max_stage_attempts: int = 3,
+        max_turns: int = 0,
+        token_budget: int = 0,
+        deadline_s: float = 0,
+        checkpoint_dir: Optional[str] = None,
+        parse_request: bool = True,
+        plan_cache: Optional[PlanCache] = None,
+        optimize_routes: bool = True,
+        routing_profile: str = "",
+        name: str = "travel_pipeline",
+        description: str = "",
+    ):
+        self.researcher = researcher
+        self.planner = planner
+        self.writer = writer
+        self.validator = validator
+        self.termination_condition = termination_condition
+        self.topic_researchers = list(topic_researchers)
+        self.chunk_planners = list(chunk_planners)
+        self.chunk_writers = list(chunk_writers)
+        self.plan_chunk_days = plan_chunk_days
+        self.planner_context_tokens = planner_context_tokens
+        self.max_stage_attempts = max(1, max_stage_attempts)
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self.deadline_s = deadline_s
+        self.checkpoint_dir = checkpoint_dir
+        self.parse_request = parse_request
+        self.plan_cache = plan_cache
+        self.optimize_routes = optimize_routes
+        self.routing_profile = routing_profile
+        self.name = name
+        self.description = description
+        self._is_running = False
+        self._transcript: List[Union[BaseAgentEvent, BaseChatMessage]] = []
+        self._recorder: Any = None
+        self._turns = 0
+        self._tokens_used = 0
+        self._deadline: Optional[float] = None
+        self._stop_requested: Optional[str] = None
+        # Checkpointed state of the current run: run id, task text and validated artifacts per stage
+        self._run_id: Optional[str] = None
+        self._task_text = ""
+        self._completed: Dict[str, Dict[str, Any]] = {}
+        # Parsed request of the current run (and its context message) and the stages served from the plan cache
+        self._trip: Optional[TripRequest] = None
+        self._request_context: List[BaseChatMessage] = []
+        self._cached: set[str] = set()
+        # Telemetry of the most recent run (spans, token counts, validation outcomes)
+        self.last_run_telemetry: Dict[str, Any] = {}
+
+    @property
+    def participants(self) -> List[Any]:
+        return [
+            self.researcher, *self.topic_researchers, self.validator,
+            self.planner, *self.chunk_planners, self.writer, *self.chunk_writers,
+        ]
+
+    # --- Public API ---
+    async def run(
+        self,
+        task: Union[str, BaseChatMessage],
+        cancellation_token: Optional[CancellationToken] = None,
+        *,
+        run_id: Optional[str] = None,
+        resume: bool = False,
+    ) -> TaskResult:
+        """
+        Runs the whole pipeline and returns the final TaskResult.
+        """
+        result: Optional[TaskResult] = None
+        async for item in self.run_stream(
+            task=task, cancellation_token=cancellation_token, run_id=run_id, resume=resume
+        ):
+            if isinstance(item, TaskResult):
+                result = item
+        assert result is not None
+        return result
+
+    async def run_stream(
+        self,
+        task: Union[str, BaseChatMessage],
+        cancellation_token: Optional[CancellationToken] = None,
+        *,
+        run_id: Optional[str] = None,
+        resume: bool = False,
+    ) -> AsyncGenerator[StreamItem, None]:
+        """
+        Runs the pipeline, yielding every message and event as it happens and
+        the TaskResult last.
+
+        Args:
+            task: The user's request.
+            cancellation_token: Cancels the run.
+            run_id: Stable id for this run; enables checkpoints when the
+                pipeline has a checkpoint_dir.
+            resume: Restore the checkpoint of `run_id` (if any) and skip the
+                stages it already completed.
+        """
+        if self._is_running:
+            raise ValueError("The pipeline is already running.")
+        self._is_running = True
+        cancellation_token = cancellation_token or CancellationToken()
+        if isinstance(task, str):
+            task = TextMessage(content=task, source="user")
+
+        transcript: List[Union[BaseAgentEvent, BaseChatMessage]] = [task]
+        self._transcript = transcript
+        recorder, context_token = start_run(run_id)
+        self._recorder = recorder
+        stop_reason: Optional[str] = None
+
+        checkpointed = bool(run_id and self.checkpoint_dir)
+        self._run_id, self._task_text, self._completed = run_id, task.to_model_text(), {}
+        if checkpointed and resume:
+            await self._restore_checkpoint()
+        self._request_context = self._parse_request(task)
+        await self._load_cached_stages()
+
+        self._turns = self._tokens_used = 0
+        self._stop_requested = None
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self._deadline = started + self.deadline_s if self.deadline_s else None
+        # Cancelled by the caller's token or, at the deadline, to abort in-flight calls.
+        run_token = CancellationToken()
+        cancellation_token.add_callback(run_token.cancel)
+        deadline_timer = loop.call_at(self._deadline, run_token.cancel) if self._deadline else None
+        try:
+            yield task
+            stages = (
+                ("research", self._research_stage),
+                ("planning", self._planning_stage),
+                *((("routing", self._routing_stage),) if self.optimize_routes else ()),
+                ("writing", self._writing_stage),
+            )
+            previous: Optional[_StageResult] = None
+            names = [stage_name for stage_name, _ in stages]
+            for i, (stage_name, stage) in enumerate(stages):
+                if stage_name not in self._completed and any(n in self._completed for n in names[i + 1:]):
+                    # A later stage's artifact is already known (a cached plan makes research unnecessary).
+                    continue
+                if stage_name in self._completed:
+                    artifact = STAGE_SCHEMAS[stage_name].model_validate(self._completed[stage_name])
+                    previous = _StageResult(artifact)
+                    cached = stage_name in self._cached
+                    event = StageEvent(
+                        source=self.name, stage=stage_name, status="validated",
+                        artifact=self._completed[stage_name], resumed=not cached, cached=cached,
+                    )
+                    recorder.count(f"travel_stages_{'cached' if cached else 'resumed'}_total", stage=stage_name)
+                    transcript.append(event)
+                    yield event
+                    continue
+                stage_started, stage_tokens = loop.time(), self._tokens_used
+                with recorder.span("stage", stage=stage_name), stage_priority(stage_name):
+                    async for item in stage(task, previous, run_token):
+                        if isinstance(item, _StageResult):
+                            previous = item
+                            if item.artifact is not None and stage_name in CACHED_STAGES:
+                                await self._store_cached_stage(
+                                    stage_name, item.artifact, self._tokens_used - stage_tokens,
+                                    loop.time() - stage_started,
+                                )
+                            if checkpointed and item.artifact is not None:
+                                self._completed[stage_name] = item.artifact.model_dump()
+                                await save_state(self, self._checkpoint_path())
+                            continue
+                        if isinstance(item, StageEvent):
+                            recorder.count("travel_stage_events_total", stage=item.stage, status=item.status)
+                        # Like autogen teams, streamed chunks are yielded but not kept in the result.
+                        if not isinstance(item, ModelClientStreamingChunkEvent):
+                            transcript.append(item)
+                        yield item
+                        if isinstance(item, BaseChatMessage):
+                            await self._check_termination(item)
+            stop_reason = self._stop_requested or "Pipeline completed."
+            if checkpointed:
+                await asyncio.to_thread(_remove_file, self._checkpoint_path())
+        except _StopRun as stop:
+            stop_reason = stop.reason
+            recorder.count("travel_run_stops_total", reason=stop.kind)
+        finally:
+            if deadline_timer is not None:
+                deadline_timer.cancel()
+            self._is_running = False
+            recorder.count("travel_run_tokens_total", self._tokens_used, profile=self.routing_profile)
+            if recorder.enabled:
+                metrics.observe("travel_run_seconds", loop.time() - started, profile=self.routing_profile)
+            end_run(recorder, context_token)
+            self.last_run_telemetry = recorder.to_dict()
+        yield TaskResult(messages=transcript, stop_reason=stop_reason)
+
+    async def save_state(self) -> Dict[str, Any]:
+        """
+        Checkpoint of the current run: its id, task and the validated artifact
+        of every completed stage. Agent histories are not needed, since each
+        stage is rebuilt from the artifacts alone.
+        """
+        return {
+            "type": "TravelPipelineState",
+            "version": 1,
+            "run_id": self._run_id,
+            "task": self._task_text,
+            "stages": dict(self._completed),
+        }
+
+    async def load_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restores a checkpoint saved by `save_state` (used by `run(..., resume=True)`).
+        """
+        if state.get("type") != "TravelPipelineState":
+            raise ValueError(f"Not a TravelPipeline checkpoint: {state.get('type')!r}")
+        self._run_id = state["run_id"]
+        self._task_text = state["task"]
+        self._completed = {k: v for k, v in state["stages"].items() if k in STAGE_SCHEMAS}
+
+    async def reset(self) -> None:
+        """
+        Clears every agent's history so the pipeline can serve a new request.
+        """
+        if self._is_running:
+            raise RuntimeError("The pipeline is currently running. It must be stopped before it can be reset.")
+        token = CancellationToken()
+        for agent in self.participants:
+            await agent.on_reset(token)
+        if self.termination_condition is not None:
+            await self.termination_condition.reset()
+
+    # --- Checkpoints ---
+    def _checkpoint_path(self) -> str:
+        return os.path.join(self.checkpoint_dir, state_file_name(self._run_id))
+
+    async def _restore_checkpoint(self) -> None:
+        run_id, task_text = self._run_id, self._task_text
+        if not await load_state(self, self._checkpoint_path()):
+            return
+        if self._run_id != run_id or self._task_text != task_text:
+            # Same id reused for a different request: start over.
+            logging.warning(f"Ignoring checkpoint of run {run_id}: it belongs to a different task.")
+            self._run_id, self._task_text, self._completed = run_id, task_text, {}
+            return
+        logging.info(f"Resuming run {run_id} after stages: {', '.join(self._completed) or 'none'}")
+
+    # --- Stages ---
+    def _parse_request(self, task: BaseChatMessage) -> List[BaseChatMessage]:
+        """
+        The parsed trip request as a context message for researcher and planner ([] if nothing was recognized).
+        """
+        self._trip = None
+        if not self.parse_request:
+            return []
+        with self._recorder.span("parse_request") as span:
+            request = parse_trip_request(task.to_model_text())
+            span.update(**{k: v is not None for k, v in request.model_dump().items()})
+        self._trip = request
+        prompt = request.to_prompt()
+        return [TextMessage(content=prompt, source="request_parser")] if prompt else []
+
+    async def _load_cached_stages(self) -> None:
+        """
+        Marks stages whose artifact the plan cache already holds for this trip as completed.
+        """
+        self._cached = set()
+        if self.plan_cache is None or self._trip is None:
+            return
+        # Latest stage first: a cached plan makes the research before it unnecessary.
+        for stage in reversed(CACHED_STAGES):
+            if stage in self._completed:
+                return
+            try:
+                hit = await self.plan_cache.get(stage, self._trip)
+            except Exception as e:
+                logging.warning(f"Plan cache lookup failed, running the {stage} stage: {e}")
+                return
+            self._recorder.count("travel_plan_cache_total", stage=stage, result="hit" if hit else "miss")
+            if hit is None:
+                continue
+            self._completed[stage] = hit.artifact
+            self._cached.add(stage)
+            self._recorder.count("travel_plan_cache_saved_tokens_total", hit.tokens, stage=stage)
+            self._recorder.count("travel_plan_cache_saved_seconds_total", hit.seconds, stage=stage)
+            logging.info(f"Plan cache hit for {stage}: skipping it (saves ~{hit.tokens} tokens, {hit.seconds:.1f}s)")
+            return
+
+    async def _store_cached_stage(self, stage: str, artifact: BaseModel, tokens: int, seconds: float) -> None:
+        if self.plan_cache is None or self._trip is None:
+            return
+        try:
+            await self.plan_cache.set(stage, self._trip, artifact.model_dump(), tokens, seconds)
+        except Exception as e:
+            # The run itself doesn't depend on the cache.
+            logging.warning(f"Could not cache the {stage} artifact: {e}")
+
+    async def _research_stage(
+        self, task: BaseChatMessage, _: Any, token: CancellationToken
+    ) -> AsyncGenerator[Any, None]:
+        yield StageEvent(source=self.name, stage="research", status="started")
+        inputs = [task, *self._request_context]
+        if self.topic_researchers:
+            async for item in self._sharded_research(inputs, token):
+                yield item
+            return
+        async for item in self._produce_validated(self.researcher, "research", inputs, token):
+            yield item
+
+    async def _sharded_research(
+        self, inputs: Sequence[BaseChatMessage], token: CancellationToken
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Runs every topic researcher concurrently (each with its own validation
+        loop), forwarding their messages as they arrive, then merges the
+        validated reports. Topics that never validated are left out; if none
+        did, their drafts are handed on like a failed single research stage.
+        """
+        results: Dict[str, _StageResult] = {}
+        jobs = [(agent, inputs) for agent in self.topic_researchers]
+        async for item in self._produce_concurrently(jobs, "research", token, results):
+            yield item
+
+        reports = []
+        for agent in self.topic_researchers:
+            result = results[agent.name]
+            self._recorder.count(
+                "travel_research_shards_total", topic=agent.name,
+                outcome="validated" if result.artifact is not None else "failed",
+            )
+            if result.artifact is not None:
+                reports.append(result.artifact)
+        if not reports:
+            self._recorder.count("travel_stage_fallbacks_total", stage="research")
+            yield StageEvent(source=self.name, stage="research", status="failed")
+            yield _StageResult(None, draft="\n\n".join(results[a.name].draft for a in self.topic_researchers))
+            return
+        with self._recorder.span("merge_research", shards=len(reports)):
+            report = merge_reports(reports)
+        yield StageEvent(source=self.name, stage="research", status="validated", artifact=report.model_dump())
+        yield _StageResult(report)
+
+    async def _produce_concurrently(
+        self,
+        jobs: Sequence[Tuple[AssistantAgent, Sequence[BaseChatMessage]]],
+        stage: str,
+        token: CancellationToken,
+        results: Dict[str, "_StageResult"],
+    ) -> AsyncGenerator[Any, None]:
+        """
+        `_produce_validated` for several agents at once, forwarding their
+        messages as they arrive and collecting each agent's _StageResult into
+        `results` (by agent name). Per-agent stage events are left out: the
+        caller reports the combined result.
+        """
+        streams = [self._produce_validated(agent, stage, inputs, token) for agent, inputs in jobs]
+        async for i, item in _fan_out(streams):
+            if isinstance(item, _StageResult):
+                results[jobs[i][0].name] = item
+            elif not isinstance(item, StageEvent):
+                yield item
+
+    async def _planning_stage(
+        self, task: BaseChatMessage, research: "_StageResult", token: CancellationToken
+    ) -> AsyncGenerator[Any, None]:
+        yield StageEvent(source=self.name, stage="planning", status="started")
+        if research.artifact is not None:
+            report_text = compact_report(research.artifact, self.planner_context_tokens)
+        else:
+            report_text = _unverified(truncate_to_tokens(research.draft, self.planner_context_tokens))
+        inputs = [task, *self._request_context, TextMessage(content=report_text, source=self.researcher.name)]
+        log_compaction(self.planner.name, estimate_messages_tokens(self._transcript), estimate_messages_tokens(inputs))
+        chunks = self._plan_chunks()
+        if chunks:
+            async for item in self._chunked_planning(inputs, chunks, token):
+                yield item
+            return
+        async for item in self._produce_validated(self.planner, "planning", inputs, token):
+            yield item
+
+    def _plan_chunks(self) -> List[PlanChunk]:
+        """
+        Day ranges to plan concurrently, or [] when the trip is short (or its dates unknown).
+        """
+        trip = self._trip
+        if not (self.chunk_planners and self.plan_chunk_days and trip and trip.start_date and trip.duration_days):
+            return []
+        if trip.duration_days <= self.plan_chunk_days:
+            return []
+        return split_trip(trip.start_date, trip.duration_days, len(self.chunk_planners))
+
+    async def _chunked_planning(
+        self, inputs: Sequence[BaseChatMessage], chunks: List[PlanChunk], token: CancellationToken
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Plans every chunk concurrently from the shared trip skeleton and merges
+        the parts. If any part fails, the whole trip goes to the single planner.
+        """
+        sights = assign_sights(self._trip.destination, chunks)
+        jobs = [
+            (agent, [*inputs, TextMessage(content=skeleton_prompt(chunk, chunks, sights), source="trip_skeleton")])
+            for agent, chunk in zip(self.chunk_planners, chunks)
+        ]
+        results: Dict[str, _StageResult] = {}
+        async for item in self._produce_concurrently(jobs, "planning", token, results):
+            yield item
+
+        parts = [results[agent.name].artifact for agent, _ in jobs]
+        complete = [p is not None and len(p.days) == c.days for p, c in zip(parts, chunks)]
+        self._recorder.count("travel_plan_chunks_total", len(chunks), outcome="planned")
+        if not all(complete):
+            self._recorder.count("travel_plan_chunks_total", complete.count(False), outcome="failed")
+            logging.warning(f"{complete.count(False)} of {len(chunks)} plan chunks failed; planning the trip in one go.")
+            async for item in self._produce_validated(self.planner, "planning", inputs, token):
+                yield item
+            return
+        with self._recorder.span("merge_plan", chunks=len(chunks)):
+            plan = merge_plans(parts, chunks)
+        yield StageEvent(source=self.name, stage="planning", status="validated", artifact=plan.model_dump())
+        yield _StageResult(plan)
+
+    async def _routing_stage(
+        self, task: BaseChatMessage, planning: "_StageResult", token: CancellationToken
+    ) -> AsyncGenerator[Any, None]:
+        if planning.artifact is None:
+            # Unverified drafts have no stops to work with.
+            yield planning
+            return
+        yield StageEvent(source=self.name, stage="routing", status="started")
+        # NumPy is only needed from here on.
+        from utils.route_optimizer import optimize_plan
+
+        with self._recorder.span("route_optimization") as span:
+            plan, report = optimize_plan(planning.artifact)
+            span.update(
+                km_before=report.km_before, km_after=report.km_after, moved=report.moved,
+                regrouped_days=len(report.regrouped_days), resolved=report.resolved, unresolved=report.unresolved,
+            )
+        for day in report.days:
+            logging.info(f"Route {day.date}: {day.km_before:.1f} km → {day.km_after:.1f} km")
+        self._recorder.count("travel_route_km_total", report.km_before, phase="before")
+        self._recorder.count("travel_route_km_total", report.km_after, phase="after")
+        yield StageEvent(source=self.name, stage="routing", status="validated", artifact=plan.model_dump())
+        yield _StageResult(plan)
+
+    async def _writing_stage(
+        self, task: BaseChatMessage, planning: "_StageResult", token: CancellationToken
+    ) -> AsyncGenerator[Any, None]:
+        yield StageEvent(source=self.name, stage="writing", status="started")
+        # Drafts are bounded by the model's max_tokens, so they go through untrimmed like plans.
+        plan = planning.artifact
+        if plan is not None and self.chunk_writers and self.plan_chunk_days and len(plan.days) > self.plan_chunk_days:
+            async for item in self._chunked_writing(plan, token):
+                yield item
+            yield StageEvent(source=self.name, stage="writing", status="completed")
+            return
+        plan_text = compact_plan(plan) if plan is not None else _unverified(planning.draft)
+        inputs = [TextMessage(content=plan_text, source=self.planner.name)]
+        log_compaction(self.writer.name, estimate_messages_tokens(self._transcript), estimate_messages_tokens(inputs))
+        async for item in self._agent_turn(self.writer, inputs, token):
+            yield item.chat_message if isinstance(item, Response) else item
+        yield StageEvent(source=self.name, stage="writing", status="completed")
+
+    async def _chunked_writing(self, plan: ItineraryPlan, token: CancellationToken) -> AsyncGenerator[Any, None]:
+        """
+        Writes the brief of each chunk of days concurrently. Streamed text is
+        forwarded in trip order as the writer's: the first unfinished chunk
+        streams live, later ones are buffered until it is done. Ends with the
+        joined brief as one writer message.
+        """
+        # Only the day ranges matter here, not their dates.
+        chunks = split_trip(date.min, len(plan.days), len(self.chunk_writers))
+        streams = [
+            self._agent_turn(writer, [
+                TextMessage(content=compact_plan(plan_part(plan, chunk)), source=self.planner.name),
+                TextMessage(content=writer_prompt(chunk, plan.total_est_cost_toman), source="trip_skeleton"),
+            ], token)
+            for writer, chunk in zip(self.chunk_writers, chunks)
+        ]
+        texts = [""] * len(chunks)
+        done = [False] * len(chunks)
+        buffered: List[List[ModelClientStreamingChunkEvent]] = [[] for _ in chunks]
+        head = 0
+        async for i, item in _fan_out(streams):
+            if isinstance(item, Response):
+                texts[i], done[i] = item.chat_message.to_model_text(), True
+            elif isinstance(item, ModelClientStreamingChunkEvent):
+                chunk_event = ModelClientStreamingChunkEvent(content=item.content, source=self.writer.name)
+                if i == head:
+                    yield chunk_event
+                else:
+                    buffered[i].append(chunk_event)
+            else:
+                yield item
+            while head < len(chunks) and done[head]:
+                head += 1
+                if head < len(chunks):
+                    for chunk_event in buffered[head]:
+                        yield chunk_event
+                    buffered[head] = []
+        self._recorder.count("travel_brief_chunks_total", len(chunks))
+        yield TextMessage(content="\n\n".join(text.strip() for text in texts), source=self.writer.name)
+
+    async def _produce_validated(
+        self,
+        agent: AssistantAgent,
+        stage: str,
+        inputs: Sequence[BaseChatMessage],
+        token: CancellationToken,
+    ) -> AsyncGenerator[Any, None]:
+        """
+        Runs `agent` until its output passes the validator, feeding each failed
+        verdict back to the same agent, for at most `max_stage_attempts` tries.
+        Ends with a _StageResult carrying the artifact, or only the last draft
+        when every attempt was rejected.
+
+        Streamed output is validated item by item while it is generated; on the
+        first item that can't be repaired the generation is cancelled and the
+        exact error goes back to the agent right away.
+        """
+        draft: Optional[BaseChatMessage] = None
+        for attempt in range(1, self.max_stage_attempts + 1):
+            checker = self.validator.stream_validator(agent.name)
+            turn_token = CancellationToken()
+            token.add_callback(turn_token.cancel)
+            response: Optional[Response] = None
+            early_verdict: Optional[str] = None
+            turn = self._agent_turn(agent, inputs, turn_token)
+            try:
+                # Corrections may run on the cheaper "retry" model route.
+                with correction_attempt(attempt > 1):
+                    async for item in turn:
+                        if isinstance(item, Response):
+                            response = item
+                            continue
+                        yield item
+                        if checker is None:
+                            continue
+                        if isinstance(item, ToolCallExecutionEvent):
+                            # Tool results are in; the next generation starts from scratch.
+                            checker = self.validator.stream_validator(agent.name)
+                        elif isinstance(item, ModelClientStreamingChunkEvent):
+                            early_verdict = checker.feed(item.content)
+                            if early_verdict:
+                                turn_token.cancel()
+                                break
+            except ValidationError:
+                # Structured output that still misses the schema (e.g. cut off at
+                # max_tokens): validate the raw draft so it can be repaired or sent back.
+                response = Response(chat_message=TextMessage(content=await _last_draft(agent), source=agent.name))
+            finally:
+                await turn.aclose()
+
+            if early_verdict:
+                self._recorder.count("travel_stream_aborts_total", stage=stage)
+                draft = TextMessage(content=checker.scanner.text, source=agent.name)
+                yield draft
+                verdict, artifact = TextMessage(content=early_verdict, source=self.validator.name), None
+            else:
+                draft = response.chat_message
+                yield draft
+                verdict, artifact = self.validator.check(draft)
+            yield verdict
+            if artifact is not None:
+                yield StageEvent(source=self.name, stage=stage, status="validated", artifact=artifact.model_dump())
+                yield _StageResult(artifact)
+                return
+            if attempt < self.max_stage_attempts:
+                yield StageEvent(source=self.name, stage=stage, status="rejected")
+                # A cancelled generation never reached the agent's model context: show it what was stopped.
+                inputs = [_stopped_output(draft), verdict] if early_verdict else [verdict]
+
+        # Out of attempts: hand the last draft on instead of looping further.
+        self._recorder.count("travel_stage_fallbacks_total", stage=stage)
+        yield StageEvent(source=self.name, stage=stage, status="failed")
+        yield _StageResult(None, draft=draft.to_model_text())
+
+    async def _agent_turn(
+        self,
+        agent: AssistantAgent,
+        inputs: Sequence[BaseChatMessage],
+        token: CancellationToken,
+    ) -> AsyncGenerator[Union[BaseAgentEvent, BaseChatMessage, Response], None]:
+        """
+        One agent turn: forwards the agent's inner events (tool calls, streamed
+        chunks) and ends with its Response. Records wall time, token usage and
+        tool-call counts for the turn, and charges it against the run limits.
+        A turn closed early by the caller is charged an estimate of what was streamed.
+
+        The turn and an estimate of its prompt are reserved before the model is
+        called and settled to the actual usage afterwards, so concurrent turns
+        (fan-out stages) see each other and can't overshoot the limits together.
+        """
+        self._check_limits(inputs)
+        reserved = estimate_messages_tokens(inputs)
+        self._turns += 1
+        self._tokens_used += reserved
+        recorder = self._recorder
+        with recorder.span("agent_turn", agent=agent.name) as span:
+            prompt_tokens = completion_tokens = tool_calls = 0
+            streamed: List[str] = []
+            finished = False
+            stream = agent.on_messages_stream(inputs, token)
+            try:
+                async for item in stream:
+                    usage = getattr(item.chat_message if isinstance(item, Response) else item, "models_usage", None)
+                    if usage is not None:
+                        prompt_tokens += usage.prompt_tokens
+                        completion_tokens += usage.completion_tokens
+                    if isinstance(item, ToolCallRequestEvent):
+                        tool_calls += len(item.content)
+                    elif isinstance(item, ModelClientStreamingChunkEvent):
+                        streamed.append(item.content)
+                    finished = isinstance(item, Response)
+                    yield item
+            except asyncio.CancelledError:
+                # The deadline timer cancelled the run token; anything else is a real cancellation.
+                if self._deadline_passed() and not asyncio.current_task().cancelling():
+                    raise _StopRun(f"Deadline of {self.deadline_s:g}s exceeded.", kind="deadline") from None
+                raise
+            finally:
+                if not finished:
+                    completion_tokens += estimate_tokens("".join(streamed))
+                    span["aborted"] = True
+                    await stream.aclose()
+                self._tokens_used += prompt_tokens + completion_tokens - reserved
+            span.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, tool_calls=tool_calls)
+        recorder.count("travel_agent_turns_total", agent=agent.name)
+        recorder.count("travel_prompt_tokens_total", prompt_tokens, agent=agent.name)
+        recorder.count("travel_completion_tokens_total", completion_tokens, agent=agent.name)
+        recorder.count("travel_tool_calls_total", tool_calls, agent=agent.name)
+
+    def _deadline_passed(self) -> bool:
+        return self._deadline is not None and asyncio.get_running_loop().time() >= self._deadline
+
+    def _check_limits(self, inputs: Sequence[BaseChatMessage]) -> None:
+        """
+        Stops the run before the next turn once the termination condition fired
+        or the turn would exceed the turn, token or time limit. Turns still in
+        flight count with their reserved tokens.
+        """
+        if self._stop_requested:
+            raise _StopRun(self._stop_requested)
+        if self.max_turns and self._turns >= self.max_turns:
+            raise _StopRun(f"Turn limit of {self.max_turns} agent turns reached.", kind="turns")
+        if self.token_budget and self._tokens_used + estimate_messages_tokens(inputs) > self.token_budget:
+            raise _StopRun(
+                f"Token budget of {self.token_budget} exhausted ({self._tokens_used} used).", kind="tokens"
+            )
+        if self._deadline_passed():
+            raise _StopRun(f"Deadline of {self.deadline_s:g}s exceeded.", kind="deadline")
+
+    async def _check_termination(self, message: BaseChatMessage) -> None:
+        """
+        Like autogen teams, a fired condition takes effect before the next agent
+        turn; the current stage still finishes its bookkeeping.
+        """
+        if self.termination_condition is None or self._stop_requested:
+            return
+        stop = await self.termination_condition([message])
+        if stop is not None:
+            self._stop_requested = stop.content
+
+
+class _FanOutError:
+    """Internal marker: a stream run by `_fan_out` raised."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_FAN_OUT_DONE = object()
+
+
+async def _fan_out(streams: Sequence[AsyncGenerator[Any, None]]) -> AsyncGenerator[Tuple[int, Any], None]:
+    """
+    Runs async generators concurrently and yields (index, item) in arrival
+    order. The first error cancels the other streams and is re-raised.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def drain(index: int, stream: AsyncGenerator[Any, None]) -> None:
+        try:
+            async for item in stream:
+                await queue.put((index, item))
+            await queue.put((index, _FAN_OUT_DONE))
+        except BaseException as e:
+            await queue.put((index, _FanOutError(e)))
+            raise
+        finally:
+            await stream.aclose()
+
+    tasks = [asyncio.create_task(drain(i, stream)) for i, stream in enumerate(streams)]
+    try:
+        pending = len(tasks)
+        while pending:
+            index, item = await queue.get()
+            if item is _FAN_OUT_DONE:
+                pending -= 1
+            elif isinstance(item, _FanOutError):
+                raise item.error
+            else:
+                yield index, item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class _StageResult:
+    """
+    Internal marker carrying a stage's result to the next stage: the validated
+    artifact, or None plus the last rejected draft when the stage ran out of attempts.
+    """
+
+    def __init__(self, artifact: Optional[BaseModel], draft: str = ""):
+        self.artifact = artifact
+        self.draft = draft
+
+
+async def _last_draft(agent: AssistantAgent) -> str:
+    """The agent's most recent raw model output, from its own context."""
+    for message in reversed(await agent.model_context.get_messages()):
+        if isinstance(message, AssistantMessage) and isinstance(message.content, str):
+            return message.content
+    return ""
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _stopped_output(draft: BaseChatMessage) -> TextMessage:
+    return TextMessage(
+        content="YOUR OUTPUT SO FAR (stopped by the validator before it was finished):\n\n" + draft.to_model_text(),
+        source=draft.source,
+    )
+
+
+def _unverified(draft: str) -> str:
+    return (
+        "UNVERIFIED DRAFT: this output failed validation. Use it as a best effort, "
+        "treat its facts as uncertain and say so where it matters.\n\n" + draft
+    )
+
+
+def stage_artifacts(messages: Sequence[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the last validated artifact per stage found in a transcript
+    (e.g. {"research": {...}, "planning": {...}}).
+    """
+    artifacts: Dict[str, Dict[str, Any]] = {}
+    for msg in messages:
+        if isinstance(msg, StageEvent) and msg.status == "validated" and msg.artifact is not None:
+            artifacts[msg.stage] = msg.artifact
+    return artifacts
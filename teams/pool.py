@@ -0,0 +1,109 @@
+"""
+A warm pool of pre-built travel teams for long-running services.
+
+Teams are built once, handed out to one request at a time, and reset before
+they go back to the pool so message history never accumulates across
+requests. A bounded wait queue in front of the pool provides admission
+control: when too many requests are already waiting, new ones are rejected
+immediately instead of piling up.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+from teams.travel_team import build_travel_team
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the pool's wait queue is full and a request cannot be admitted."""
+
+
+class TeamPool:
+    """
+    Fixed-size pool of reusable teams with a bounded wait queue.
+
+    Args:
+        size: Number of teams kept warm (= maximum concurrent runs).
+        max_queue: Maximum number of requests allowed to wait for a free team.
+        factory: Coroutine function that builds one team.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        max_queue: int,
+        factory: Callable[[], Awaitable[Any]] = build_travel_team,
+    ):
+        self.size = size
+        self.max_queue = max_queue
+        self._factory = factory
+        self._idle: Optional[asyncio.Queue] = None
+        self._waiting = 0
+        self._served = 0
+        self._rejected = 0
+        self._failed_resets = 0
+
+    async def start(self) -> None:
+        """
+        Build all teams up front so the first requests do not pay for construction.
+        """
+        self._idle = asyncio.Queue()
+        teams = await asyncio.gather(*(self._factory() for _ in range(self.size)))
+        for team in teams:
+            self._idle.put_nowait(team)
+
+    @asynccontextmanager
+    async def team(self) -> AsyncIterator[Any]:
+        """
+        Borrow a team for one run; it is reset and returned to the pool afterwards.
+
+        Raises:
+            PoolSaturatedError: if `max_queue` requests are already waiting.
+        """
+        if self._idle is None:
+            raise RuntimeError("TeamPool.start() must be awaited before use.")
+        if self._idle.empty() and self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise PoolSaturatedError(f"{self._waiting} requests already waiting for a team.")
+
+        self._waiting += 1
+        try:
+            team = await self._idle.get()
+        finally:
+            self._waiting -= 1
+
+        try:
+            yield team
+        finally:
+            self._served += 1
+            # Never hand out a dirty team: reset before it goes back to the pool.
+            await self._release(team)
+
+    async def _release(self, team: Any) -> None:
+        try:
+            await team.reset()
+        except Exception as e:
+            # A team that cannot be reset (e.g. a run was cancelled mid-turn) is replaced.
+            self._failed_resets += 1
+            logging.warning(f"Team reset failed, rebuilding it: {e}")
+            try:
+                team = await self._factory()
+            except Exception as build_error:
+                self.size -= 1
+                logging.error(f"Could not rebuild team, pool shrinks to {self.size}: {build_error}")
+                return
+        self._idle.put_nowait(team)
+
+    def stats(self) -> Dict[str, int]:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {
+            "size": self.size,
+            "idle": idle,
+            "busy": self.size - idle,
+            "waiting": self._waiting,
+            "max_queue": self.max_queue,
+            "served": self._served,
+            "rejected": self._rejected,
+            "failed_resets": self._failed_resets,
+        }
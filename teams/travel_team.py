@@ -1,139 +1,160 @@
 """
-Assembles the advanced travel planning team using a SelectorGroupChat.
+Assembles the travel planning team as a deterministic stage pipeline.
 
-This module defines the final team structure, orchestrating the agents
-(researcher, planner, writer, validator) using a custom, code-based
-selector function to ensure a robust and predictable workflow.
+This module wires the agents (researcher, planner, writer, validator) into a
+`TravelPipeline`, which runs research → validation → planning → validation →
+writing as explicit typed stages, and offers helpers to stream progress and
+read the final artifacts of a run.
 """
-from typing import Sequence, Optional
+from dataclasses import dataclass
+from typing import AsyncGenerator, Sequence, Optional, Tuple
 
-from autogen_agentchat.teams import SelectorGroupChat
-from autogen_agentchat.messages import BaseChatMessage
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import BaseChatMessage, ModelClientStreamingChunkEvent
 
 # Import agent and client builders
-from models.GoogleModel import model_client
+from config.settings import get_app_config, get_google_config
+from models.GoogleModel import get_agent_client
 from agents.planner import build_planner
-from agents.researcher import build_researcher
+from agents.researcher import RESEARCH_TOPICS, build_researcher, build_topic_researcher
 from agents.writer import build_writer
 from agents.validator import build_validator
+from teams.pipeline import StageEvent, TravelPipeline, stage_artifacts
+from utils.plan_cache import get_plan_cache
 from utils.utils import get_termination_conditions
+from utils.validation import ItineraryPlan
 
-# --- Helper Functions for the Selector ---
-def _last_source(history: Sequence[BaseChatMessage]) -> str:
+# Stage event → PlanEvent stage name
+_STAGE_NAMES = {"research": "research", "planning": "plan", "routing": "routing", "writing": "writing"}
+
+# --- Result Helpers ---
+def extract_outputs(messages: Sequence[BaseChatMessage]) -> Tuple[Optional[str], Optional[ItineraryPlan]]:
     """
-    Safely retrieves the source (sender name) of the last message in the chat history.
+    Pulls the final artifacts out of a finished run's transcript.
 
     Args:
-        history: The sequence of messages from the chat.
+        messages: The messages of a `TaskResult`.
 
     Returns:
-        The name of the last speaker, or an empty string if the history is empty.
+        (brief, plan): the writer's last Persian brief and the itinerary that
+        the validator accepted; either may be None.
+    """
+    brief: Optional[str] = None
+    for msg in messages:
+        if isinstance(msg, BaseChatMessage) and msg.source == "writer" and isinstance(getattr(msg, "content", None), str):
+            brief = msg.content
+    artifacts = stage_artifacts(messages)
+    # The route-optimized plan supersedes the planner's own order.
+    plan_data = artifacts.get("routing") or artifacts.get("planning")
+    plan = ItineraryPlan.model_validate(plan_data) if plan_data else None
+    return brief, plan
+
+# --- Streaming ---
+@dataclass
+class PlanEvent:
+    """
+    A progress event emitted by `stream_plan`.
+
+    kind is one of:
+      - "stage": `text` is a stage name (research_started, research_validated,
+        research_rejected, plan_started, plan_validated, plan_rejected, routing_started, routing_validated,
+        writing_started)
+      - "token": `text` is a chunk of the writer's Persian brief
+      - "done": `result` holds the final TaskResult
     """
-    return getattr(history[-1], "source", "") if history else ""
+    kind: str
+    text: str = ""
+    result: Optional[TaskResult] = None
 
-def _validation_state(msg: BaseChatMessage) -> Optional[str]:
+
+async def stream_plan(team, task) -> AsyncGenerator[PlanEvent, None]:
     """
-    Parses a validator's message content to determine the validation outcome.
+    Runs the team via `run_stream` and yields stage events followed by the
+    writer's tokens as they arrive, ending with a "done" event.
 
     Args:
-        msg: The message object from the validator agent.
-
-    Returns:
-        'success', 'failure', 'skipped', or None if the state cannot be determined.
+        team: A team built by `build_travel_team`.
+        task: The user task (string or TextMessage).
     """
-    content = (getattr(msg, "content", "") or "")
-    if "VALIDATION_SUCCESS" in content:
-        return "success"
-    if "VALIDATION_FAILURE" in content:
-        return "failure"
-    if "VALIDATION_SKIPPED" in content:
-        return "skipped"
-    return None
-
-# --- Core Selection Logic ---
-async def selector_func(messages: Sequence[BaseChatMessage]) -> Optional[str]:
+    async for item in team.run_stream(task=task):
+        if isinstance(item, TaskResult):
+            # Keep consuming: the team only leaves its running state once run_stream is exhausted.
+            yield PlanEvent(kind="done", result=item)
+        elif isinstance(item, StageEvent):
+            if item.status != "completed":
+                yield PlanEvent(kind="stage", text=f"{_STAGE_NAMES[item.stage]}_{item.status}")
+        elif isinstance(item, ModelClientStreamingChunkEvent) and item.source == "writer":
+            yield PlanEvent(kind="token", text=item.content)
+
+# --- Team Factory ---
+def _turn_limit(app_cfg, shards: int, chunk_workers: int) -> int:
     """
-    The main traffic controller for the group chat.
-
-    This function is called after every message and decides which agent should speak next.
-    It implements a deterministic workflow:
-    1. Researcher produces a report.
-    2. Validator checks the report.
-    3. Planner produces an itinerary.
-    4. Validator checks the itinerary.
-    5. Writer produces the final text.
-    It also includes a self-correction loop if validation fails.
+    MAX_TURNS budgets the sequential path (researcher, planner and writer, with
+    their correction attempts). Fan-out stages run more turns than that: every
+    topic researcher and chunk planner may use MAX_STAGE_ATTEMPTS turns (the
+    single planner stays budgeted as the fallback of chunked planning), and a
+    chunked brief takes one turn per writer.
     """
-    # Rule: If the chat has just begun, the researcher starts the process.
-    if not messages or len(messages) <= 1:
-        return "researcher"
-    
-    last = messages[-1]
-    src = _last_source(messages)
-
-    # Rule: After the user speaks, the researcher always begins the workflow.
-    if src == "user":
-        return "researcher"
-
-    # Rule: After the researcher produces its report, the validator must check it.
-    if src == "researcher":
-        return "validator"
-
-    # Rule: After the planner produces its itinerary, the validator must check it.
-    if src == "planner":
-        return "validator"
-
-    # Rule: After the validator speaks, decide the next step based on the outcome.
-    if src == "validator":
-        state = _validation_state(last)
-        content = last.content or ""
-
-        # Check what was being validated by looking for keywords in the validator's message.
-        if "ResearchReport" in content:
-            # If the research report was validated successfully, move to the planner.
-            # Otherwise, send it back to the researcher for correction.
-            return "planner" if state == "success" else "researcher"
-        
-        if "ItineraryPlan" in content:
-            # If the itinerary was validated successfully, move to the writer.
-            # Otherwise, send it back to the planner for correction.
-            return "writer" if state == "success" else "planner"
-        
-        # Fallback if the validator's message is unclear.
-        return "researcher"
-
-    # Rule: After the writer has produced the final output, the conversation is over.
-    if src == "writer":
-        return None # Returning None is a valid way to terminate the chat.
-
-    # Default fallback to the researcher if the state is unknown.
-    return "researcher"
+    if not app_cfg.MAX_TURNS:
+        return 0
+    attempts = app_cfg.MAX_STAGE_ATTEMPTS
+    return app_cfg.MAX_TURNS + attempts * max(0, shards - 1) + attempts * chunk_workers + max(0, chunk_workers - 1)
 
-# --- Team Factory ---
-async def build_travel_team():
+
+async def build_travel_team(client=None, search_tools=None) -> TravelPipeline:
     """
-    Builds and configures the complete, selector-driven travel planning team.
+    Builds and configures the complete travel planning pipeline.
+
+    This function assembles all the specialized agents and wires them into a
+    `TravelPipeline`, which runs them as explicit, code-driven stages.
 
-    This function assembles all the specialized agents and orchestrates them
-    within a SelectorGroupChat controlled by our custom `selector_func`.
+    Args:
+        client: Chat completion client for all agents (defaults to one client per agent,
+            configured by the model routing profile; see AgentModelConfig).
+        search_tools: Tools for the researcher (defaults to the Tavily web search tools).
 
     Returns:
-        An instance of SelectorGroupChat ready to process tasks.
+        A TravelPipeline ready to process tasks (run / run_stream / reset).
     """
-    # 1. Build all the specialized agents.
-    researcher = await build_researcher(model_client) 
-    planner = await build_planner(model_client)        
-    writer = await build_writer(model_client)       
-    validator = build_validator()                   
-
-    # 2. Configure the SelectorGroupChat.
-    team = SelectorGroupChat(
-        participants=[researcher, validator, planner, writer],
-        selector_func=selector_func,
-        model_client=model_client,
-        allow_repeated_speaker=True, # Essential for the self-correction loop.
+    app_cfg = get_app_config()
+    # 1. Build all the specialized agents, each on its own model route unless one client is given.
+    if client is None:
+        routing_profile = get_google_config().ROUTING_PROFILE
+        clients = {route: get_agent_client(route) for route in ("researcher", "planner", "writer")}
+    else:
+        routing_profile = "custom"
+        clients = dict.fromkeys(("researcher", "planner", "writer"), client)
+    researcher = await build_researcher(clients["researcher"], tools=search_tools)
+    topic_researchers = [
+        await build_topic_researcher(clients["researcher"], topic, tools=search_tools) for topic in RESEARCH_TOPICS
+    ] if app_cfg.RESEARCH_SHARDED else []
+    planner = await build_planner(clients["planner"])
+    writer = await build_writer(clients["writer"])
+    workers = range(1, app_cfg.PLAN_CHUNK_WORKERS + 1) if app_cfg.PLAN_CHUNK_DAYS else range(0)
+    chunk_planners = [await build_planner(clients["planner"], name=f"planner_{n}") for n in workers]
+    chunk_writers = [await build_writer(clients["writer"], name=f"writer_{n}") for n in workers]
+    validator = build_validator()
+
+    # 2. Wire them into the stage pipeline (no selector model calls involved).
+    team = TravelPipeline(
+        researcher=researcher,
+        planner=planner,
+        writer=writer,
+        validator=validator,
         termination_condition=get_termination_conditions(),
-        name="travel_team_selector",
-        description="A flat travel planning team with a code-based validation workflow.",
+        topic_researchers=topic_researchers,
+        chunk_planners=chunk_planners,
+        chunk_writers=chunk_writers,
+        plan_chunk_days=app_cfg.PLAN_CHUNK_DAYS,
+        planner_context_tokens=app_cfg.PLANNER_CONTEXT_TOKENS,
+        max_stage_attempts=app_cfg.MAX_STAGE_ATTEMPTS,
+        max_turns=_turn_limit(app_cfg, len(topic_researchers), len(chunk_planners)),
+        token_budget=app_cfg.RUN_TOKEN_BUDGET,
+        deadline_s=app_cfg.RUN_DEADLINE_S,
+        checkpoint_dir=app_cfg.CHECKPOINT_DIR or None,
+        plan_cache=get_plan_cache(),
+        routing_profile=routing_profile,
+        name="travel_pipeline",
+        description="A travel planning pipeline with a code-based validation workflow.",
     )
     return team
\ No newline at end of file
@@ -0,0 +1,24 @@
+import argparse
+import pytest
+from benchmarks.run_bench import bench_level
+
+
+def _args(**overrides):
+    defaults = dict(runs=3, latency=0.0, search_latency=0.0, invalid_rate=0.0, error_rate=0.0, seed=0)
+    defaults.update(overrides)
+    return argparse.Namespace(**defaults)
+
+
+@pytest.mark.asyncio
+async def test_offline_benchmark_runs_full_pipeline():
+    summary = await bench_level(_args(), concurrency=2)
+    assert summary["failures"] == 0
+    # researcher, validator, planner, validator, writer
+    assert summary["avg_turns"] == 5
+    assert set(summary["avg_stage_ms"]) == {"research", "planning", "routing", "writing"}
+
+
+@pytest.mark.asyncio
+async def test_offline_benchmark_counts_injected_failures():
+    summary = await bench_level(_args(error_rate=1.0), concurrency=1)
+    assert summary["failures"] == 3
@@ -0,0 +1,26 @@
+from utils.context import compact_report, estimate_tokens
+from utils.validation import ResearchReport
+
+
+def _report():
+    return ResearchReport(
+        findings=[
+            {"topic": f"topic {i}", "bullets": ["x" * 200], "sources": [], "confidence": c}
+            for i, c in enumerate([0.9, 0.2, 0.6])
+        ],
+        risks=["heat"],
+        verification=["call the museum"],
+    )
+
+
+def test_compact_report_is_minified_within_budget():
+    text = compact_report(_report(), budget_tokens=10_000)
+    assert ", " not in text and ": " not in text
+    assert text.count('"topic"') == 3
+
+
+def test_compact_report_drops_lowest_confidence_first():
+    text = compact_report(_report(), budget_tokens=160)
+    assert estimate_tokens(text) <= 160
+    assert "topic 0" in text and "topic 2" in text
+    assert "topic 1" not in text
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+from autogen_core import CancellationToken
+from autogen_core.models import CreateResult, SystemMessage, UserMessage
+
+from benchmarks.fakes import FakeChatCompletionClient
+from models.hedging import HedgedChatCompletionClient
+from models.scheduler import RateLimitScheduler, ScheduledChatCompletionClient
+
+MESSAGES = [SystemMessage(content="You are a travel planner agent."), UserMessage(content="trip", source="user")]
+
+
+class _ScriptedLatency(FakeChatCompletionClient):
+    """Fake client whose n-th call takes latencies[n] seconds; keeps every call's token."""
+
+    def __init__(self, latencies):
+        super().__init__()
+        self.latencies = list(latencies)
+        self.tokens = []
+
+    async def create(self, messages, *, cancellation_token=None, **kwargs):
+        self.latency = self.latencies[len(self.tokens)]
+        self.tokens.append(cancellation_token)
+        return await super().create(messages, cancellation_token=cancellation_token, **kwargs)
+
+
+def _warm(client: HedgedChatCompletionClient, kind: str, latency: float, n: int = 20) -> None:
+    client.calls += n
+    client._latencies[kind].extend([latency] * n)
+
+
+@pytest.mark.asyncio
+async def test_straggler_is_hedged_and_loser_cancelled():
+    inner = _ScriptedLatency([5.0, 0.01])
+    client = HedgedChatCompletionClient(inner, min_delay=0.05)
+    _warm(client, "create", 0.01)
+
+    started = asyncio.get_running_loop().time()
+    result = await client.create(MESSAGES)
+    assert isinstance(result, CreateResult)
+    assert asyncio.get_running_loop().time() - started < 1
+    assert inner.tokens[0].is_cancelled() and not inner.tokens[1].is_cancelled()
+    assert (client.hedges, client.hedge_wins) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_before_warm_up_or_over_budget():
+    client = HedgedChatCompletionClient(_ScriptedLatency([0.1]), min_delay=0.01)
+    await client.create(MESSAGES)
+    assert client.hedges == 0
+
+    client = HedgedChatCompletionClient(_ScriptedLatency([0.1]), min_delay=0.01, max_ratio=0.0)
+    _warm(client, "create", 0.01)
+    await client.create(MESSAGES)
+    assert client.hedges == 0
+
+
+@pytest.mark.asyncio
+async def test_caller_token_cancels_every_attempt():
+    inner = _ScriptedLatency([5.0, 5.0])
+    client = HedgedChatCompletionClient(inner, min_delay=0.01)
+    _warm(client, "create", 0.01)
+    token = CancellationToken()
+
+    call = asyncio.ensure_future(client.create(MESSAGES, cancellation_token=token))
+    await asyncio.sleep(0.1)
+    token.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await call
+    assert len(inner.tokens) == 2 and all(t.is_cancelled() for t in inner.tokens)
+
+
+@pytest.mark.asyncio
+async def test_stream_races_on_first_chunk():
+    inner = _ScriptedLatency([5.0, 0.01])
+    client = HedgedChatCompletionClient(inner, min_delay=0.05)
+    _warm(client, "stream", 0.01)
+
+    items = [item async for item in client.create_stream(MESSAGES)]
+    assert isinstance(items[-1], CreateResult)
+    assert "".join(items[:-1]) == items[-1].content
+    assert client.hedge_wins == 1 and inner.tokens[0].is_cancelled()
+
+
+@pytest.mark.asyncio
+async def test_hedges_take_scheduler_quota_and_wait_for_headroom():
+    scheduler = RateLimitScheduler(rpm=600, tpm=0)
+    inner = _ScriptedLatency([5.0, 0.01])
+    client = HedgedChatCompletionClient(ScheduledChatCompletionClient(inner, scheduler), min_delay=0.05, scheduler=scheduler)
+    _warm(client, "create", 0.01)
+    await client.create(MESSAGES)
+    assert client.hedges == 1 and scheduler.requests.level < 599
+
+    # The primary used the only request of this minute: the hedge is skipped instead of queueing for quota.
+    scheduler = RateLimitScheduler(rpm=1, tpm=0)
+    inner = _ScriptedLatency([0.2])
+    client = HedgedChatCompletionClient(ScheduledChatCompletionClient(inner, scheduler), min_delay=0.05, scheduler=scheduler)
+    _warm(client, "create", 0.01)
+    await client.create(MESSAGES)
+    assert (client.hedges, client.hedges_skipped, len(inner.tokens)) == (0, 1, 1)
@@ -0,0 +1,62 @@
+from datetime import date, timedelta
+
+import pytest
+
+from utils.jalali import gregorian_to_jalali, is_jalali_leap, jalali_to_gregorian
+from utils.trip_request import parse_trip_request
+
+
+@pytest.mark.parametrize("jalali, gregorian", [
+    ((1404, 6, 11), date(2025, 9, 2)),
+    ((1403, 1, 1), date(2024, 3, 20)),
+    ((1403, 12, 30), date(2025, 3, 20)),
+    ((1399, 12, 30), date(2021, 3, 20)),
+    ((1357, 11, 22), date(1979, 2, 11)),
+])
+def test_known_dates(jalali, gregorian):
+    assert jalali_to_gregorian(*jalali) == gregorian
+    assert gregorian_to_jalali(gregorian) == jalali
+
+
+def test_round_trip_and_leap_years():
+    day = date(1990, 1, 1)
+    while day < date(2060, 1, 1):
+        assert jalali_to_gregorian(*gregorian_to_jalali(day)) == day
+        day += timedelta(days=1)
+    assert [y for y in range(1395, 1411) if is_jalali_leap(y)] == [1395, 1399, 1403, 1408]
+    with pytest.raises(ValueError):
+        jalali_to_gregorian(1404, 12, 30)
+
+
+def test_parses_example_request():
+    request = parse_trip_request("یک برنامه سفر به همدان بهم بده؛ من در تاریخ 11 شهریور 1404 می‌رم همدان")
+    assert request.destination == "همدان"
+    assert request.start_date == date(2025, 9, 2)
+    assert "2025-09-02" in request.to_prompt()
+
+
+def test_parses_persian_digits_range_duration_and_budget():
+    request = parse_trip_request("سفر اقتصادی به کرمانشاه از ۵ تا ۹ مهر ماه ۱۴۰۴")
+    assert (request.destination, request.budget_level) == ("کرمانشاه", "budget")
+    assert (request.start_date, request.end_date, request.duration_days) == (date(2025, 9, 27), date(2025, 10, 1), 5)
+
+    request = parse_trip_request("سه شب شیراز از ۱۱ شهریور", today=date(2025, 10, 1))
+    # No year given and the date has passed: next year's 11 Shahrivar
+    assert request.start_date == date(2026, 9, 2)
+    assert request.duration_days == 4
+    assert parse_trip_request("hello").to_prompt() == ""
+
+
+@pytest.mark.parametrize("text, days", [
+    ("سفر دو هفته ای به شیراز", 14),
+    ("a trip to Shiraz for two weeks", 14),
+    ("یک هفته تبریز", 7),
+    ("a week in Isfahan", 7),
+    ("چهارده روز اصفهان", 14),
+    ("بیست و یک روز در کیش", 21),
+    ("twenty-one days in Yazd", 21),
+    # "next week" is a date, not a trip length
+    ("هفته آینده میرم یزد", None),
+])
+def test_parses_durations(text, days):
+    assert parse_trip_request(text).duration_days == days
@@ -0,0 +1,57 @@
+import json
+
+from agents.validator import build_validator
+from autogen_agentchat.messages import StructuredMessage, TextMessage
+from utils.validation import ItineraryPlan, ResearchReport
+from utils.validation_utils import parse_json_with_model
+
+PLAN = {
+    "currency": "toman",
+    "overview": "سفر به همدان",
+    "days": [
+        {"date": "2025-09-02", "summary": "s", "morning": [], "afternoon": [], "evening": [], "est_cost_toman": 1200000.0},
+        {"date": "2025-09-03", "summary": "s", "morning": [], "afternoon": [], "evening": [], "est_cost_toman": "۸۰۰٬۰۰۰ تومان"},
+    ],
+    "total_est_cost_toman": 1,
+}
+
+
+def test_mechanical_plan_mistakes_are_repaired_locally():
+    text = "Here is the plan:\n" + json.dumps(PLAN, ensure_ascii=False)[:-1] + ",}\nThanks!"
+    plan, verdict = parse_json_with_model(text, ItineraryPlan)
+    assert verdict.startswith("VALIDATION_SUCCESS")
+    assert plan.currency == "TOMAN"
+    assert [d.est_cost_toman for d in plan.days] == [1200000, 800000]
+    assert plan.total_est_cost_toman == 2000000
+
+
+def test_percentage_confidence_is_scaled():
+    report = {"findings": [{"topic": "t", "bullets": [], "sources": [], "confidence": "85%"}], "risks": [], "verification": []}
+    parsed, _ = parse_json_with_model(json.dumps(report), ResearchReport)
+    assert parsed.findings[0].confidence == 0.85
+
+
+def test_unrepairable_output_names_only_failing_fields():
+    plan = dict(PLAN, days=[dict(PLAN["days"][0], est_cost_toman="about a million")])
+    verdict, artifact = build_validator().check(TextMessage(content=json.dumps(plan), source="planner"))
+    assert artifact is None
+    assert verdict.content.startswith("VALIDATION_FAILURE")
+    assert verdict.content.count("\n- ") == 1 and "days.0.est_cost_toman" in verdict.content
+
+
+def test_wrong_total_of_an_otherwise_valid_plan_is_reconciled():
+    plan = dict(PLAN, currency="TOMAN", days=[dict(d, est_cost_toman=500000) for d in PLAN["days"]], total_est_cost_toman=7)
+    parsed, verdict = parse_json_with_model(json.dumps(plan), ItineraryPlan)
+    assert verdict.startswith("VALIDATION_SUCCESS") and "local fix" in verdict
+    assert parsed.total_est_cost_toman == 1000000
+
+
+def test_structured_plan_gets_the_same_total_repair():
+    days = [dict(d, est_cost_toman=500) for d in PLAN["days"]]
+    structured = StructuredMessage[ItineraryPlan](
+        content=ItineraryPlan.model_validate(dict(PLAN, currency="TOMAN", days=days, total_est_cost_toman=7)),
+        source="planner",
+    )
+    verdict, artifact = build_validator().check(structured)
+    assert verdict.content.startswith("VALIDATION_SUCCESS") and "local fix" in verdict.content
+    assert artifact.total_est_cost_toman == 1000 and structured.content.total_est_cost_toman == 7
@@ -0,0 +1,29 @@
+from utils.json_stream import JSONScanner, find_json_object
+from utils.validation import ResearchReport
+from utils.validation_utils import StreamingValidator, extract_json
+
+
+def test_scanner_reports_closed_objects_with_paths():
+    scanner = JSONScanner()
+    text = 'Sure: {"a": "{not: [an object]}", "days": [{"x": 1}, {"y": [{"z": 2}]}]} trailing'
+    closed = []
+    for i in range(0, len(text), 5):
+        closed += scanner.feed(text[i:i + 5])
+    assert [path for path, _ in closed] == [("days", 0), ("days", 1, "y", 0), ("days", 1), ()]
+    assert closed[0][1] == '{"x": 1}'
+    assert scanner.done
+
+
+def test_extract_json_is_linear_and_string_aware():
+    assert extract_json('```json\n{"a": "}"}\n``` and {"b": 2}') == '{"a": "}"}'
+    assert find_json_object('{"unterminated": [1, 2') is None
+    assert extract_json("no json here") == "no json here"
+
+
+def test_streaming_validator_stops_on_first_unrepairable_finding():
+    validator = StreamingValidator(ResearchReport)
+    good = '{"topic": "t", "bullets": [], "sources": [], "confidence": "80%"}'
+    bad = '{"topic": "t", "bullets": "oops", "sources": [], "confidence": 0.5}'
+    assert validator.feed('{"currency": "TOMAN", "findings": [' + good + ", ") is None  # repairable
+    verdict = validator.feed(bad)
+    assert verdict.startswith("VALIDATION_FAILURE") and "findings.1.bullets" in verdict
@@ -0,0 +1,40 @@
+import pytest
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from models.cached_client import CacheMissError, CachingChatCompletionClient
+from models.GoogleModel import MODEL_INFO
+from utils.kv_store import SQLiteStore
+
+
+@pytest.mark.asyncio
+async def test_record_then_replay_offline(tmp_path):
+    store = SQLiteStore(str(tmp_path / "completions.sqlite3"))
+    prompt = [UserMessage(content="سلام", source="user")]
+
+    recorder = CachingChatCompletionClient(
+        ReplayChatCompletionClient(["first"], model_info=MODEL_INFO), store, mode="record"
+    )
+    assert (await recorder.create(prompt)).content == "first"
+    assert (await recorder.create(prompt)).cached is True  # served without calling the model again
+
+    # A client with no scripted responses left would fail if it were called.
+    replayer = CachingChatCompletionClient(
+        ReplayChatCompletionClient([], model_info=MODEL_INFO), store, mode="replay"
+    )
+    chunks = [c async for c in replayer.create_stream(prompt)]
+    assert chunks[0] == "first" and chunks[-1].content == "first"
+
+    with pytest.raises(CacheMissError):
+        await replayer.create([UserMessage(content="other", source="user")])
+
+
+@pytest.mark.asyncio
+async def test_cache_key_includes_create_args(tmp_path):
+    client = CachingChatCompletionClient(
+        ReplayChatCompletionClient([], model_info=MODEL_INFO), SQLiteStore(str(tmp_path / "c.sqlite3"))
+    )
+    prompt = [UserMessage(content="x", source="user")]
+    k1 = client.cache_key(prompt, [], "auto", None, {"temperature": 0.2})
+    k2 = client.cache_key(prompt, [], "auto", None, {"temperature": 0.7})
+    assert k1 != k2
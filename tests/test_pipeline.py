@@ -0,0 +1,389 @@
+import asyncio
+import contextvars
+import json
+import time
+
+import pytest
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, StructuredMessage, TextMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from agents.planner import build_planner
+from agents.researcher import RESEARCH_TOPICS, build_researcher, build_topic_researcher
+from agents.validator import build_validator
+from agents.writer import build_writer
+from benchmarks.fakes import FakeChatCompletionClient, make_fake_search_tools
+from models.GoogleModel import MODEL_INFO
+from models.routing import RoutedChatCompletionClient, _correction, correction_attempt
+from teams.pipeline import StageEvent, TravelPipeline
+from config.settings import get_app_config
+from teams.travel_team import build_travel_team, extract_outputs
+from utils.kv_store import SQLiteStore
+from utils.plan_cache import PlanCache
+
+REPORT = json.dumps({
+    "currency": "TOMAN",
+    "findings": [{"topic": "Weather", "bullets": ["Mild"], "sources": [{"name": "n", "url": "https://x"}], "confidence": 0.8}],
+    "risks": [],
+    "verification": [],
+})
+PLAN = json.dumps({
+    "currency": "TOMAN",
+    "overview": "سفر به همدان",
+    "days": [{"date": "2025-09-02", "summary": "s", "morning": ["Ganjnameh"], "afternoon": [], "evening": [], "est_cost_toman": 100}],
+    "total_est_cost_toman": 100,
+})
+
+
+async def _pipeline(responses, **limits):
+    client = ReplayChatCompletionClient(responses, model_info=MODEL_INFO)
+    return TravelPipeline(
+        researcher=await build_researcher(client),
+        planner=await build_planner(client),
+        writer=await build_writer(client),
+        validator=build_validator(),
+        **limits,
+    )
+
+
+@pytest.mark.asyncio
+async def test_pipeline_runs_stages_in_order():
+    pipeline = await _pipeline([REPORT, PLAN, "برنامه سفر پایان"])
+    result = await pipeline.run(task="trip to Hamedan")
+
+    stages = [(m.stage, m.status) for m in result.messages if isinstance(m, StageEvent)]
+    assert stages == [
+        ("research", "started"), ("research", "validated"),
+        ("planning", "started"), ("planning", "validated"),
+        ("routing", "started"), ("routing", "validated"),
+        ("writing", "started"), ("writing", "completed"),
+    ]
+    brief, plan = extract_outputs(result.messages)
+    assert brief == "برنامه سفر پایان"
+    assert plan.total_est_cost_toman == 100
+
+
+@pytest.mark.asyncio
+async def test_structured_plan_with_wrong_total_is_reconciled_before_the_writer():
+    wrong_total = json.dumps(dict(json.loads(PLAN), total_est_cost_toman=7))
+    pipeline = await _pipeline([REPORT, wrong_total, "برنامه سفر پایان"])
+    result = await pipeline.run(task="trip to Hamedan")
+
+    assert any(isinstance(m, StructuredMessage) and m.source == "planner" for m in result.messages)
+    verdict = next(m.content for m in result.messages if m.source == "validator" and "ItineraryPlan" in m.content)
+    assert "local fix" in verdict
+    # Both the planning artifact (cached, handed to routing and the writer) and the final plan carry the sum of the days.
+    planned = next(m.artifact for m in result.messages if isinstance(m, StageEvent) and m.stage == "planning" and m.status == "validated")
+    assert planned["total_est_cost_toman"] == 100
+    assert extract_outputs(result.messages)[1].total_est_cost_toman == 100
+
+
+@pytest.mark.asyncio
+async def test_pipeline_sends_failed_validation_back_to_same_agent():
+    pipeline = await _pipeline(["not json", REPORT, PLAN, "done"])
+    result = await pipeline.run(task="trip to Hamedan")
+
+    statuses = [(m.stage, m.status) for m in result.messages if isinstance(m, StageEvent)]
+    assert ("research", "rejected") in statuses
+    assert [m.source for m in result.messages if not isinstance(m, StageEvent)][:5] == [
+        "user", "researcher", "validator", "researcher", "validator",
+    ]
+    assert extract_outputs(result.messages)[1] is not None
+
+
+@pytest.mark.asyncio
+async def test_correction_attempts_use_retry_route():
+    planner_client = ReplayChatCompletionClient(["not json"], model_info=MODEL_INFO)
+    retry_client = ReplayChatCompletionClient([PLAN], model_info=MODEL_INFO)
+    client = ReplayChatCompletionClient([REPORT, "done"], model_info=MODEL_INFO)
+    pipeline = TravelPipeline(
+        researcher=await build_researcher(client),
+        planner=await build_planner(RoutedChatCompletionClient(planner_client, retry_client, route="planner")),
+        writer=await build_writer(client),
+        validator=build_validator(),
+        routing_profile="test",
+    )
+    result = await pipeline.run(task="trip to Hamedan")
+
+    assert extract_outputs(result.messages)[1].total_est_cost_toman == 100
+    counters = pipeline.last_run_telemetry["counters"]
+    assert counters['travel_model_calls_total{model="",route="planner"}'] == 1
+    assert counters['travel_model_calls_total{model="",route="retry"}'] == 1
+    assert 'travel_run_tokens_total{profile="test"}' in counters
+
+
+@pytest.mark.asyncio
+async def test_correction_flag_survives_generator_closed_in_another_context():
+    async def turn():
+        with correction_attempt(True):
+            yield "chunk"
+            yield "more"
+
+    async def close_elsewhere():
+        stream = turn()
+        assert await stream.__anext__() == "chunk"
+        assert _correction.get() is True
+        # Closing from another context (as GC finalization or a fan-out task does) must not raise.
+        closing = contextvars.copy_context()
+        await asyncio.create_task(stream.aclose(), context=closing)
+        return closing[_correction]
+
+    # Runs in its own context copy, so the flag can't leak into other tests.
+    assert await asyncio.create_task(close_elsewhere()) is False
+
+
+@pytest.mark.asyncio
+async def test_pipeline_reset_clears_agent_history():
+    pipeline = await _pipeline([REPORT, PLAN, "done"] * 2)
+    await pipeline.run(task="trip")
+    await pipeline.reset()
+    assert len(await pipeline.planner.model_context.get_messages()) == 0
+
+
+@pytest.mark.asyncio
+async def test_rejected_stage_falls_back_to_last_draft():
+    pipeline = await _pipeline(["not json", "still not json", PLAN, "done"], max_stage_attempts=2)
+    result = await pipeline.run(task="trip to Hamedan")
+
+    statuses = [(m.stage, m.status) for m in result.messages if isinstance(m, StageEvent)]
+    assert ("research", "rejected") in statuses and ("research", "failed") in statuses
+    assert ("writing", "completed") in statuses
+    planner_input = await pipeline.planner.model_context.get_messages()
+    draft = next(m.content for m in planner_input if "UNVERIFIED DRAFT" in m.content)
+    assert "still not json" in draft
+
+
+@pytest.mark.asyncio
+async def test_turn_and_token_limits_stop_the_run():
+    pipeline = await _pipeline(["not json"] * 5, max_stage_attempts=5, max_turns=2)
+    result = await pipeline.run(task="trip")
+    assert result.stop_reason.startswith("Turn limit")
+    assert len([m for m in result.messages if m.source == "researcher"]) == 2
+
+    pipeline = await _pipeline([REPORT, PLAN, "done"], token_budget=1)
+    result = await pipeline.run(task="trip")
+    assert result.stop_reason.startswith("Token budget")
+
+
+@pytest.mark.asyncio
+async def test_deadline_cancels_in_flight_call():
+    client = FakeChatCompletionClient(latency=5)
+    pipeline = TravelPipeline(
+        researcher=await build_researcher(client, tools=make_fake_search_tools()),
+        planner=await build_planner(client),
+        writer=await build_writer(client),
+        validator=build_validator(),
+        deadline_s=0.1,
+    )
+    started = time.perf_counter()
+    result = await pipeline.run(task="trip")
+    assert result.stop_reason.startswith("Deadline")
+    assert time.perf_counter() - started < 2
+
+
+class _ChunkedReplayClient(ReplayChatCompletionClient):
+    """Consumes its response when a stream starts, like a real API call, then streams it word by word."""
+
+    async def create_stream(self, messages, **kwargs):
+        result = await self.create(messages, **kwargs)
+        for word in result.content.split(" "):
+            yield word + " "
+        yield result
+
+
+@pytest.mark.asyncio
+async def test_invalid_item_aborts_generation_early():
+    bad_day = {"date": "2025-09-02", "summary": {"not": "a string"}, "morning": [], "afternoon": [], "evening": [], "est_cost_toman": 1}
+    bad_plan = json.dumps({"currency": "TOMAN", "overview": "x", "days": [bad_day] + [json.loads(PLAN)["days"][0]] * 50, "total_est_cost_toman": 1})
+    client = _ChunkedReplayClient([REPORT, bad_plan, PLAN, "done"], model_info=MODEL_INFO)
+    pipeline = TravelPipeline(
+        researcher=await build_researcher(client),
+        planner=await build_planner(client),
+        writer=await build_writer(client),
+        validator=build_validator(),
+    )
+    result = await pipeline.run(task="trip")
+
+    verdicts = [m.content for m in result.messages if m.source == "validator"]
+    assert "stopped early" in verdicts[1] and "days.0.summary" in verdicts[1]
+    aborted_draft = [m.content for m in result.messages if m.source == "planner" and isinstance(m, TextMessage)][0]
+    assert len(aborted_draft) < len(bad_plan) / 10
+    # The correction shows the planner the output it never got to finish.
+    context = [m.content for m in await pipeline.planner.model_context.get_messages() if isinstance(m.content, str)]
+    assert any(aborted_draft in c and "stopped by the validator" in c for c in context)
+    assert extract_outputs(result.messages)[1] is not None
+
+
+@pytest.mark.asyncio
+async def test_resume_restarts_at_first_incomplete_stage(tmp_path):
+    # The writer has no scripted reply left, so the first run crashes in the writing stage.
+    pipeline = await _pipeline([REPORT, PLAN], checkpoint_dir=str(tmp_path))
+    with pytest.raises(ValueError):
+        await pipeline.run(task="trip to Hamedan", run_id="trip-1")
+    assert (tmp_path / "trip-1.json").exists()
+
+    resumed = await _pipeline(["برنامه پایان"], checkpoint_dir=str(tmp_path))
+    result = await resumed.run(task="trip to Hamedan", run_id="trip-1", resume=True)
+
+    events = [(m.stage, m.status, m.resumed) for m in result.messages if isinstance(m, StageEvent)]
+    assert events[:2] == [("research", "validated", True), ("planning", "validated", True)]
+    brief, plan = extract_outputs(result.messages)
+    assert brief == "برنامه پایان" and plan.total_est_cost_toman == 100
+    assert not (tmp_path / "trip-1.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_stays_inside_checkpoint_dir(tmp_path):
+    checkpoints = tmp_path / "checkpoints"
+    pipeline = await _pipeline([REPORT, PLAN], checkpoint_dir=str(checkpoints))
+    with pytest.raises(ValueError):
+        await pipeline.run(task="trip to Hamedan", run_id="../escaped")
+    assert not (tmp_path / "escaped.json").exists()
+    assert len(list(checkpoints.glob("*.json"))) == 1
+
+    # A pipeline that only had a checkpoint loaded into it has no request context yet.
+    resumed = await _pipeline(["برنامه پایان"], checkpoint_dir=str(checkpoints))
+    await resumed.load_state(json.loads(next(checkpoints.glob("*.json")).read_text(encoding="utf-8")))
+    assert resumed._request_context == [] and "research" in resumed._completed
+
+
+@pytest.mark.asyncio
+async def test_plan_cache_skips_stages_for_the_same_trip(tmp_path):
+    cache = PlanCache(SQLiteStore(str(tmp_path / "plans.sqlite3")))
+    first = await _pipeline([REPORT, PLAN, "برنامه اول"], plan_cache=cache)
+    await first.run(task="یک روز همدان از 11 شهریور 1404")
+
+    # Same month and length, another start date: the cached plan is re-dated and nothing but the writer runs.
+    second = await _pipeline(["برنامه دوم"], plan_cache=cache)
+    result = await second.run(task="یک روز همدان از 15 شهریور 1404")
+    events = [(m.stage, m.status, m.cached) for m in result.messages if isinstance(m, StageEvent)]
+    assert events[0] == ("planning", "validated", True)
+    assert all(stage != "research" for stage, _, _ in events)
+    assert extract_outputs(result.messages)[1].days[0].date == "2025-09-06"
+
+    # A longer trip needs a new plan, but the research report is still fresh.
+    third = await _pipeline([PLAN, "برنامه سوم"], plan_cache=cache)
+    result = await third.run(task="دو روز همدان از 20 شهریور 1404")
+    events = [(m.stage, m.status, m.cached) for m in result.messages if isinstance(m, StageEvent)]
+    assert events[:2] == [("research", "validated", True), ("planning", "started", False)]
+
+    stats = cache.stats()
+    assert (stats["research_hits"], stats["research_misses"]) == (1, 1)
+    assert (stats["planning_hits"], stats["planning_misses"]) == (1, 2)
+    assert stats["planning_saved_tokens"] > 0
+
+
+@pytest.mark.asyncio
+async def test_topic_researchers_run_concurrently_and_merge():
+    client = FakeChatCompletionClient(latency=0.1)
+    tools = make_fake_search_tools()
+    pipeline = TravelPipeline(
+        researcher=await build_researcher(client, tools=tools),
+        topic_researchers=[await build_topic_researcher(client, topic, tools=tools) for topic in RESEARCH_TOPICS],
+        planner=await build_planner(client),
+        writer=await build_writer(client),
+        validator=build_validator(),
+    )
+    started = time.perf_counter()
+    result = await pipeline.run(task="trip to Hamedan")
+
+    # Four topics × (search call + report): sequentially 0.8s of model time for research alone.
+    assert time.perf_counter() - started < 0.75
+    research = [m for m in result.messages if isinstance(m, StageEvent) and m.stage == "research"]
+    assert [m.status for m in research] == ["started", "validated"]
+    # Every topic returned the same canned report; the merge keeps each finding once.
+    topics = [f["topic"] for f in research[-1].artifact["findings"]]
+    assert topics == ["Transport", "Weather", "Attractions", "Costs"]
+    assert len(research[-1].artifact["findings"][0]["sources"]) == 1
+    verdicts = [m for m in result.messages if m.source == "validator"]
+    assert len(verdicts) == len(RESEARCH_TOPICS) + 1
+
+
+def _plan_days(n):
+    return json.dumps({
+        "currency": "TOMAN",
+        "overview": "بخشی از سفر",
+        "days": [
+            {"date": "2025-09-02", "summary": "s", "morning": ["Ganjnameh"], "afternoon": [], "evening": [], "est_cost_toman": 100}
+            for _ in range(n)
+        ],
+        "total_est_cost_toman": 100 * n,
+    })
+
+
+@pytest.mark.asyncio
+async def test_long_trip_is_planned_and_written_in_chunks():
+    client = ReplayChatCompletionClient(
+        [REPORT, _plan_days(5), _plan_days(5), "روز ۱ تا ۵ گنجنامه", "روز ۶ تا ۱۰ بودجه پایان"], model_info=MODEL_INFO
+    )
+    pipeline = TravelPipeline(
+        researcher=await build_researcher(client),
+        planner=await build_planner(client),
+        writer=await build_writer(client),
+        validator=build_validator(),
+        chunk_planners=[await build_planner(client, name=f"planner_{n}") for n in (1, 2)],
+        chunk_writers=[await build_writer(client, name=f"writer_{n}") for n in (1, 2)],
+        plan_chunk_days=5,
+    )
+    streamed = []
+    async for item in pipeline.run_stream(task="ده روز همدان از 11 شهریور 1404"):
+        if isinstance(item, ModelClientStreamingChunkEvent) and item.source == "writer":
+            streamed.append(item.content)
+        elif isinstance(item, TaskResult):
+            result = item
+
+    brief, plan = extract_outputs(result.messages)
+    assert [d.date for d in plan.days] == [f"2025-09-{d:02d}" for d in range(2, 12)]
+    assert plan.total_est_cost_toman == 1000
+    assert sorted(brief.split("\n\n")) == sorted(["روز ۱ تا ۵ گنجنامه", "روز ۶ تا ۱۰ بودجه پایان"])
+    # Streamed in trip order, as one writer.
+    assert "".join(streamed).replace(" ", "") == brief.replace("\n\n", "").replace(" ", "")
+    context = await pipeline.chunk_planners[1].model_context.get_messages()
+    assert any("PART 2 of 2" in str(m.content) for m in context)
+
+
+class _SlowReplayClient(_ChunkedReplayClient):
+    """Takes a moment per call, so concurrent turns are really in flight together."""
+
+    async def create(self, messages, **kwargs):
+        await asyncio.sleep(0.01)
+        return await super().create(messages, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_turns_reserve_the_turn_limit():
+    client = _SlowReplayClient([REPORT] + [_plan_days(4)] * 3, model_info=MODEL_INFO)
+    pipeline = TravelPipeline(
+        researcher=await build_researcher(client),
+        planner=await build_planner(client),
+        writer=await build_writer(client),
+        validator=build_validator(),
+        chunk_planners=[await build_planner(client, name=f"planner_{n}") for n in (1, 2, 3)],
+        plan_chunk_days=5,
+        max_turns=3,
+    )
+    result = await pipeline.run(task="دوازده روز همدان از 11 شهریور 1404")
+    assert result.stop_reason.startswith("Turn limit")
+    # Research plus two of the three concurrent chunk planners; the third was refused before starting.
+    assert pipeline._turns == 3
+
+
+@pytest.fixture
+def sharded_config(monkeypatch):
+    monkeypatch.setenv("RESEARCH_SHARDED", "true")
+    monkeypatch.setenv("CHECKPOINT_DIR", "")
+    get_app_config.cache_clear()
+    yield get_app_config()
+    get_app_config.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_long_sharded_trip_reaches_the_writer_within_the_turn_limit(sharded_config):
+    team = await build_travel_team(FakeChatCompletionClient(), search_tools=make_fake_search_tools())
+    assert team.max_turns > sharded_config.MAX_TURNS
+    result = await team.run(task="چهارده روز همدان از 11 شهریور 1404")
+
+    assert not result.stop_reason.startswith("Turn limit")
+    brief, plan = extract_outputs(result.messages)
+    assert len(plan.days) == 14 and brief.count("«روز ۱»") == sharded_config.PLAN_CHUNK_WORKERS
+    assert len(team.topic_researchers) == len(RESEARCH_TOPICS)
@@ -0,0 +1,41 @@
+from datetime import date
+
+from utils.plan_chunks import assign_sights, merge_plans, plan_part, skeleton_prompt, split_trip
+from utils.validation import ItineraryPlan
+
+
+def _part(dates, cost=100):
+    return ItineraryPlan.model_validate({
+        "overview": "بخش",
+        "days": [
+            {"date": d, "summary": "s", "morning": [], "afternoon": [], "evening": [], "est_cost_toman": cost}
+            for d in dates
+        ],
+        "total_est_cost_toman": 1,
+    })
+
+
+def test_split_trip_into_near_equal_ranges():
+    chunks = split_trip(date(2025, 9, 2), 14, 3)
+    assert [(c.first_day, c.last_day) for c in chunks] == [(1, 5), (6, 10), (11, 14)]
+    assert chunks[1].dates[0] == "2025-09-07" and chunks[2].dates[-1] == "2025-09-15"
+    assert len(split_trip(date(2025, 9, 2), 2, 3)) == 2
+
+
+def test_merge_redates_and_retotals():
+    chunks = split_trip(date(2025, 9, 2), 5, 2)
+    # The second part got its dates wrong; the skeleton's dates win.
+    plan = merge_plans([_part(["2025-09-02"] * 3), _part(["2030-01-01", "2030-01-02"], cost=50)], chunks)
+    assert [d.date for d in plan.days] == ["2025-09-02", "2025-09-03", "2025-09-04", "2025-09-05", "2025-09-06"]
+    assert plan.total_est_cost_toman == 400
+    assert plan_part(plan, chunks[1]).total_est_cost_toman == 100
+
+
+def test_skeleton_splits_known_sights_between_parts():
+    chunks = split_trip(date(2025, 9, 2), 8, 2)
+    sights = assign_sights("اصفهان", chunks)
+    assert sorted(len(group) for group in sights.values()) == [6, 7]
+    assert not set(sights[1]) & set(sights[2])
+    prompt = skeleton_prompt(chunks[1], chunks, sights)
+    assert "PART 2 of 2" in prompt and "days 5-8 (2025-09-06 to 2025-09-09)  <- YOURS" in prompt
+    assert assign_sights("رشت", chunks) == {}
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from teams.pool import TeamPool, PoolSaturatedError
+
+
+class FakeTeam:
+    def __init__(self):
+        self.resets = 0
+
+    async def reset(self):
+        self.resets += 1
+
+
+async def fake_factory():
+    return FakeTeam()
+
+
+@pytest.mark.asyncio
+async def test_pool_resets_teams_between_requests():
+    pool = TeamPool(size=1, max_queue=1, factory=fake_factory)
+    await pool.start()
+    async with pool.team() as first:
+        pass
+    async with pool.team() as second:
+        assert second is first
+    assert first.resets == 2
+    assert pool.stats()["served"] == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_rejects_when_queue_is_full():
+    pool = TeamPool(size=1, max_queue=1, factory=fake_factory)
+    await pool.start()
+    release = asyncio.Event()
+
+    async def hold():
+        async with pool.team():
+            await release.wait()
+
+    holder = asyncio.create_task(hold())
+    waiter = asyncio.create_task(hold())
+    await asyncio.sleep(0)
+    assert pool.stats()["waiting"] == 1
+
+    with pytest.raises(PoolSaturatedError):
+        async with pool.team():
+            pass
+    release.set()
+    await asyncio.gather(holder, waiter)
+    assert pool.stats()["rejected"] == 1
@@ -0,0 +1,37 @@
+from agents.validator import build_validator
+from autogen_agentchat.messages import TextMessage
+from utils.report_merge import canonical_url, merge_reports
+from utils.validation import ResearchReport
+
+
+def _report(topic, bullets, urls, confidence=0.5, risks=()):
+    return ResearchReport.model_validate({
+        "findings": [{
+            "topic": topic, "bullets": bullets, "confidence": confidence,
+            "sources": [{"name": url, "url": url} for url in urls],
+        }],
+        "risks": list(risks),
+        "verification": [],
+    })
+
+
+def test_merge_combines_topics_and_deduplicates():
+    merged = merge_reports([
+        _report("Transport", ["Buses hourly"], ["https://www.example.com/bus/"], 0.6, risks=["Hot afternoons"]),
+        _report("Weather", ["Mild nights"], ["https://weather.example"], 0.9),
+        _report("transport", ["buses  hourly", "Trains daily"], ["https://example.com/bus", "https://rail.example"], 0.8,
+                risks=["hot afternoons", "Pickpockets in the bazaar"]),
+    ])
+    assert [f.topic for f in merged.findings] == ["Transport", "Weather"]
+    transport = merged.findings[0]
+    assert transport.bullets == ["Buses hourly", "Trains daily"]
+    assert [s.url for s in transport.sources] == ["https://www.example.com/bus/", "https://rail.example"]
+    assert transport.confidence == 0.8
+    assert merged.risks == ["Hot afternoons", "Pickpockets in the bazaar"]
+    assert canonical_url("HTTPS://WWW.Example.com/a/#top") == "https://example.com/a"
+
+
+def test_topic_researcher_output_uses_research_schema():
+    report = _report("Costs", ["Hotels from 2,000,000"], ["https://x.example"])
+    verdict, artifact = build_validator().check(TextMessage(content=report.model_dump_json(), source="researcher_costs"))
+    assert artifact == report and "SUCCESS" in verdict.content
@@ -0,0 +1,79 @@
+import numpy as np
+
+from utils.gazetteer import resolve_place
+from utils.route_optimizer import distance_matrix, optimize_plan, path_length, shortest_path
+from utils.validation import ItineraryPlan
+
+
+def _plan(days):
+    return ItineraryPlan.model_validate({
+        "currency": "TOMAN",
+        "overview": "سفر",
+        "days": [
+            {"date": f"2025-09-0{i + 2}", "summary": "s", "morning": m, "afternoon": a, "evening": e, "est_cost_toman": 100}
+            for i, (m, a, e) in enumerate(days)
+        ],
+        "total_est_cost_toman": 100 * len(days),
+    })
+
+
+def test_resolves_persian_and_english_names():
+    assert resolve_place("بازدید از آرامگاه بوعلی‌سینا").name == "آرامگاه بوعلی سینا"
+    assert resolve_place("Visit Ganjnameh inscriptions").city == "همدان"
+    assert resolve_place("ناهار در رستوران محلی") is None
+
+    ganjnameh, avicenna = resolve_place("گنجنامه"), resolve_place("avicenna")
+    km = distance_matrix([(ganjnameh.lat, ganjnameh.lon), (avicenna.lat, avicenna.lon)])
+    assert 6 < km[0, 1] < 9 and km[0, 0] == 0
+
+
+def test_shortest_path_on_a_line():
+    points = np.array([(34.0, 48.0 + x) for x in (0.3, 0.0, 0.4, 0.1, 0.2)])
+    dist = distance_matrix(points)
+    order = shortest_path(dist)
+    assert order in ([1, 3, 4, 0, 2], [2, 0, 4, 3, 1])
+    assert path_length(dist, order) < path_length(dist, range(5))
+
+
+def test_regroups_days_and_keeps_unknown_stops_in_place():
+    plan = _plan([
+        (["غار علیصدر", "آرامگاه باباطاهر"], ["ناهار در رستوران سنتی"], ["تپه هگمتانه"]),
+        (["گنجنامه"], ["لالجین"], ["تله‌کابین عباس‌آباد"]),
+    ])
+    optimized, report = optimize_plan(plan)
+
+    assert report.km_after < report.km_before
+    assert report.resolved == 6 and report.unresolved == 1
+    # The meal stays where the planner put it, and each slot keeps its size.
+    assert optimized.days[0].afternoon[0] == "ناهار در رستوران سنتی"
+    for old, new in zip(plan.days, optimized.days):
+        assert [len(old.morning), len(old.afternoon), len(old.evening)] == [len(new.morning), len(new.afternoon), len(new.evening)]
+    # The two stops north of the city end up on the same day.
+    day_of = {stop: d for d, day in enumerate(optimized.days) for stop in day.morning + day.afternoon + day.evening}
+    assert day_of["غار علیصدر"] == day_of["لالجین"]
+    # Days whose sights changed get a summary naming their new sights, not the planner's.
+    assert report.regrouped_days == [day.date for day in optimized.days]
+    north = optimized.days[day_of["غار علیصدر"]]
+    assert "غار علیصدر" in north.summary and "لالجین" in north.summary
+    assert "غار علیصدر" not in optimized.days[1 - day_of["غار علیصدر"]].summary
+    # The input plan is not modified.
+    assert plan.days[0].morning == ["غار علیصدر", "آرامگاه باباطاهر"]
+
+
+def test_never_moves_stops_between_cities():
+    plan = _plan([
+        (["گنجنامه"], ["غار علیصدر"], ["تپه هگمتانه"]),
+        (["کاخ چهلستون"], ["منارجنبان"], ["پل خواجو"]),
+    ])
+    optimized, report = optimize_plan(plan)
+
+    assert report.moved == 0
+    for old, new in zip(plan.days, optimized.days):
+        assert sorted(old.morning + old.afternoon + old.evening) == sorted(new.morning + new.afternoon + new.evening)
+
+
+def test_leaves_an_already_short_plan_unchanged():
+    plan = _plan([(["دربند", "کاخ سعدآباد"], ["کاخ نیاوران"], ["پل طبیعت"])])
+    optimized, report = optimize_plan(plan)
+    assert report.reordered_days == 0 and report.km_after == report.km_before
+    assert optimized.model_dump() == plan.model_dump()
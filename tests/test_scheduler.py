@@ -0,0 +1,57 @@
+import asyncio
+
+import httpx
+import openai
+import pytest
+from autogen_core.models import UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from models.GoogleModel import MODEL_INFO
+from models.scheduler import STAGE_PRIORITY, RateLimitScheduler, ScheduledChatCompletionClient
+
+
+class FlakyReplayClient(ReplayChatCompletionClient):
+    """Fails the first `failures` calls with a 429, then replays."""
+
+    def __init__(self, responses, failures):
+        super().__init__(responses, model_info=MODEL_INFO)
+        self.failures = failures
+
+    async def create(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            response = httpx.Response(429, request=httpx.Request("POST", "http://test"))
+            raise openai.RateLimitError("quota", response=response, body=None)
+        return await super().create(*args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_waiting_calls_are_admitted_by_stage_priority():
+    scheduler = RateLimitScheduler(rpm=600, tpm=0)
+    scheduler.requests.level = 0  # quota exhausted: both calls have to queue
+    order = []
+
+    async def call(stage):
+        await scheduler.acquire(1, STAGE_PRIORITY[stage])
+        order.append(stage)
+
+    research = asyncio.create_task(call("research"))
+    await asyncio.sleep(0)
+    writing = asyncio.create_task(call("writing"))
+    await asyncio.gather(research, writing)
+    assert order == ["writing", "research"]
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_errors_are_retried():
+    client = ScheduledChatCompletionClient(
+        FlakyReplayClient(["ok"], failures=2), RateLimitScheduler(rpm=0, tpm=0), max_retries=3, base_delay=0.01
+    )
+    result = await client.create([UserMessage(content="سلام", source="user")])
+    assert result.content == "ok"
+
+    client = ScheduledChatCompletionClient(
+        FlakyReplayClient(["ok"], failures=2), RateLimitScheduler(rpm=0, tpm=0), max_retries=1, base_delay=0.01
+    )
+    with pytest.raises(openai.RateLimitError):
+        await client.create([UserMessage(content="سلام", source="user")])
@@ -0,0 +1,41 @@
+import pytest
+from tools.search_cache import SearchCache, normalize_query, query_topic
+from utils.kv_store import SQLiteStore
+
+
+def test_normalize_query_unifies_persian_variants():
+    assert normalize_query("  آب و هوای   همدان  ") == normalize_query("آب و هوای همدان")
+    assert normalize_query("علي") == normalize_query("علی")
+    assert normalize_query("كرج") == normalize_query("کرج")
+    assert normalize_query("Hamedan WEATHER") == "hamedan weather"
+    assert normalize_query("شهریور ۱۴۰۴") == "شهریور 1404"
+
+
+def test_query_topic():
+    assert query_topic(normalize_query("Hamedan weather forecast")) == "weather"
+    assert query_topic(normalize_query("ویزای توریستی ایران")) == "visa"
+    assert query_topic(normalize_query("something else")) == "general"
+
+
+@pytest.mark.asyncio
+async def test_search_cache_hit_miss_and_refresh(tmp_path):
+    cache = SearchCache(SQLiteStore(str(tmp_path / "search.sqlite3")))
+    assert await cache.get("بلیط اتوبوس همدان") is None
+    await cache.set("بلیط اتوبوس همدان", "answer", [{"name": "a", "url": "https://a"}])
+    hit = await cache.get("بليط  اتوبوس همدان")
+    assert hit == {"answer": "answer", "sources": [{"name": "a", "url": "https://a"}]}
+    assert await cache.get("بلیط اتوبوس همدان", refresh=True) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_store_lru_eviction_and_ttl(tmp_path):
+    store = SQLiteStore(str(tmp_path / "kv.sqlite3"), max_entries=2)
+    store.set("ns", "a", 1)
+    store.set("ns", "b", 2)
+    assert store.get("ns", "a") == 1  # "b" is now least recently used
+    store.set("ns", "c", 3)
+    assert store.get("ns", "b") is None
+    assert store.get("ns", "a") == 1 and store.get("ns", "c") == 3
+    store.set("ns", "d", 4, ttl=-1)
+    assert store.get("ns", "d") is None
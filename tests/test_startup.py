@@ -0,0 +1,8 @@
+from benchmarks.import_time import measure
+
+
+def test_team_module_imports_without_key_or_model_sdk():
+    # Runs in a fresh interpreter without GOOGLE_API_KEY.
+    result = measure("teams.travel_team")
+    assert result["loaded"] == []
+    assert result["configs_read"] == []
@@ -0,0 +1,32 @@
+from utils import telemetry
+from utils.telemetry import Metrics, NOOP, RunRecorder
+
+
+def test_run_recorder_spans_and_counters():
+    recorder = RunRecorder("run-1")
+    with recorder.span("agent_turn", agent="planner") as span:
+        span["prompt_tokens"] = 10
+    recorder.count("travel_agent_turns_total", agent="planner")
+
+    data = recorder.to_dict()
+    assert data["run_id"] == "run-1"
+    assert data["spans"][0]["name"] == "agent_turn"
+    assert data["spans"][0]["prompt_tokens"] == 10
+    assert data["spans"][0]["duration_s"] >= 0
+    assert data["counters"] == {'travel_agent_turns_total{agent="planner"}': 1}
+
+
+def test_prometheus_histogram_is_cumulative():
+    m = Metrics(buckets=(0.1, 1.0))
+    m.observe("latency", 0.5, stage="research")
+    text = m.render_prometheus()
+    assert 'latency_bucket{stage="research",le="0.1"} 0' in text
+    assert 'latency_bucket{stage="research",le="1.0"} 1' in text
+    assert 'latency_count{stage="research"} 1' in text
+
+
+def test_noop_outside_runs():
+    assert telemetry.current() is NOOP
+    with NOOP.span("anything") as span:
+        span["ignored"] = True
+    assert NOOP.to_dict() == {}
@@ -1,14 +1,18 @@
 # This import will now work when run with pytest
-from tools.web_search import web_search
+import asyncio
+import pytest
+import tools.web_search as web_search_module
+from tools.web_search import web_search, web_search_many
 
-def test_web_search_successful():
+@pytest.mark.asyncio
+async def test_web_search_successful():
     """
     Tests if the web_search tool returns a successful result for a valid query.
     """
     print("🧪 Testing the web_search tool...")
     
     query = "آخرین وضعیت ویزای توریستی ایران برای شهروندان آلمان"
-    result = web_search(query)
+    result = await web_search(query)
     
     print(f"\n--- Search Result for '{query}' ---")
     print(result)
@@ -30,4 +34,37 @@ def test_web_search_no_api_key():
     # query = "test"
     # result = web_search(query)
     # assert "Error: Tavily API key is not configured" in result
-    pass
\ No newline at end of file
+    pass
+
+@pytest.mark.asyncio
+async def test_web_search_many_merges_and_dedups(monkeypatch):
+    """
+    Offline check of web_search_many: duplicate queries run once, duplicate URLs are merged.
+    """
+    calls = []
+
+    async def fake_search(query):
+        calls.append(query)
+        return {
+            "ok": True,
+            "answer": f"answer for {query}",
+            "sources": [{"name": "shared", "url": "https://example.com/"}, {"name": query, "url": f"https://{len(calls)}.com"}],
+        }
+
+    monkeypatch.setattr(web_search_module, "web_search", fake_search)
+    result = await web_search_many(["Hamedan weather", "hamedan  WEATHER", "Hamedan bus"])
+
+    assert len(calls) == 2
+    assert result["ok"] is True
+    assert [r["query"] for r in result["results"]] == ["Hamedan weather", "Hamedan bus"]
+    assert [s["url"] for s in result["sources"]] == ["https://example.com/", "https://1.com", "https://2.com"]
+
+
+def test_search_pool_closes_the_client_of_a_previous_event_loop():
+    pool = web_search_module._SearchPool()
+    asyncio.run(pool._ensure())
+    first = pool._http
+    asyncio.run(pool._ensure())
+    assert pool._http is not first and first.is_closed and not pool._http.is_closed
+    asyncio.run(pool.aclose())
+    assert pool._http is None
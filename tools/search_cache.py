@@ -0,0 +1,106 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Optional
+
+from config.settings import get_tavily_config
+from utils.kv_store import SQLiteStore
+from utils.text import normalize_text
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# Topic → (keywords, TTL seconds). First match wins; order from most to least volatile.
+TOPIC_TTLS = [
+    ("weather", ("weather", "forecast", "temperature", "آب و هوا", "هوای", "دما", "پیش بینی هوا"), 6 * HOUR),
+    ("transport", ("bus", "train", "flight", "ticket", "metro", "taxi", "snapp", "اتوبوس", "قطار", "پرواز", "بلیط", "مترو", "تاکسی", "اسنپ"), DAY),
+    ("hours", ("opening hours", "hours", "open", "ساعت", "بازدید", "تعطیل"), 3 * DAY),
+    ("prices", ("price", "cost", "hotel", "قیمت", "هزینه", "هتل", "نرخ"), 2 * DAY),
+    ("visa", ("visa", "entry", "passport", "ویزا", "روادید", "گذرنامه"), 7 * DAY),
+]
+DEFAULT_TTL = DAY
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical cache key text for a search query (see `utils.text.normalize_text`).
+    """
+    return normalize_text(query)
+
+
+def query_topic(normalized_query: str) -> str:
+    for topic, keywords, _ in TOPIC_TTLS:
+        if any(k in normalized_query for k in keywords):
+            return topic
+    return "general"
+
+
+def topic_ttl(topic: str) -> float:
+    for name, _, ttl in TOPIC_TTLS:
+        if name == topic:
+            return ttl
+    return DEFAULT_TTL
+
+
+class SearchCache:
+    """
+    Persistent TTL/LRU cache for web search results, shared across runs.
+
+    Stores `{answer, sources}` keyed on the normalized query. Only successful
+    results are cached. Hit/miss counters are kept per process.
+    """
+
+    NAMESPACE = "web_search"
+
+    def __init__(self, store: SQLiteStore):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(query: str) -> str:
+        return hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+
+    async def get(self, query: str, refresh: bool = False) -> Optional[Dict[str, Any]]:
+        if refresh:
+            self.misses += 1
+            return None
+        value = await asyncio.to_thread(self.store.get, self.NAMESPACE, self.key(query))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, query: str, answer: str, sources: list) -> None:
+        ttl = topic_ttl(query_topic(normalize_query(query)))
+        value = {"answer": answer, "sources": sources}
+        await asyncio.to_thread(self.store.set, self.NAMESPACE, self.key(query), value, ttl)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+            "entries": self.store.count(self.NAMESPACE),
+        }
+
+
+_cache: Optional[SearchCache] = None
+
+
+def get_search_cache() -> Optional[SearchCache]:
+    """
+    Return the process-wide search cache, or None if caching is disabled.
+    """
+    global _cache
+    if not get_tavily_config().CACHE_ENABLED:
+        return None
+    if _cache is None:
+        try:
+            _cache = SearchCache(SQLiteStore(get_tavily_config().CACHE_PATH, get_tavily_config().CACHE_MAX_ENTRIES))
+        except Exception as e:
+            logging.warning(f"Search cache unavailable, continuing without it: {e}")
+            return None
+    return _cache
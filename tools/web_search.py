@@ -1,12 +1,119 @@
-from tavily import TavilyClient
-from config.settings import tavily_cfg
+import asyncio
 import logging
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
 
-def web_search(query: str) -> Dict[str, Any]:
+from config.settings import get_tavily_config
+from tools.search_cache import get_search_cache, normalize_query
+from utils import telemetry
+
+if TYPE_CHECKING:
+    import httpx
+    from tavily import AsyncTavilyClient
+
+TAVILY_BASE_URL = "https://api.tavily.com"
+
+
+class _SearchPool:
+    """
+    Process-wide Tavily client backed by one keep-alive HTTP connection pool.
+
+    httpx connections and asyncio semaphores are bound to the event loop that
+    created them, so the pool is rebuilt transparently if a new loop is used
+    (e.g. successive `asyncio.run` calls in tests or CLI tools). The previous
+    pool is closed first, so its connections don't leak.
+    """
+
+    def __init__(self) -> None:
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._http: Optional["httpx.AsyncClient"] = None
+        self._client: Optional["AsyncTavilyClient"] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def _ensure(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is loop:
+            return
+        if self._http is not None:
+            await _discard(self._http, self._loop)
+        # Imported on first search so importing the tools stays cheap.
+        import httpx
+        from tavily import AsyncTavilyClient
+
+        cfg = get_tavily_config()
+        self._loop = loop
+        self._http = httpx.AsyncClient(
+            base_url=TAVILY_BASE_URL,
+            timeout=cfg.TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=cfg.MAX_CONNECTIONS,
+                max_keepalive_connections=cfg.MAX_CONNECTIONS,
+            ),
+        )
+        self._client = AsyncTavilyClient(api_key=cfg.API_KEY, client=self._http)
+        self._slots = asyncio.Semaphore(cfg.MAX_CONCURRENCY)
+
+    async def search(self, query: str) -> Dict[str, Any]:
+        await self._ensure()
+        async with self._slots:
+            return await asyncio.wait_for(
+                self._client.search(
+                    query=query,
+                    search_depth="basic",
+                    include_answer=True,
+                    timeout=get_tavily_config().TIMEOUT,
+                ),
+                timeout=get_tavily_config().TIMEOUT,
+            )
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await _discard(self._http, self._loop)
+        self._loop = self._http = self._client = self._slots = None
+
+
+async def _discard(http: "httpx.AsyncClient", loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """
+    Close an HTTP client that may belong to another event loop: on its own loop
+    if that one is still running elsewhere, otherwise here. Sockets of a loop
+    that is already closed can't be shut down gracefully; the client is still
+    marked closed so it releases its pool.
+    """
+    if loop is not None and loop is not asyncio.get_running_loop() and loop.is_running():
+        asyncio.run_coroutine_threadsafe(http.aclose(), loop)
+        return
+    try:
+        await http.aclose()
+    except Exception as e:
+        logging.debug(f"Search pool of a finished event loop closed uncleanly: {e}")
+
+
+_pool = _SearchPool()
+
+
+async def close_search_pool() -> None:
+    """
+    Release the shared search connection pool (call on application shutdown).
+    """
+    await _pool.aclose()
+
+
+def search_cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters of the persistent search cache ({} when caching is disabled).
+    """
+    cache = get_search_cache()
+    return cache.stats() if cache else {}
+
+
+async def web_search(query: str) -> Dict[str, Any]:
     """
     Performs a web search using the Tavily API and returns a summarized result.
 
+    Runs on the shared async connection pool, so concurrent teams in the same
+    process can search without blocking the event loop. Successful results are
+    served from / written to the persistent search cache; set
+    SEARCH_CACHE_REFRESH=true to bypass cached entries.
+
     Args:
         query: The search query.
 
@@ -17,12 +124,27 @@ def web_search(query: str) -> Dict[str, Any]:
           "sources": [{"name": str, "url": str}]
         }
     """
-    if not tavily_cfg.API_KEY:
+    recorder = telemetry.current()
+    with recorder.span("web_search") as span:
+        result = await _web_search(query)
+        cached = result.pop("_cached", False)
+        span.update(ok=result["ok"], cached=cached)
+    recorder.count("travel_web_searches_total", ok=result["ok"], cached=cached)
+    return result
+
+
+async def _web_search(query: str) -> Dict[str, Any]:
+    if not get_tavily_config().API_KEY:
         return {"ok": False, "answer": "", "sources": [], "error": "Tavily API key is not configured"}
 
+    cache = get_search_cache()
+    if cache:
+        cached = await cache.get(query, refresh=get_tavily_config().CACHE_REFRESH)
+        if cached is not None:
+            return {"ok": True, "answer": cached["answer"], "sources": cached["sources"], "_cached": True}
+
     try:
-        tavily = TavilyClient(api_key=tavily_cfg.API_KEY)
-        resp = tavily.search(query=query, search_depth="basic", include_answer=True)
+        resp = await _pool.search(query)
         answer = resp.get("answer", "") or ""
         results: List[Dict[str, str]] = resp.get("results", []) or []
         sources = []
@@ -31,7 +153,53 @@ def web_search(query: str) -> Dict[str, Any]:
             url = r.get("url") or ""
             if url:
                 sources.append({"name": name, "url": url})
+        if cache:
+            await cache.set(query, answer, sources)
         return {"ok": True, "answer": answer, "sources": sources}
+    except (asyncio.TimeoutError, TimeoutError):
+        logging.error(f"Tavily web search timed out after {get_tavily_config().TIMEOUT}s: {query!r}")
+        return {"ok": False, "answer": "", "sources": [], "error": "Search timed out"}
     except Exception as e:
         logging.error(f"An error occurred during Tavily web search: {e}")
         return {"ok": False, "answer": "", "sources": [], "error": str(e)}
+
+
+async def web_search_many(queries: List[str]) -> Dict[str, Any]:
+    """
+    Runs several web searches concurrently and merges them into one payload.
+
+    Duplicate queries (after normalization) are searched once and duplicate
+    source URLs across results are removed. Parallelism is bounded by the
+    shared search pool and at most TAVILY_MAX_BATCH queries are run per call.
+
+    Args:
+        queries: The search queries.
+
+    Returns:
+        {
+          "ok": bool,
+          "results": [{"query": str, "ok": bool, "answer": str}],
+          "sources": [{"name": str, "url": str}]
+        }
+    """
+    unique: Dict[str, str] = {}
+    for q in queries or []:
+        unique.setdefault(normalize_query(q), q)
+    batch = list(unique.values())[: get_tavily_config().MAX_BATCH]
+
+    responses = await asyncio.gather(*(web_search(q) for q in batch))
+
+    results: List[Dict[str, Any]] = []
+    sources: List[Dict[str, str]] = []
+    seen_urls = set()
+    for q, resp in zip(batch, responses):
+        item = {"query": q, "ok": resp["ok"], "answer": resp.get("answer", "")}
+        if not resp["ok"]:
+            item["error"] = resp.get("error", "")
+        results.append(item)
+        for src in resp.get("sources", []):
+            url = src["url"].rstrip("/")
+            if url not in seen_urls:
+                seen_urls.add(url)
+                sources.append(src)
+    return {"ok": any(r["ok"] for r in results), "results": results, "sources": sources}
@@ -0,0 +1,90 @@
+"""
+Context shaping between pipeline stages.
+
+Each downstream agent receives only the original request plus the last
+validated artifact, serialized as minified JSON and trimmed to a per-agent
+token budget. Token counts are estimated locally (no tokenizer download).
+"""
+import json
+import logging
+import math
+from typing import Any, List, Sequence, Tuple
+
+from utils.validation import ItineraryPlan, ResearchReport
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate: ~4 UTF-8 bytes per token.
+
+    Persian text is 2 bytes per letter, which matches how BPE tokenizers
+    typically split it more finely than English.
+    """
+    return math.ceil(len((text or "").encode("utf-8")) / 4)
+
+
+def estimate_messages_tokens(messages: Sequence[Any]) -> int:
+    """
+    Sum of `estimate_tokens` over messages (anything with `to_model_text()` or `content`).
+    """
+    total = 0
+    for msg in messages:
+        text = msg.to_model_text() if hasattr(msg, "to_model_text") else str(getattr(msg, "content", ""))
+        total += estimate_tokens(text)
+    return total
+
+
+def minify_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def truncate_to_tokens(text: str, budget_tokens: int) -> str:
+    """
+    Cut `text` to roughly `budget_tokens` (on a character boundary).
+    """
+    data = (text or "").encode("utf-8")
+    if len(data) <= budget_tokens * 4:
+        return text or ""
+    return data[: budget_tokens * 4].decode("utf-8", errors="ignore") + " …"
+
+
+def compact_report(report: ResearchReport, budget_tokens: int) -> str:
+    """
+    Minified report JSON within `budget_tokens`.
+
+    Lowest-confidence findings are dropped first (at least one finding is always
+    kept), then verification tips. The result may still exceed the budget if the
+    single most confident finding is larger than it.
+    """
+    data = report.model_dump()
+    text = minify_json(data)
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+
+    findings: List[dict] = sorted(data["findings"], key=lambda f: f["confidence"], reverse=True)
+    while len(findings) > 1 and estimate_tokens(text) > budget_tokens:
+        findings.pop()
+        data["findings"] = findings
+        text = minify_json(data)
+    while data["verification"] and estimate_tokens(text) > budget_tokens:
+        data["verification"] = data["verification"][:-1]
+        text = minify_json(data)
+    return text
+
+
+def compact_plan(plan: ItineraryPlan) -> str:
+    """
+    Minified plan JSON. Plans are never trimmed: every day must reach the writer.
+    """
+    return minify_json(plan.model_dump())
+
+
+def log_compaction(agent: str, before: int, after: int) -> Tuple[int, int]:
+    """
+    Log prompt-token savings for one stage hand-off and return (before, after).
+    """
+    saved = (1 - after / before) * 100 if before else 0.0
+    logger.info(f"Context for {agent}: ~{before} → ~{after} tokens ({saved:.0f}% smaller)")
+    return before, after
@@ -0,0 +1,140 @@
+"""
+Local gazetteer: coordinates of common points of interest in Iranian cities.
+
+Used by the route optimizer to place itinerary stops on the map without a
+network lookup. Stops are matched on normalized text (see
+`utils.text.normalize_text`), so Persian letter variants, half-spaces and
+English spellings resolve to the same place. Coordinates are approximate
+(~100 m), which is plenty for grouping and ordering stops.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from utils.text import normalize_text
+
+
+class Place(NamedTuple):
+    name: str
+    city: str
+    lat: float
+    lon: float
+
+
+# (city, name, lat, lon, aliases...) — the name itself is always an alias
+_POIS: Tuple[Tuple, ...] = (
+    # Hamedan
+    ("همدان", "گنجنامه", 34.7533, 48.4456, "ganjnameh", "ganj nameh", "آبشار گنجنامه"),
+    ("همدان", "تله‌کابین عباس‌آباد", 34.7600, 48.4520, "تله کابین گنجنامه", "abbasabad"),
+    ("همدان", "غار علیصدر", 35.2990, 48.2920, "علیصدر", "ali sadr", "alisadr"),
+    ("همدان", "آرامگاه بوعلی سینا", 34.7979, 48.5149, "بوعلی سینا", "آرامگاه ابن سینا", "avicenna"),
+    ("همدان", "آرامگاه باباطاهر", 34.8085, 48.5033, "باباطاهر", "baba taher"),
+    ("همدان", "تپه هگمتانه", 34.8050, 48.5200, "هگمتانه", "hegmataneh", "ecbatana"),
+    ("همدان", "آرامگاه استر و مردخای", 34.8008, 48.5167, "استر و مردخای", "esther and mordechai"),
+    ("همدان", "شیر سنگی", 34.7887, 48.5261, "stone lion"),
+    ("همدان", "بازار همدان", 34.7990, 48.5110, "hamedan bazaar"),
+    ("همدان", "لالجین", 34.9722, 48.4750, "lalejin"),
+    # Isfahan
+    ("اصفهان", "میدان نقش جهان", 32.6575, 51.6777, "نقش جهان", "میدان امام اصفهان", "naqsh-e jahan", "naghsh-e jahan"),
+    ("اصفهان", "مسجد امام اصفهان", 32.6546, 51.6776, "مسجد شاه", "shah mosque", "imam mosque"),
+    ("اصفهان", "مسجد شیخ لطف‌الله", 32.6573, 51.6792, "شیخ لطف الله", "sheikh lotfollah"),
+    ("اصفهان", "کاخ عالی‌قاپو", 32.6574, 51.6766, "عالی قاپو", "ali qapu", "ali qapu palace"),
+    ("اصفهان", "کاخ چهلستون", 32.6573, 51.6722, "چهلستون", "چهل ستون", "chehel sotoun"),
+    ("اصفهان", "کاخ هشت بهشت", 32.6547, 51.6707, "هشت بهشت", "hasht behesht"),
+    ("اصفهان", "سی‌وسه‌پل", 32.6442, 51.6676, "سی و سه پل", "سی وسه پل", "si-o-se-pol", "si-o-seh pol"),
+    ("اصفهان", "پل خواجو", 32.6366, 51.6857, "خواجو", "khaju bridge"),
+    ("اصفهان", "کلیسای وانک", 32.6354, 51.6555, "وانک", "vank cathedral", "vank"),
+    ("اصفهان", "مسجد جامع اصفهان", 32.6700, 51.6856, "مسجد جامع عتیق", "jameh mosque of isfahan"),
+    ("اصفهان", "بازار قیصریه", 32.6605, 51.6770, "بازار اصفهان", "qeysarieh bazaar", "isfahan bazaar"),
+    ("اصفهان", "منارجنبان", 32.6483, 51.5987, "منار جنبان", "monar jonban", "shaking minarets"),
+    ("اصفهان", "آتشگاه اصفهان", 32.6520, 51.5850, "atashgah"),
+    # Shiraz and around
+    ("شیراز", "باغ ارم", 29.6358, 52.5250, "ارم", "eram garden"),
+    ("شیراز", "حافظیه", 29.6255, 52.5580, "آرامگاه حافظ", "hafezieh", "tomb of hafez"),
+    ("شیراز", "سعدیه", 29.6217, 52.5837, "آرامگاه سعدی", "saadieh", "tomb of saadi"),
+    ("شیراز", "مسجد نصیرالملک", 29.6083, 52.5485, "نصیرالملک", "مسجد صورتی", "nasir al-mulk", "pink mosque"),
+    ("شیراز", "بازار وکیل", 29.6131, 52.5420, "vakil bazaar"),
+    ("شیراز", "مسجد وکیل", 29.6122, 52.5404, "vakil mosque"),
+    ("شیراز", "ارگ کریم‌خان", 29.6175, 52.5420, "ارگ کریمخان", "karim khan citadel", "arg-e karim khan"),
+    ("شیراز", "شاهچراغ", 29.6093, 52.5433, "حرم شاهچراغ", "shah cheragh"),
+    ("شیراز", "دروازه قرآن", 29.6297, 52.5643, "quran gate"),
+    ("شیراز", "باغ عفیف‌آباد", 29.6226, 52.5081, "عفیف آباد", "afifabad garden"),
+    ("شیراز", "تخت جمشید", 29.9355, 52.8916, "persepolis"),
+    ("شیراز", "نقش رستم", 29.9885, 52.8746, "naqsh-e rostam"),
+    ("شیراز", "پاسارگاد", 30.1939, 53.1672, "آرامگاه کوروش", "pasargadae"),
+    # Yazd
+    ("یزد", "مجموعه امیرچخماق", 31.8932, 54.3710, "امیرچخماق", "امیر چخماق", "amir chakhmaq"),
+    ("یزد", "مسجد جامع یزد", 31.9016, 54.3687, "jameh mosque of yazd"),
+    ("یزد", "باغ دولت‌آباد", 31.9041, 54.3525, "دولت آباد", "dowlatabad garden"),
+    ("یزد", "آتشکده یزد", 31.8813, 54.3717, "آتشکده زرتشتیان یزد", "yazd fire temple"),
+    ("یزد", "دخمه زرتشتیان", 31.8459, 54.3868, "برج خاموشان", "towers of silence"),
+    ("یزد", "موزه آب یزد", 31.8966, 54.3706, "موزه آب", "water museum"),
+    ("یزد", "محله فهادان", 31.9040, 54.3700, "فهادان", "بافت تاریخی یزد", "fahadan"),
+    ("یزد", "چک‌چک", 32.3521, 54.0286, "چک چک", "chak chak"),
+    # Kashan and around
+    ("کاشان", "باغ فین", 33.9466, 51.4064, "فین", "fin garden"),
+    ("کاشان", "خانه طباطبایی‌ها", 33.9750, 51.4420, "خانه طباطبایی ها", "tabatabaei house"),
+    ("کاشان", "خانه بروجردی‌ها", 33.9741, 51.4431, "خانه بروجردی ها", "boroujerdi house"),
+    ("کاشان", "حمام سلطان امیر احمد", 33.9731, 51.4438, "سلطان امیر احمد", "sultan amir ahmad"),
+    ("کاشان", "مسجد آقابزرگ", 33.9815, 51.4411, "آقا بزرگ", "agha bozorg"),
+    ("کاشان", "بازار کاشان", 33.9856, 51.4386, "kashan bazaar"),
+    ("کاشان", "ابیانه", 33.5778, 51.6040, "abyaneh"),
+    ("کاشان", "کویر مرنجاب", 34.3000, 51.8000, "مرنجاب", "maranjab"),
+    # Tehran
+    ("تهران", "کاخ گلستان", 35.6800, 51.4206, "golestan palace"),
+    ("تهران", "بازار بزرگ تهران", 35.6754, 51.4235, "بازار تهران", "tehran grand bazaar"),
+    ("تهران", "برج میلاد", 35.7448, 51.3753, "milad tower"),
+    ("تهران", "برج آزادی", 35.6997, 51.3380, "میدان آزادی", "azadi tower"),
+    ("تهران", "پل طبیعت", 35.7534, 51.4218, "tabiat bridge"),
+    ("تهران", "کاخ سعدآباد", 35.8213, 51.4243, "سعدآباد", "saadabad"),
+    ("تهران", "کاخ نیاوران", 35.8110, 51.4700, "نیاوران", "niavaran"),
+    ("تهران", "دربند", 35.8280, 51.4250, "darband"),
+    ("تهران", "موزه ملی ایران", 35.6871, 51.4148, "national museum of iran"),
+    ("تهران", "موزه جواهرات ملی", 35.6874, 51.4172, "موزه جواهرات", "national jewelry museum"),
+    ("تهران", "تله‌کابین توچال", 35.7920, 51.4060, "توچال", "tochal"),
+    # Tabriz
+    ("تبریز", "بازار تبریز", 38.0800, 46.2930, "tabriz bazaar"),
+    ("تبریز", "مسجد کبود", 38.0731, 46.3013, "blue mosque"),
+    ("تبریز", "ائل‌گلی", 38.0247, 46.3531, "ائل گلی", "شاه گلی", "el goli"),
+    ("تبریز", "ارگ علیشاه", 38.0710, 46.2900, "ارگ تبریز", "arg-e alishah"),
+    ("تبریز", "موزه آذربایجان", 38.0730, 46.3000, "azerbaijan museum"),
+    ("تبریز", "کندوان", 37.7950, 46.2490, "kandovan"),
+    # Mashhad
+    ("مشهد", "حرم امام رضا", 36.2880, 59.6157, "حرم رضوی", "imam reza shrine"),
+    ("مشهد", "کوه سنگی", 36.2678, 59.5617, "kuh sangi"),
+    ("مشهد", "آرامگاه نادرشاه", 36.2958, 59.6025, "nader shah"),
+    ("مشهد", "آرامگاه فردوسی", 36.4639, 59.5076, "توس", "ferdowsi tomb"),
+    ("مشهد", "طرقبه", 36.3100, 59.3800, "torqabeh"),
+    # Kerman
+    ("کرمان", "مجموعه گنجعلی‌خان", 30.2903, 57.0784, "گنجعلی خان", "ganjali khan"),
+    ("کرمان", "بازار وکیل کرمان", 30.2895, 57.0755, "بازار کرمان", "kerman bazaar"),
+    ("کرمان", "باغ شاهزاده ماهان", 30.0090, 57.2819, "باغ شاهزاده", "shazdeh garden"),
+    ("کرمان", "آرامگاه شاه نعمت‌الله ولی", 30.0560, 57.2870, "شاه نعمت الله ولی", "shah nematollah vali"),
+    ("کرمان", "ارگ راین", 29.5950, 57.4390, "rayen citadel"),
+    ("کرمان", "کلوت‌های شهداد", 30.5500, 58.0000, "کلوت", "kaluts", "shahdad"),
+)
+
+
+@lru_cache(maxsize=1)
+def _index() -> Tuple[re.Pattern, Dict[str, Place]]:
+    places: Dict[str, Place] = {}
+    for city, name, lat, lon, *aliases in _POIS:
+        place = Place(name, city, lat, lon)
+        for alias in (name, *aliases):
+            places.setdefault(normalize_text(alias), place)
+    # Longest alias first, so "مسجد جامع یزد" wins over a shorter overlapping name
+    alternation = "|".join(re.escape(a) for a in sorted(places, key=len, reverse=True))
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)"), places
+
+
+def resolve_place(text: str) -> Optional[Place]:
+    """
+    The first gazetteer place mentioned in an itinerary stop, or None.
+    """
+    pattern, places = _index()
+    match = pattern.search(normalize_text(text))
+    return places[match.group(0)] if match else None
+
+
+def known_places() -> List[Place]:
+    return sorted(set(_index()[1].values()))
@@ -0,0 +1,110 @@
+"""
+Solar Hijri (Jalali) ↔ Gregorian calendar conversion.
+
+Uses the break-year algorithm of the Iranian calendar (as in jalaali-js,
+based on Borkowski's method): leap years follow 33-year cycles between a
+fixed list of break years, which matches the official calendar for Jalali
+years 1–3177. Pure integer arithmetic, no dependencies.
+"""
+from datetime import date, timedelta
+from typing import Dict, Tuple
+
+# Jalali years where the 33-year leap cycle is restarted
+_BREAKS = (-61, 9, 38, 199, 426, 686, 756, 818, 1111, 1181, 1210, 1635, 2060, 2097, 2192, 2262, 2324, 2394, 2456, 3178)
+
+# Month names as typed in requests (normalized text, see utils.text.normalize_text), incl. common variants
+JALALI_MONTHS: Dict[str, int] = {
+    "فروردین": 1, "farvardin": 1,
+    "اردیبهشت": 2, "ordibehesht": 2,
+    "خرداد": 3, "khordad": 3,
+    "تیر": 4, "tir": 4,
+    "مرداد": 5, "امرداد": 5, "mordad": 5,
+    "شهریور": 6, "shahrivar": 6,
+    "مهر": 7, "mehr": 7,
+    "آبان": 8, "aban": 8,
+    "آذر": 9, "azar": 9,
+    "دی": 10, "dey": 10,
+    "بهمن": 11, "bahman": 11,
+    "اسفند": 12, "esfand": 12,
+}
+
+
+def _div(a: int, b: int) -> int:
+    # Integer division truncating toward zero, as the reference algorithm expects
+    return int(a / b)
+
+
+def _mod(a: int, b: int) -> int:
+    return a - _div(a, b) * b
+
+
+def _jal_cal(jy: int) -> Tuple[int, int, int]:
+    """
+    (leap, gy, march) for Jalali year `jy`: years since the last leap year
+    (0 = `jy` is leap), the Gregorian year of its Nowruz and the March day it falls on.
+    """
+    if not _BREAKS[0] <= jy < _BREAKS[-1]:
+        raise ValueError(f"Jalali year out of range: {jy}")
+    gy = jy + 621
+    leap_j = -14
+    jp = _BREAKS[0]
+    jump = 0
+    for jm in _BREAKS[1:]:
+        jump = jm - jp
+        if jy < jm:
+            break
+        leap_j += _div(jump, 33) * 8 + _div(_mod(jump, 33), 4)
+        jp = jm
+    n = jy - jp
+    leap_j += _div(n, 33) * 8 + _div(_mod(n, 33) + 3, 4)
+    if _mod(jump, 33) == 4 and jump - n == 4:
+        leap_j += 1
+    leap_g = _div(gy, 4) - _div((_div(gy, 100) + 1) * 3, 4) - 150
+    march = 20 + leap_j - leap_g
+    if jump - n < 6:
+        n = n - jump + _div(jump + 4, 33) * 33
+    leap = _mod(_mod(n + 1, 33) - 1, 4)
+    if leap == -1:
+        leap = 4
+    return leap, gy, march
+
+
+def is_jalali_leap(jy: int) -> bool:
+    return _jal_cal(jy)[0] == 0
+
+
+def jalali_month_length(jy: int, jm: int) -> int:
+    if jm <= 6:
+        return 31
+    if jm <= 11:
+        return 30
+    return 30 if is_jalali_leap(jy) else 29
+
+
+def jalali_to_gregorian(jy: int, jm: int, jd: int) -> date:
+    """
+    Gregorian date of Jalali `jy/jm/jd`. Raises ValueError for invalid dates.
+    """
+    if not 1 <= jm <= 12 or not 1 <= jd <= jalali_month_length(jy, jm):
+        raise ValueError(f"Invalid Jalali date: {jy}/{jm}/{jd}")
+    _, gy, march = _jal_cal(jy)
+    return date(gy, 3, march) + timedelta(days=(jm - 1) * 31 - _div(jm, 7) * (jm - 7) + jd - 1)
+
+
+def gregorian_to_jalali(day: date) -> Tuple[int, int, int]:
+    """
+    (year, month, day) in the Jalali calendar.
+    """
+    jy = day.year - 621
+    leap, gy, march = _jal_cal(jy)
+    k = (day - date(gy, 3, march)).days
+    if k >= 0:
+        if k <= 185:
+            return jy, 1 + _div(k, 31), _mod(k, 31) + 1
+        k -= 186
+    else:
+        jy -= 1
+        k += 179
+        if leap == 1:
+            k += 1
+    return jy, 7 + _div(k, 30), _mod(k, 30) + 1
@@ -0,0 +1,210 @@
+"""
+Deterministic repair of near-valid JSON produced by the agents.
+
+Most schema misses are mechanical: prose or a trailing comma around an
+otherwise fine object, Persian digits in numbers, a float cost where the
+schema wants whole Toman, a confidence given as a percentage, or a plan total
+that doesn't match its days. Fixing those locally is much cheaper than another
+model generation. Every fix only changes how a value is written, never what it
+says, and each one is returned as a short description for the logs.
+"""
+import json
+from typing import Any, List, Literal, Optional, Tuple, Type, get_args, get_origin
+
+from annotated_types import Le
+from pydantic import BaseModel
+
+from utils.text import to_ascii_digits
+from utils.validation import ItineraryPlan
+
+_NON_ASCII_DIGITS = set("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩")
+# Thousands separators, currency words and spacing allowed around numbers given as strings
+_NUMBER_NOISE = (",", "٬", "_", " ", "\u200c", "تومان", "toman", "TOMAN", "Toman")
+
+
+def repair_json_text(text: str) -> Tuple[str, List[str]]:
+    """
+    Text-level fixes: keeps only the first JSON object (dropping prose around
+    it), removes trailing commas and converts Persian/Arabic digits outside
+    strings. Strings are copied verbatim.
+
+    Returns:
+        (text, fixes). The text is unchanged if no complete object is found.
+    """
+    text = text or ""
+    start = text.find("{")
+    if start == -1:
+        return text, []
+
+    out: List[str] = []
+    depth = 0
+    in_string = escaped = False
+    end: Optional[int] = None
+    trailing_commas = digits = 0
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in "{[":
+            depth += 1
+            out.append(ch)
+        elif ch in "}]":
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+                trailing_commas += 1
+            depth -= 1
+            out.append(ch)
+            if depth == 0:
+                end = i
+                break
+        elif ch in _NON_ASCII_DIGITS:
+            out.append(to_ascii_digits(ch))
+            digits += 1
+        else:
+            out.append(ch)
+
+    if end is None:
+        # Truncated output: nothing safe to do.
+        return text, []
+
+    fixes: List[str] = []
+    if text[:start].strip() or text[end + 1:].strip():
+        fixes.append("removed text around the JSON object")
+    if trailing_commas:
+        fixes.append(f"removed {trailing_commas} trailing comma(s)")
+    if digits:
+        fixes.append("converted Persian digits in numbers")
+    return "".join(out), fixes
+
+
+def repair_data(data: Any, model: Type[BaseModel]) -> List[str]:
+    """
+    Schema-guided value fixes applied in place to parsed JSON.
+
+    Returns:
+        The fixes applied, e.g. ["days.0.est_cost_toman: 1200000.0 → 1200000"].
+    """
+    fixes: List[str] = []
+    _repair_model(data, model, "", fixes)
+    if model is ItineraryPlan:
+        _repair_plan_total(data, fixes)
+    return fixes
+
+
+def _repair_model(data: Any, model: Type[BaseModel], path: str, fixes: List[str]) -> None:
+    if not isinstance(data, dict):
+        return
+    for name, field in model.model_fields.items():
+        if name in data:
+            upper = next((m.le for m in field.metadata if isinstance(m, Le)), None)
+            data[name] = _repair_value(data[name], field.annotation, f"{path}{name}", upper, fixes)
+
+
+def _repair_value(value: Any, annotation: Any, path: str, upper: Optional[float], fixes: List[str]) -> Any:
+    origin = get_origin(annotation)
+    if origin is list and isinstance(value, list):
+        (item_type,) = get_args(annotation)
+        return [_repair_value(v, item_type, f"{path}.{i}", None, fixes) for i, v in enumerate(value)]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        _repair_model(value, annotation, f"{path}.", fixes)
+        return value
+    if origin is Literal and isinstance(value, str):
+        for option in get_args(annotation):
+            if isinstance(option, str) and value.strip().casefold() == option.casefold() and value != option:
+                fixes.append(f"{path}: {value!r} → {option!r}")
+                return option
+        if value.strip() == "تومان" and "TOMAN" in get_args(annotation):
+            fixes.append(f"{path}: {value!r} → 'TOMAN'")
+            return "TOMAN"
+        return value
+    if annotation is int:
+        number = _as_number(value)
+        if number is not None and not isinstance(value, int):
+            fixed = round(number)
+            fixes.append(f"{path}: {value!r} → {fixed}")
+            return fixed
+        return value
+    if annotation is float:
+        number = _as_number(value)
+        if number is None or isinstance(value, bool):
+            return value
+        percent = isinstance(value, str) and value.strip().endswith("%")
+        # A 0–1 score given as 0–100.
+        if upper is not None and (percent or upper < number <= 100 * upper):
+            number = number / 100
+        if number != value:
+            fixes.append(f"{path}: {value!r} → {number:g}")
+            return number
+        return value
+    return value
+
+
+def _as_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    if not isinstance(value, str):
+        return None
+    text = to_ascii_digits(value).strip().rstrip("%")
+    for noise in _NUMBER_NOISE:
+        text = text.replace(noise, "")
+    text = text.replace("٫", ".")
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _repair_plan_total(data: Any, fixes: List[str]) -> None:
+    """
+    The plan total must be the sum of the day costs; recompute it when every day has a valid cost.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("days"), list) or not data["days"]:
+        return
+    costs = [day.get("est_cost_toman") if isinstance(day, dict) else None for day in data["days"]]
+    if not all(isinstance(c, int) and not isinstance(c, bool) for c in costs):
+        return
+    total = sum(costs)
+    if data.get("total_est_cost_toman") != total:
+        fixes.append(f"total_est_cost_toman: {data.get('total_est_cost_toman')!r} → {total} (sum of days)")
+        data["total_est_cost_toman"] = total
+
+
+def reconcile_plan_total(plan: BaseModel) -> Tuple[BaseModel, List[str]]:
+    """
+    A schema-valid ItineraryPlan with its total recomputed from the days (unchanged if it already matches).
+    """
+    if not isinstance(plan, ItineraryPlan):
+        return plan, []
+    data, fixes = plan.model_dump(), []
+    _repair_plan_total(data, fixes)
+    return (ItineraryPlan.model_validate(data), fixes) if fixes else (plan, [])
+
+
+def load_repaired(text: str, model: Type[BaseModel]) -> Tuple[Optional[Any], List[str]]:
+    """
+    Applies the text and value fixes.
+
+    Returns:
+        (data, fixes): the repaired, parsed JSON (None if it still isn't JSON) and all fixes applied.
+    """
+    text, fixes = repair_json_text(text)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None, fixes
+    fixes += repair_data(data, model)
+    return data, fixes
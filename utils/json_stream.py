@@ -0,0 +1,113 @@
+"""
+Incremental, linear-time JSON scanning.
+
+`JSONScanner` consumes text in chunks (e.g. streamed model output) and keeps
+only the state needed to follow the structure: string/escape flags and a
+stack of open containers with their current key or index. Values are never
+built. Every object that closes is reported with its path, e.g.
+(("days", 2), '{"date": ...}'), so callers can validate items as soon as
+they are complete. Text before the first "{" (prose, code fences) and after
+the top-level object is skipped.
+"""
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+PathPart = Union[str, int]
+
+
+class _Frame:
+    __slots__ = ("kind", "key", "start")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        # Current key (objects) or element index (arrays)
+        self.key: Optional[PathPart] = 0 if kind == "[" else None
+        self.start = start
+
+
+class JSONScanner:
+    """
+    Follows a JSON object arriving in chunks and reports each closed object.
+    """
+
+    def __init__(self):
+        self._chars: List[str] = []
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escaped = False
+        self._string_span: Tuple[int, int] = (0, 0)
+        self.root_span: Optional[Tuple[int, int]] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._stack) or self.root_span is not None
+
+    @property
+    def done(self) -> bool:
+        """True once the top-level object has closed."""
+        return self.root_span is not None
+
+    @property
+    def text(self) -> str:
+        return "".join(self._chars)
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[PathPart, ...], str]]:
+        """
+        Consume the next chunk. Returns (path, raw_json) for every object closed in it.
+        """
+        closed: List[Tuple[Tuple[PathPart, ...], str]] = []
+        for ch in chunk:
+            pos = len(self._chars)
+            self._chars.append(ch)
+            if self.done:
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._string_span = (self._string_span[0], pos + 1)
+                continue
+            if not self._stack:
+                if ch == "{":
+                    self._stack.append(_Frame(ch, pos))
+                continue
+            if ch == '"':
+                self._in_string = True
+                self._string_span = (pos, pos)
+            elif ch in "{[":
+                self._stack.append(_Frame(ch, pos))
+            elif ch in "}]":
+                frame = self._stack.pop()
+                if ch == "}":
+                    closed.append((self.path(), "".join(self._chars[frame.start:pos + 1])))
+                if not self._stack:
+                    self.root_span = (frame.start, pos + 1)
+            elif ch == ":" and self._stack[-1].kind == "{":
+                self._stack[-1].key = _decode_key("".join(self._chars[slice(*self._string_span)]))
+            elif ch == "," and self._stack[-1].kind == "[":
+                self._stack[-1].key += 1
+        return closed
+
+    def path(self) -> Tuple[PathPart, ...]:
+        """Keys/indices leading to the innermost open container."""
+        return tuple(frame.key for frame in self._stack)
+
+
+def _decode_key(raw: str) -> Any:
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return raw.strip('"')
+
+
+def find_json_object(text: str) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) of the first complete top-level JSON object in `text`, or None.
+    Single pass; braces inside strings are ignored.
+    """
+    scanner = JSONScanner()
+    scanner.feed(text or "")
+    return scanner.root_span
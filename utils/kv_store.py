@@ -0,0 +1,124 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+
+class SQLiteStore:
+    """
+    Small on-disk key/value store with per-entry TTL and size-bounded LRU eviction.
+
+    Entries are grouped by namespace so several caches can share one file;
+    each namespace is capped independently at `max_entries`. Values are stored
+    as JSON. All operations are synchronous and fast (local file); async callers
+    should wrap them in `asyncio.to_thread` when used on a hot path.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace   TEXT NOT NULL,
+                key         TEXT NOT NULL,
+                value       TEXT NOT NULL,
+                created_at  REAL NOT NULL,
+                expires_at  REAL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (namespace, last_access)"
+        )
+
+    def get(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Return the stored value, or None if missing or expired. A hit refreshes its LRU position.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+                return None
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key),
+            )
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Insert or replace a value; `ttl` is in seconds (None = never expires).
+        """
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (namespace, key, payload, now, expires_at, now),
+                )
+                self._evict(namespace, now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            )
+
+    def count(self, namespace: str) -> int:
+        with self._lock:
+            (n,) = self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE namespace = ?", (namespace,)
+            ).fetchone()
+        return n
+
+    def clear(self, namespace: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _evict(self, namespace: str, now: float) -> None:
+        # Drop expired entries first, then the least recently used beyond the cap.
+        self._conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+            (namespace, now),
+        )
+        self._conn.execute(
+            """
+            DELETE FROM entries WHERE namespace = ? AND key IN (
+                SELECT key FROM entries WHERE namespace = ?
+                ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (namespace, namespace, self.max_entries),
+        )
@@ -0,0 +1,163 @@
+"""
+Plan-level cache of validated stage artifacts, shared across runs.
+
+Many requests are effectively the same trip. The pipeline looks up the
+validated ResearchReport and ItineraryPlan of an earlier run under keys built
+from the pre-parsed request (`utils.trip_request`), and a hit skips the whole
+stage:
+
+    research  destination + Jalali season of the start date + budget,
+              fresh for RESEARCH_CACHE_TTL_H (a week by default)
+    planning  destination + Jalali month of the start date + duration + budget,
+              fresh for PLAN_CACHE_TTL_H; a plan cached for another start
+              date in the same month is re-dated to the requested one
+
+Requests without a recognized destination are never cached, and plans need a
+start date and a duration. Each entry remembers what producing it cost
+(tokens, seconds), so hits can be reported as stage savings.
+"""
+import asyncio
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Any, Dict, NamedTuple, Optional
+
+from config.settings import get_app_config
+from utils.jalali import gregorian_to_jalali
+from utils.kv_store import SQLiteStore
+from utils.trip_request import TripRequest
+from utils.validation import ItineraryPlan, ResearchReport
+
+HOUR = 3600
+
+CACHED_STAGES = ("research", "planning")
+
+
+class CachedStage(NamedTuple):
+    artifact: Dict[str, Any]
+    # What producing the artifact cost the run that cached it
+    tokens: int
+    seconds: float
+
+
+def cache_key(stage: str, request: TripRequest) -> Optional[str]:
+    """
+    Normalized cache key of a stage for a parsed request, or None when the request is too vague to share.
+    """
+    if not request.destination:
+        return None
+    budget = request.budget_level or "any"
+    if stage == "research":
+        # Jalali seasons are three months each: spring = months 1-3, ...
+        season = (gregorian_to_jalali(request.start_date)[1] - 1) // 3 + 1 if request.start_date else "any"
+        parts = [request.destination, f"season={season}", f"budget={budget}"]
+    elif stage == "planning":
+        if not (request.start_date and request.duration_days):
+            return None
+        jy, jm, _ = gregorian_to_jalali(request.start_date)
+        parts = [request.destination, f"month={jy}-{jm:02d}", f"days={request.duration_days}", f"budget={budget}"]
+    else:
+        return None
+    return "|".join(parts)
+
+
+def redate_plan(plan: ItineraryPlan, request: TripRequest) -> ItineraryPlan:
+    """
+    The plan with its days moved to start on the requested date (a copy; unchanged when dates already match).
+    """
+    dates = [(request.start_date + timedelta(days=i)).isoformat() for i in range(len(plan.days))]
+    if [day.date for day in plan.days] == dates:
+        return plan
+    plan = plan.model_copy(deep=True)
+    for day, date in zip(plan.days, dates):
+        day.date = date
+    return plan
+
+
+class PlanCache:
+    """
+    Persistent TTL/LRU cache of validated research reports and itinerary plans.
+
+    Hit/miss counters and the tokens and seconds saved by hits are kept per
+    process and per stage.
+    """
+
+    NAMESPACE = "plan_stages"
+
+    def __init__(self, store: SQLiteStore, research_ttl: float = 7 * 24 * HOUR, plan_ttl: float = 24 * HOUR):
+        self.store = store
+        self.ttls = {"research": research_ttl, "planning": plan_ttl}
+        self.counters: Dict[str, Dict[str, float]] = {
+            stage: {"hits": 0, "misses": 0, "saved_tokens": 0, "saved_seconds": 0.0} for stage in CACHED_STAGES
+        }
+
+    @staticmethod
+    def _store_key(stage: str, key: str) -> str:
+        return hashlib.sha256(f"{stage}|{key}".encode("utf-8")).hexdigest()
+
+    async def get(self, stage: str, request: TripRequest) -> Optional[CachedStage]:
+        """
+        The cached artifact of `stage` for this request, or None.
+        """
+        key = cache_key(stage, request)
+        if key is None:
+            return None
+        entry = await asyncio.to_thread(self.store.get, self.NAMESPACE, self._store_key(stage, key))
+        counters = self.counters[stage]
+        if entry is None:
+            counters["misses"] += 1
+            return None
+        counters["hits"] += 1
+        counters["saved_tokens"] += entry["tokens"]
+        counters["saved_seconds"] += entry["seconds"]
+        if stage == "planning":
+            artifact = redate_plan(ItineraryPlan.model_validate(entry["artifact"]), request).model_dump()
+        else:
+            artifact = ResearchReport.model_validate(entry["artifact"]).model_dump()
+        return CachedStage(artifact, entry["tokens"], entry["seconds"])
+
+    async def set(
+        self, stage: str, request: TripRequest, artifact: Dict[str, Any], tokens: int = 0, seconds: float = 0.0
+    ) -> None:
+        key = cache_key(stage, request)
+        if key is None:
+            return
+        entry = {"artifact": artifact, "tokens": tokens, "seconds": round(seconds, 3)}
+        await asyncio.to_thread(
+            self.store.set, self.NAMESPACE, self._store_key(stage, key), entry, self.ttls[stage]
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {"entries": self.store.count(self.NAMESPACE)}
+        for stage, counters in self.counters.items():
+            total = counters["hits"] + counters["misses"]
+            stats[f"{stage}_hits"] = counters["hits"]
+            stats[f"{stage}_misses"] = counters["misses"]
+            stats[f"{stage}_hit_rate"] = (counters["hits"] / total) if total else 0.0
+            stats[f"{stage}_saved_tokens"] = counters["saved_tokens"]
+            stats[f"{stage}_saved_seconds"] = round(counters["saved_seconds"], 3)
+        return stats
+
+
+_cache: Optional[PlanCache] = None
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """
+    Return the process-wide plan cache, or None if it is disabled.
+    """
+    global _cache
+    cfg = get_app_config()
+    if not cfg.PLAN_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        try:
+            _cache = PlanCache(
+                SQLiteStore(cfg.PLAN_CACHE_PATH, cfg.PLAN_CACHE_MAX_ENTRIES),
+                research_ttl=cfg.RESEARCH_CACHE_TTL_H * HOUR,
+                plan_ttl=cfg.PLAN_CACHE_TTL_H * HOUR,
+            )
+        except Exception as e:
+            logging.warning(f"Plan cache unavailable, continuing without it: {e}")
+            return None
+    return _cache
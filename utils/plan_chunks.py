@@ -0,0 +1,130 @@
+"""
+Splitting long trips into day ranges that are planned and written concurrently.
+
+A 10-14 day ItineraryPlan doesn't fit the planner's max_tokens in one
+generation. The pipeline instead plans consecutive day ranges ("chunks") in
+parallel, each from the same trip skeleton: the whole trip's dates, which
+days each chunk covers, and, when the gazetteer knows the destination, a
+geographic split of its sights so chunks don't all plan the same highlights.
+The validated chunk plans are merged and re-totalled into one ItineraryPlan.
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from utils.gazetteer import known_places
+from utils.validation import ItineraryPlan
+
+
+@dataclass(frozen=True)
+class PlanChunk:
+    index: int  # 1-based
+    count: int
+    first_day: int  # 1-based day number within the trip
+    start: date
+    days: int
+
+    @property
+    def last_day(self) -> int:
+        return self.first_day + self.days - 1
+
+    @property
+    def dates(self) -> List[str]:
+        return [(self.start + timedelta(days=i)).isoformat() for i in range(self.days)]
+
+
+def split_trip(start: date, duration: int, max_chunks: int) -> List[PlanChunk]:
+    """
+    `duration` days from `start` as at most `max_chunks` consecutive ranges of near-equal length.
+    """
+    count = max(1, min(max_chunks, duration))
+    base, extra = divmod(duration, count)
+    chunks: List[PlanChunk] = []
+    first = 1
+    for i in range(count):
+        days = base + (1 if i < extra else 0)
+        chunks.append(PlanChunk(i + 1, count, first, start + timedelta(days=first - 1), days))
+        first += days
+    return chunks
+
+
+def assign_sights(destination: Optional[str], chunks: Sequence[PlanChunk]) -> Dict[int, List[str]]:
+    """
+    Known sights of the destination split into one geographic group per chunk ({} if none are known).
+    """
+    places = [p for p in known_places() if p.city == destination]
+    if len(places) < len(chunks) or len(chunks) < 2:
+        return {}
+    import numpy as np
+
+    from utils.route_optimizer import balanced_assignment
+
+    # Start from west-to-east slices, then let k-means tighten the groups.
+    places.sort(key=lambda p: p.lon)
+    points = np.array([(p.lat, p.lon) for p in places])
+    initial = np.array([i * len(chunks) // len(places) for i in range(len(places))])
+    groups = balanced_assignment(points, initial, np.ones((len(places), len(chunks)), dtype=bool))
+    return {chunk.index: [p.name for p, g in zip(places, groups) if g == chunk.index - 1] for chunk in chunks}
+
+
+def skeleton_prompt(chunk: PlanChunk, chunks: Sequence[PlanChunk], sights: Dict[int, List[str]]) -> str:
+    """
+    Planner instructions for one chunk: its day range within the whole trip and its share of the sights.
+    """
+    lines = [
+        f"TRIP SKELETON: you plan PART {chunk.index} of {chunk.count} of one trip; other planners write the other parts in parallel.",
+        f"- whole trip: {chunks[0].start.isoformat()} to {chunks[-1].dates[-1]} ({chunks[-1].last_day} days)",
+    ]
+    for other in chunks:
+        mark = "  <- YOURS" if other is chunk else ""
+        lines.append(f"- part {other.index}: days {other.first_day}-{other.last_day} ({other.dates[0]} to {other.dates[-1]}){mark}")
+        if sights.get(other.index):
+            lines.append(f"  sights: {', '.join(sights[other.index])}")
+    lines.append(
+        f"Output an ItineraryPlan with exactly {chunk.days} days, dated {chunk.dates[0]} to {chunk.dates[-1]}, "
+        "and total_est_cost_toman for your days only."
+    )
+    if chunk.index == 1:
+        lines.append("Your first day is the arrival day.")
+    if chunk.index == chunk.count:
+        lines.append("Your last day is the departure day.")
+    if sights:
+        lines.append("Build your days around your part's sights; leave the other parts' sights to them.")
+    return "\n".join(lines)
+
+
+def merge_plans(parts: Sequence[ItineraryPlan], chunks: Sequence[PlanChunk]) -> ItineraryPlan:
+    """
+    One plan from the chunk plans (in chunk order): days dated from the skeleton, totals recomputed.
+    """
+    days = []
+    for part, chunk in zip(parts, chunks):
+        for day, when in zip(part.days, chunk.dates):
+            days.append(day.model_copy(update={"date": when}))
+    return ItineraryPlan(
+        overview=" ".join(part.overview.strip() for part in parts if part.overview.strip()),
+        days=days,
+        total_est_cost_toman=sum(day.est_cost_toman for day in days),
+    )
+
+
+def plan_part(plan: ItineraryPlan, chunk: PlanChunk) -> ItineraryPlan:
+    """
+    The days of `plan` that belong to `chunk`, totalled on their own (used to write the brief per chunk).
+    """
+    days = plan.days[chunk.first_day - 1:chunk.last_day]
+    return ItineraryPlan(overview=plan.overview, days=days, total_est_cost_toman=sum(d.est_cost_toman for d in days))
+
+
+def writer_prompt(chunk: PlanChunk, total_cost: int) -> str:
+    """
+    Writer instructions for one chunk of the brief.
+    """
+    lines = [f"You write PART {chunk.index} of {chunk.count} of the brief: only «روز {chunk.first_day}» to «روز {chunk.last_day}», numbered as in the whole trip."]
+    if chunk.index == 1:
+        lines.append("Start with a two-sentence introduction of the whole trip.")
+    if chunk.index < chunk.count:
+        lines.append("Do not write «بودجه تقریبی» or «نکات مهم» and do not end with 'پایان'; the last part does that.")
+    else:
+        lines.append(f"Finish with «نکات مهم» and «بودجه تقریبی» for the whole trip ({total_cost} TOMAN in total), then 'پایان'.")
+    return "\n".join(lines)
@@ -0,0 +1,63 @@
+"""
+Merging of research reports produced by parallel topic researchers.
+
+Findings on the same topic (compared on normalized text) are combined into
+one: bullets and sources are deduplicated, sources by canonical URL, and the
+highest confidence is kept. Risks and verification items are deduplicated the
+same way. Order follows the input reports, so the result is deterministic.
+"""
+from typing import Dict, List, Sequence
+from urllib.parse import urlsplit, urlunsplit
+
+from utils.text import normalize_text
+from utils.validation import Finding, ResearchReport, Source
+
+
+def canonical_url(url: str) -> str:
+    """
+    URL used to recognize duplicate sources: lowercased scheme and host, no "www.", fragment or trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    return urlunsplit((parts.scheme.lower() or "https", host, parts.path.rstrip("/"), parts.query, ""))
+
+
+def merge_reports(reports: Sequence[ResearchReport]) -> ResearchReport:
+    """
+    One ResearchReport combining the findings, risks and verification items of `reports`.
+    """
+    findings: Dict[str, Finding] = {}
+    seen_bullets: Dict[str, set] = {}
+    seen_sources: Dict[str, set] = {}
+    for report in reports:
+        for finding in report.findings:
+            key = normalize_text(finding.topic)
+            if key not in findings:
+                findings[key] = Finding(topic=finding.topic, bullets=[], sources=[], confidence=finding.confidence)
+                seen_bullets[key], seen_sources[key] = set(), set()
+            merged = findings[key]
+            merged.confidence = max(merged.confidence, finding.confidence)
+            for bullet in finding.bullets:
+                if normalize_text(bullet) not in seen_bullets[key]:
+                    seen_bullets[key].add(normalize_text(bullet))
+                    merged.bullets.append(bullet)
+            for source in finding.sources:
+                if canonical_url(source.url) not in seen_sources[key]:
+                    seen_sources[key].add(canonical_url(source.url))
+                    merged.sources.append(Source(name=source.name, url=source.url))
+    return ResearchReport(
+        findings=list(findings.values()),
+        risks=_unique(item for report in reports for item in report.risks),
+        verification=_unique(item for report in reports for item in report.verification),
+    )
+
+
+def _unique(items) -> List[str]:
+    seen: set = set()
+    result: List[str] = []
+    for item in items:
+        key = normalize_text(item)
+        if key not in seen:
+            seen.add(key)
+            result.append(item)
+    return result
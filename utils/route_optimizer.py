@@ -0,0 +1,266 @@
+"""
+Deterministic post-planning route optimization.
+
+The planner chooses what to see; this module decides the order. Stops in each
+day's morning/afternoon/evening lists are resolved to coordinates with the
+local gazetteer, then:
+
+1. Stops are regrouped across days with a capacity-balanced k-means: every
+   day keeps its number of stops, and a stop may only move to a day that
+   already visits its city, so multi-city trips keep their city order.
+2. Each day's stops are ordered as a shortest open path (nearest neighbour
+   from every start, then 2-opt) on a haversine distance matrix.
+
+Stops the gazetteer doesn't know (meals, check-in, "free time") keep their
+exact slot and position. Changes are only kept when they shorten the trip,
+and the per-day travel distance before and after is returned for reporting.
+A day whose sights changed gets a summary rebuilt from its new sights, so
+the writer never describes a stop on the wrong day; day costs stay as the
+planner estimated them (the plan total is unchanged).
+All distance work is vectorized with NumPy.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.gazetteer import Place, resolve_place
+from utils.validation import ItineraryPlan
+
+SLOTS = ("morning", "afternoon", "evening")
+EARTH_RADIUS_KM = 6371.0
+
+
+@dataclass
+class DayRoute:
+    date: str
+    km_before: float
+    km_after: float
+
+
+@dataclass
+class RouteReport:
+    days: List[DayRoute] = field(default_factory=list)
+    resolved: int = 0
+    unresolved: int = 0
+    moved: int = 0
+    reordered_days: int = 0
+    # Dates of the days whose set of sights changed (their summaries were rebuilt)
+    regrouped_days: List[str] = field(default_factory=list)
+
+    @property
+    def km_before(self) -> float:
+        return round(sum(d.km_before for d in self.days), 2)
+
+    @property
+    def km_after(self) -> float:
+        return round(sum(d.km_after for d in self.days), 2)
+
+
+@dataclass
+class _Stop:
+    day: int
+    slot: str
+    index: int
+    text: str
+    place: Place
+
+
+def distance_matrix(points: np.ndarray, others: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Great-circle distances in km between (lat, lon) rows of `points` and `others` (default: `points`).
+    """
+    a = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    b = a if others is None else np.radians(np.asarray(others, dtype=float).reshape(-1, 2))
+    dlat = a[:, None, 0] - b[None, :, 0]
+    dlon = a[:, None, 1] - b[None, :, 1]
+    h = np.sin(dlat / 2) ** 2 + np.cos(a[:, None, 0]) * np.cos(b[None, :, 0]) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def path_length(dist: np.ndarray, order: Sequence[int]) -> float:
+    order = np.asarray(order, dtype=int)
+    if len(order) < 2:
+        return 0.0
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def shortest_path(dist: np.ndarray) -> List[int]:
+    """
+    Short open path through all points: nearest neighbour from every start, improved by 2-opt.
+    """
+    n = len(dist)
+    if n < 3:
+        return list(range(n))
+    best: Optional[List[int]] = None
+    for start in range(n):
+        order = [start]
+        visited = np.zeros(n, dtype=bool)
+        visited[start] = True
+        for _ in range(n - 1):
+            row = np.where(visited, np.inf, dist[order[-1]])
+            nxt = int(row.argmin())
+            order.append(nxt)
+            visited[nxt] = True
+        if best is None or path_length(dist, order) < path_length(dist, best):
+            best = order
+    return _two_opt(dist, best)
+
+
+def _two_opt(dist: np.ndarray, order: List[int]) -> List[int]:
+    order = np.array(order)
+    n = len(order)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 2):
+            a, b = order[i], order[i + 1]
+            j = np.arange(i + 2, n)
+            c = order[j]
+            # Reversing order[i+1..j]: edges (a,b),(c,d) become (a,c),(b,d); no d at the path's end.
+            d = order[np.minimum(j + 1, n - 1)]
+            has_d = j + 1 < n
+            delta = dist[a, c] - dist[a, b] + np.where(has_d, dist[b, d] - dist[c, d], 0.0)
+            k = int(delta.argmin())
+            if delta[k] < -1e-9:
+                order[i + 1:j[k] + 1] = order[i + 1:j[k] + 1][::-1]
+                improved = True
+    return order.tolist()
+
+
+def balanced_assignment(
+    points: np.ndarray, days: np.ndarray, allowed: np.ndarray, iterations: int = 20
+) -> np.ndarray:
+    """
+    Capacity-balanced k-means: each day keeps its number of points, starting
+    from the given assignment. `allowed[i, d]` says whether point i may go to day d.
+    """
+    n_days = allowed.shape[1]
+    capacity = np.bincount(days, minlength=n_days)
+    assignment = days.copy()
+    for _ in range(iterations):
+        centroids = np.array([
+            points[assignment == d].mean(axis=0) if capacity[d] else points.mean(axis=0) for d in range(n_days)
+        ])
+        cost = np.where(allowed, distance_matrix(points, centroids), np.inf)
+        # Greedy fill: cheapest (point, day) pairs first, while the day has room.
+        new = np.full(len(points), -1)
+        room = capacity.copy()
+        for flat in np.argsort(cost, axis=None, kind="stable"):
+            i, d = divmod(int(flat), n_days)
+            if new[i] == -1 and room[d] > 0 and np.isfinite(cost[i, d]):
+                new[i] = d
+                room[d] -= 1
+        # A point left without an allowed day with room stays where it was (capacities still balance).
+        if (new == -1).any() or (new == assignment).all():
+            break
+        assignment = new
+    return assignment
+
+
+def optimize_plan(plan: ItineraryPlan) -> Tuple[ItineraryPlan, RouteReport]:
+    """
+    Regroup and reorder the plan's stops by distance.
+
+    Returns:
+        (plan, report): a new plan (the input is not modified) and per-day
+        travel distances before and after.
+    """
+    report = RouteReport()
+    stops: List[_Stop] = []
+    for d, day in enumerate(plan.days):
+        for slot in SLOTS:
+            for index, text in enumerate(getattr(day, slot)):
+                place = resolve_place(text)
+                if place is None:
+                    report.unresolved += 1
+                else:
+                    stops.append(_Stop(d, slot, index, text, place))
+    report.resolved = len(stops)
+    n_days = len(plan.days)
+    before = _day_lists(stops, n_days)
+    km_before = [_route_km(day_stops) for day_stops in before]
+    if not stops:
+        report.days = [DayRoute(day.date, 0.0, 0.0) for day in plan.days]
+        return plan, report
+
+    points = np.array([(s.place.lat, s.place.lon) for s in stops])
+    days = np.array([s.day for s in stops])
+    cities = np.array([s.place.city for s in stops])
+    day_cities = [set(cities[days == d]) for d in range(n_days)]
+    allowed = np.array([[s.place.city in day_cities[d] for d in range(n_days)] for s in stops])
+
+    # Option A: same days, reordered. Option B: regrouped across days, then reordered.
+    kept = [_ordered(day_stops) for day_stops in before]
+    assignment = balanced_assignment(points, days, allowed)
+    regrouped = [_ordered([s for s, a in zip(stops, assignment) if a == d]) for d in range(n_days)]
+    km_kept = [_route_km(day_stops) for day_stops in kept]
+    km_regrouped = [_route_km(day_stops) for day_stops in regrouped]
+    if sum(km_regrouped) < sum(km_kept) - 1e-6:
+        after, km_after = regrouped, km_regrouped
+        report.moved = int((assignment != days).sum())
+    else:
+        after, km_after = kept, km_kept
+
+    new_plan = plan.model_copy(deep=True)
+    for d, day in enumerate(new_plan.days):
+        if not report.moved and km_after[d] >= km_before[d] - 1e-6:
+            # Nothing gained on this day: keep the planner's order.
+            km_after[d] = km_before[d]
+        elif [s.text for s in after[d]] != [s.text for s in before[d]]:
+            _write_day(day, before[d], after[d])
+            report.reordered_days += 1
+            if sorted(s.text for s in after[d]) != sorted(s.text for s in before[d]):
+                day.summary = _summary(after[d])
+                report.regrouped_days.append(day.date)
+        report.days.append(DayRoute(day.date, round(km_before[d], 2), round(km_after[d], 2)))
+    return new_plan, report
+
+
+def _day_lists(stops: List[_Stop], n_days: int) -> List[List[_Stop]]:
+    days: List[List[_Stop]] = [[] for _ in range(n_days)]
+    for stop in stops:
+        days[stop.day].append(stop)
+    return days
+
+
+def _route_km(stops: List[_Stop]) -> float:
+    if len(stops) < 2:
+        return 0.0
+    points = np.array([(s.place.lat, s.place.lon) for s in stops])
+    return path_length(distance_matrix(points), range(len(stops)))
+
+
+def _ordered(stops: List[_Stop]) -> List[_Stop]:
+    if len(stops) < 3:
+        return stops
+    points = np.array([(s.place.lat, s.place.lon) for s in stops])
+    order = shortest_path(distance_matrix(points))
+    ordered = [stops[i] for i in order]
+    # A path can be walked either way; keep the direction that leaves more stops in their original slot.
+    def kept_slots(seq: List[_Stop]) -> int:
+        return sum(a.slot == b.slot and a.day == b.day for a, b in zip(seq, stops))
+    return ordered if kept_slots(ordered) >= kept_slots(ordered[::-1]) else ordered[::-1]
+
+
+def _summary(stops: List[_Stop]) -> str:
+    """A one-sentence summary naming the day's sights in visiting order (days keep their stop count, so never empty)."""
+    names = list(dict.fromkeys(s.place.name for s in stops))
+    listed = names[0] if len(names) == 1 else "، ".join(names[:-1]) + " و " + names[-1]
+    return f"بازدید از {listed}."
+
+
+def _write_day(day, original: List[_Stop], new: List[_Stop]) -> None:
+    """
+    Put `new` into the day's slots: each slot keeps its number of known stops
+    and every unknown stop (meals, hotel, ...) keeps its position.
+    """
+    queue = iter(new)
+    positions: Dict[str, List[int]] = {slot: [] for slot in SLOTS}
+    for stop in original:
+        positions[stop.slot].append(stop.index)
+    for slot in SLOTS:
+        items = list(getattr(day, slot))
+        for index in positions[slot]:
+            items[index] = next(queue).text
+        setattr(day, slot, items)
@@ -0,0 +1,218 @@
+"""
+Lightweight per-run instrumentation.
+
+Two surfaces:
+  * `RunRecorder` — spans (wall time + attributes) and counters for a single
+    run, exported as structured JSON (`to_dict`, or one file per run in
+    TELEMETRY_DIR).
+  * `metrics` — process-wide counters and histograms aggregated across runs,
+    rendered in Prometheus text format for scraping (`render_prometheus`).
+
+The active recorder lives in a context variable, so deep call sites
+(`web_search`, `validate_json_with_model`) can record without plumbing; tasks
+spawned inside a run inherit it. With TELEMETRY_ENABLED=false every entry
+point short-circuits to a shared no-op object.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from config.settings import get_app_config
+
+# Histogram buckets in seconds (model calls and searches range from ms to minutes)
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """
+    Nearest-rank percentile (0 for an empty sequence).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Metrics:
+    """
+    Process-wide counters and histograms keyed by (name, sorted labels).
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], List[float]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            # [bucket counts..., +Inf count, sum]
+            hist = self._histograms.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[i] += 1
+            hist[-2] += 1
+            hist[-1] += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "counters": {_series(n, l): v for (n, l), v in self._counters.items()},
+                "histograms": {
+                    _series(n, l): {"count": h[-2], "sum": h[-1]} for (n, l), h in self._histograms.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{_series(name, labels)} {value}")
+            for (name, labels), hist in sorted(self._histograms.items()):
+                for bound, count in zip(self.buckets, hist):
+                    lines.append(f"{_series(name + '_bucket', labels + (('le', bound),))} {count}")
+                lines.append(f"{_series(name + '_bucket', labels + (('le', '+Inf'),))} {hist[-2]}")
+                lines.append(f"{_series(name + '_count', labels)} {hist[-2]}")
+                lines.append(f"{_series(name + '_sum', labels)} {hist[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _series(name: str, labels: Tuple) -> str:
+    if not labels:
+        return name
+    inner = ",".join(f'{k}="{v}"' for k, v in labels)
+    return f"{name}{{{inner}}}"
+
+
+metrics = Metrics()
+
+
+class RunRecorder:
+    """
+    Collects spans and counters for one pipeline run.
+    """
+
+    enabled = True
+
+    def __init__(self, run_id: Optional[str] = None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self.counters: Dict[str, float] = {}
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Time a block. The yielded dict can be updated with attributes known only
+        at the end (tokens, outcome, ...). Durations also feed the
+        `travel_span_seconds` histogram.
+        """
+        record: Dict[str, Any] = {"name": name, "start_s": round(time.perf_counter() - self._t0, 6), **attrs}
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as e:
+            record["error"] = type(e).__name__
+            raise
+        finally:
+            record["duration_s"] = round(time.perf_counter() - started, 6)
+            self.spans.append(record)
+            metrics.observe("travel_span_seconds", record["duration_s"], span=name)
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _series(name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+        metrics.inc(name, value, **labels)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at,
+            "duration_s": round(time.perf_counter() - self._t0, 6),
+            "spans": self.spans,
+            "counters": self.counters,
+        }
+
+    def export(self, directory: str) -> str:
+        """
+        Write this run as `<directory>/<run_id>.json` and return the path.
+        """
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.run_id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2, default=str)
+        return path
+
+
+class _NoopRecorder:
+    """Shared recorder used when telemetry is disabled or outside a run."""
+
+    enabled = False
+    run_id = ""
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Dict[str, Any]]:
+        yield {}
+
+    def count(self, name: str, value: float = 1, **labels: Any) -> None:
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {}
+
+    def export(self, directory: str) -> str:
+        return ""
+
+
+NOOP = _NoopRecorder()
+_current: ContextVar[Any] = ContextVar("travel_run_recorder", default=NOOP)
+
+
+def start_run(run_id: Optional[str] = None):
+    """
+    Create a recorder for a new run and make it current. Returns (recorder, token)
+    — pass the token to `end_run`.
+    """
+    recorder = RunRecorder(run_id) if get_app_config().TELEMETRY_ENABLED else NOOP
+    return recorder, _current.set(recorder)
+
+
+def end_run(recorder, token) -> None:
+    """
+    Restore the previous recorder and export the run if TELEMETRY_DIR is set.
+    """
+    try:
+        _current.reset(token)
+    except ValueError:
+        # Finalized from another context (e.g. an abandoned stream closed by GC).
+        _current.set(NOOP)
+    if recorder.enabled:
+        metrics.inc("travel_runs_total")
+        directory = get_app_config().TELEMETRY_DIR
+        if directory:
+            recorder.export(directory)
+
+
+def current() -> Any:
+    """
+    The recorder of the active run (a no-op recorder outside runs).
+    """
+    return _current.get()
@@ -0,0 +1,51 @@
+import re
+import unicodedata
+
+# Arabic code points commonly typed in place of their Persian counterparts
+_CHAR_MAP = str.maketrans({
+    "ي": "ی",
+    "ى": "ی",
+    "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه",
+    "ۀ": "ه",
+    "أ": "ا",
+    "إ": "ا",
+    "ٱ": "ا",
+    "ؤ": "و",
+    "\u200c": " ",  # zero-width non-joiner
+    "\u200d": "",   # zero-width joiner
+    "\u0640": "",   # tatweel
+})
+
+# Persian (U+06F0..) and Arabic-Indic (U+0660..) digits → ASCII
+_DIGIT_MAP = str.maketrans(
+    "۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩",
+    "01234567890123456789",
+)
+
+_DIACRITICS = re.compile("[\u064b-\u0652\u0670]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def to_ascii_digits(text: str) -> str:
+    """
+    Convert Persian and Arabic-Indic digits to ASCII digits.
+    """
+    return text.translate(_DIGIT_MAP)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Canonical form for Persian/English text used as a lookup key.
+
+    Applies NFKC, unifies Arabic/Persian letter variants (ي/ی, ك/ک, ...),
+    strips diacritics and tatweel, converts digits to ASCII, case-folds and
+    collapses whitespace.
+    """
+    text = unicodedata.normalize("NFKC", text or "")
+    text = text.translate(_CHAR_MAP)
+    text = to_ascii_digits(text)
+    text = _DIACRITICS.sub("", text)
+    text = text.casefold()
+    return _WHITESPACE.sub(" ", text).strip()
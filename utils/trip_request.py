@@ -0,0 +1,229 @@
+"""
+Deterministic pre-parsing of the user's trip request.
+
+Extracts what can be read off the request without a model: destination
+city, start/end dates (Jalali dates such as "11 شهریور 1404" or "1404/06/11"
+are converted to Gregorian), trip length and budget level. The pipeline
+hands the result to the researcher and planner as a short context message,
+so they don't spend reasoning tokens on calendar arithmetic and the plan's
+dates start from the requested day.
+"""
+import re
+from datetime import date, timedelta
+from typing import Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel
+
+from utils.jalali import JALALI_MONTHS, gregorian_to_jalali, jalali_to_gregorian
+from utils.text import normalize_text
+
+# Canonical city name → names as they appear in normalized requests
+CITIES: Dict[str, Tuple[str, ...]] = {
+    "تهران": ("تهران", "tehran"),
+    "اصفهان": ("اصفهان", "isfahan", "esfahan"),
+    "شیراز": ("شیراز", "shiraz"),
+    "یزد": ("یزد", "yazd"),
+    "کاشان": ("کاشان", "kashan"),
+    "تبریز": ("تبریز", "tabriz"),
+    "مشهد": ("مشهد", "mashhad"),
+    "همدان": ("همدان", "hamedan", "hamadan"),
+    "کرمان": ("کرمان", "kerman"),
+    "کرمانشاه": ("کرمانشاه", "kermanshah"),
+    "رشت": ("رشت", "rasht"),
+    "قشم": ("قشم", "qeshm"),
+    "کیش": ("کیش", "kish"),
+    "قزوین": ("قزوین", "qazvin"),
+    "زنجان": ("زنجان", "zanjan"),
+    "اردبیل": ("اردبیل", "ardabil"),
+    "ارومیه": ("ارومیه", "urmia"),
+    "سنندج": ("سنندج", "sanandaj"),
+    "خرم‌آباد": ("خرم آباد", "خرماباد", "khorramabad"),
+    "اهواز": ("اهواز", "ahvaz"),
+    "شوشتر": ("شوشتر", "shushtar"),
+    "بندرعباس": ("بندرعباس", "بندر عباس", "bandar abbas"),
+    "بوشهر": ("بوشهر", "bushehr"),
+    "گرگان": ("گرگان", "gorgan"),
+    "ساری": ("ساری", "sari"),
+    "رامسر": ("رامسر", "ramsar"),
+    "ماسوله": ("ماسوله", "masuleh"),
+    "قم": ("قم", "qom"),
+    "سمنان": ("سمنان", "semnan"),
+    "زاهدان": ("زاهدان", "zahedan"),
+}
+
+BudgetLevel = Literal["budget", "moderate", "luxury"]
+
+_BUDGET_WORDS: Dict[str, Tuple[str, ...]] = {
+    "budget": ("اقتصادی", "ارزان", "کم هزینه", "دانشجویی", "budget", "cheap"),
+    "moderate": ("متوسط", "معمولی", "moderate", "mid-range"),
+    "luxury": ("لوکس", "گران قیمت", "پنج ستاره", "luxury"),
+}
+
+_FA_UNITS = {"یک": 1, "دو": 2, "سه": 3, "چهار": 4, "پنج": 5, "شش": 6, "هفت": 7, "هشت": 8, "نه": 9}
+_EN_UNITS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9}
+_NUMBER_WORDS = {
+    **_FA_UNITS, "یه": 1, "ده": 10, "یازده": 11, "دوازده": 12, "سیزده": 13, "چهارده": 14, "پانزده": 15,
+    "پونزده": 15, "شانزده": 16, "هفده": 17, "هجده": 18, "هیجده": 18, "نوزده": 19, "بیست": 20, "سی": 30,
+    **_EN_UNITS, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14, "fifteen": 15,
+    "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19, "twenty": 20, "thirty": 30,
+    # "بیست و یک", "twenty-one"
+    **{f"بیست و {word}": 20 + n for word, n in _FA_UNITS.items()},
+    **{f"twenty{sep}{word}": 20 + n for word, n in _EN_UNITS.items() for sep in ("-", " ")},
+}
+
+_MONTH = "|".join(sorted(map(re.escape, JALALI_MONTHS), key=len, reverse=True))
+# Longest first, so "بیست و یک" is read as 21 rather than as "یک"
+_NUM = r"\d{1,2}|" + "|".join(map(re.escape, sorted(_NUMBER_WORDS, key=len, reverse=True)))
+# "11 تا 15 شهریور 1404"
+_JALALI_RANGE = re.compile(rf"(?<!\d)(\d{{1,2}})\s*(?:ام|م)?\s*(?:تا|الی|-|to)\s*(\d{{1,2}})\s*(?:ام|م)?\s*({_MONTH})(?:\s*(?:ماه|سال)?\s*(\d{{4}}))?(?!\w)")
+# "11 شهریور 1404", "۱۱ام شهریور ماه"
+_JALALI_NAMED = re.compile(rf"(?<!\d)(\d{{1,2}})\s*(?:ام|م)?\s*({_MONTH})(?:\s*(?:ماه|سال)?\s*(\d{{4}}))?(?!\w)")
+# "1404/06/11", "2025-09-02"
+_NUMERIC = re.compile(r"(?<!\d)(\d{4})[/\-.](\d{1,2})[/\-.](\d{1,2})(?!\d)")
+_DURATION = re.compile(rf"(?<!\w)({_NUM})\s*(روز|روزه|شب|day|days|night|nights)(?!\w)")
+# "دو هفته ای", "for two weeks", "a week"; a week without a count ("هفته آینده") is not a duration
+_WEEK = re.compile(rf"(?<!\w)({_NUM}|a|an)\s*(?:هفته ها|هفته|weeks|week)(?!\w)")
+
+
+class TripRequest(BaseModel):
+    """What the pre-parser could read off the request; unknown fields stay None."""
+    destination: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    duration_days: Optional[int] = None
+    budget_level: Optional[BudgetLevel] = None
+    # The date as the user wrote it, e.g. "11 شهریور 1404"
+    date_text: Optional[str] = None
+
+    def is_empty(self) -> bool:
+        return not any(v is not None for v in self.model_dump().values())
+
+    def to_prompt(self) -> str:
+        """
+        Context message for the agents ("" when nothing was recognized).
+        """
+        if self.is_empty():
+            return ""
+        lines = ["PARSED TRIP REQUEST (extracted from the user's message; dates are already in Gregorian YYYY-MM-DD, use them as-is):"]
+        if self.destination:
+            lines.append(f"- destination: {self.destination}")
+        if self.start_date:
+            jy, jm, jd = gregorian_to_jalali(self.start_date)
+            lines.append(f"- start_date: {self.start_date.isoformat()} (Jalali {jy:04d}/{jm:02d}/{jd:02d})")
+        if self.end_date:
+            lines.append(f"- end_date: {self.end_date.isoformat()}")
+        if self.duration_days:
+            lines.append(f"- duration_days: {self.duration_days}")
+        if self.budget_level:
+            lines.append(f"- budget_level: {self.budget_level}")
+        return "\n".join(lines)
+
+
+def parse_trip_request(text: str, today: Optional[date] = None) -> TripRequest:
+    """
+    Parse a free-text (Persian or English) trip request.
+
+    Args:
+        text: The user's request.
+        today: Reference date for dates given without a year (defaults to
+            today); such dates resolve to their next occurrence.
+    """
+    today = today or date.today()
+    normalized = normalize_text(text)
+    request = TripRequest(destination=_find_destination(normalized), budget_level=_find_budget(normalized))
+
+    dates = _find_dates(normalized, today)
+    if dates:
+        request.date_text = dates[0][1]
+        request.start_date = dates[0][0]
+        later = [d for d, _ in dates[1:] if d > request.start_date]
+        if later:
+            request.end_date = later[0]
+
+    request.duration_days = _find_duration(normalized)
+    # Explicit dates are more precise than "a week"
+    if request.start_date and request.end_date:
+        request.duration_days = (request.end_date - request.start_date).days + 1
+    elif request.start_date and request.duration_days:
+        request.end_date = request.start_date + timedelta(days=request.duration_days - 1)
+    return request
+
+
+def _find_destination(text: str) -> Optional[str]:
+    best: Optional[Tuple[int, int, str]] = None
+    for city, names in CITIES.items():
+        for name in names:
+            match = re.search(rf"(?<!\w){re.escape(name)}(?!\w)", text)
+            # Earliest mention wins; the longer name on a tie (کرمانشاه over کرمان)
+            if match and (best is None or (match.start(), -len(name)) < best[:2]):
+                best = (match.start(), -len(name), city)
+    return best[2] if best else None
+
+
+def _find_budget(text: str) -> Optional[BudgetLevel]:
+    for level, words in _BUDGET_WORDS.items():
+        if any(re.search(rf"(?<!\w){re.escape(word)}(?!\w)", text) for word in words):
+            return level
+    return None
+
+
+def _find_dates(text: str, today: date) -> List[Tuple[date, str]]:
+    """All recognized dates as (gregorian, original text), in order of appearance."""
+    found: List[Tuple[int, date, str]] = []
+    taken: List[Tuple[int, int]] = []
+
+    def add(match: re.Match, *days: Optional[date]) -> None:
+        start, end = match.span()
+        if None in days or any(s < end and start < e for s, e in taken):
+            return
+        taken.append((start, end))
+        found.extend((start, day, match.group(0)) for day in days)
+
+    for m in _JALALI_RANGE.finditer(text):
+        month, year = JALALI_MONTHS[m.group(3)], m.group(4)
+        add(m, _jalali(year, month, int(m.group(1)), today), _jalali(year, month, int(m.group(2)), today))
+    for m in _JALALI_NAMED.finditer(text):
+        add(m, _jalali(m.group(3), JALALI_MONTHS[m.group(2)], int(m.group(1)), today))
+    for m in _NUMERIC.finditer(text):
+        add(m, _numeric_date(*(int(g) for g in m.groups())))
+    # Stable sort keeps a range's start before its end
+    found.sort(key=lambda item: item[0])
+    return [(day, raw) for _, day, raw in found]
+
+
+def _jalali(year: Optional[str], month: int, day: int, today: date) -> Optional[date]:
+    try:
+        if year:
+            return jalali_to_gregorian(int(year), month, day)
+        # No year: the next occurrence of that day.
+        this_year = gregorian_to_jalali(today)[0]
+        candidate = jalali_to_gregorian(this_year, month, day)
+        return candidate if candidate >= today else jalali_to_gregorian(this_year + 1, month, day)
+    except ValueError:
+        return None
+
+
+def _numeric_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        # Years below 1700 can only be Jalali in a travel request.
+        return jalali_to_gregorian(year, month, day) if year < 1700 else date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _find_duration(text: str) -> Optional[int]:
+    match = _DURATION.search(text)
+    if match:
+        count = _count(match.group(1))
+        # "3 nights" is a 4-day trip
+        return count + 1 if match.group(2) in ("شب", "night", "nights") else count
+    match = _WEEK.search(text)
+    if match:
+        return 7 * _count(match.group(1))
+    return None
+
+
+def _count(word: str) -> int:
+    if word.isdigit():
+        return int(word)
+    return 1 if word in ("a", "an") else _NUMBER_WORDS[word]
@@ -1,41 +1,83 @@
 from autogen_agentchat.conditions import TextMentionTermination
-from config.settings import app_cfg
+from config.settings import get_app_config
+import asyncio
+import hashlib
 import json
 import os
+import re
+import tempfile
 from typing import Any
 
 # Termination conditions
 def get_termination_conditions():
     """
     Compose termination condition(s) for the chat.
-    Currently uses a text-mention stop word; combine with max_turns at team level.
+    Only the writer's messages are checked, so the stop word showing up inside
+    research or plan content cannot end a run early. Turn, token and time
+    limits are enforced by the pipeline itself.
     """
-    text_mention_termination = TextMentionTermination(app_cfg.TERMINATION_WORD)
+    text_mention_termination = TextMentionTermination(get_app_config().TERMINATION_WORD, sources=["writer"])
     return text_mention_termination
 
 # State persistence
-def save_state(agent, file_path: str):
+_SAFE_FILE_STEM = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def state_file_name(run_id: str) -> str:
+    """
+    File name for a caller-supplied run id: the id itself when it is a plain
+    [A-Za-z0-9_-] name, otherwise its SHA-256, so it can never leave the directory.
+    """
+    if _SAFE_FILE_STEM.fullmatch(run_id):
+        return f"{run_id}.json"
+    return f"{hashlib.sha256(run_id.encode('utf-8')).hexdigest()}.json"
+
+
+async def save_state(agent, file_path: str) -> bool:
     """
-    Persist agent state to a JSON file (best-effort).
+    Persist agent (or team) state to a JSON file (best-effort).
+    The file is replaced atomically, so a crash mid-write never leaves a torn file.
     """
     try:
-        state: Any = agent.save_state()
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2, default=str)
+        state: Any = await agent.save_state()
+        await asyncio.to_thread(_write_json_atomic, file_path, state)
+        return True
     except Exception as e:
         print(f"[WARN] Failed to save state: {e}")
+        return False
+
+
+def _write_json_atomic(file_path: str, data: Any) -> None:
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 # State loading
-def load_state(agent, file_path: str):
+async def load_state(agent, file_path: str) -> bool:
     """
-    Load agent state from a JSON file (best-effort).
+    Load agent (or team) state from a JSON file (best-effort).
+    Returns True if a state was found and loaded.
     """
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            state = json.load(f)
-        agent.load_state(state)
+        state = await asyncio.to_thread(_read_json, file_path)
+        await agent.load_state(state)
+        return True
     except FileNotFoundError:
-        return
+        return False
     except Exception as e:
-        print(f"[WARN] Failed to load state: {e}")
\ No newline at end of file
+        print(f"[WARN] Failed to load state: {e}")
+        return False
+
+
+def _read_json(file_path: str) -> Any:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
\ No newline at end of file
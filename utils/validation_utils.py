@@ -1,35 +1,222 @@
 import json
-from typing import Type
+import logging
+from typing import Dict, List, Optional, Tuple, Type, TypeVar, get_args, get_origin
 from pydantic import BaseModel, ValidationError
 
-def validate_json_with_model(json_string: str, model: Type[BaseModel]) -> str:
+from utils import telemetry
+from utils.json_repair import load_repaired, reconcile_plan_total
+from utils.json_stream import JSONScanner, find_json_object
+
+logger = logging.getLogger(__name__)
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def extract_json(content: str) -> str:
     """
-    Validates a JSON string against a given Pydantic model.
+    Extracts the JSON payload from an agent message: the first complete
+    top-level object, wherever it sits (markdown code blocks, prose around it).
+    Linear time, unlike a greedy regex over the whole message.
+
+    Args:
+        content: The raw message content.
+
+    Returns:
+        The JSON part of the message (or the stripped content if no complete object is found).
+    """
+    content = (content or "").strip()
+    span = find_json_object(content)
+    if span:
+        return content[span[0]:span[1]]
+    return content
+
+
+def parse_json_with_model(json_string: str, model: Type[M], repair: bool = True) -> Tuple[Optional[M], str]:
+    """
+    Parses and validates a JSON string against a given Pydantic model,
+    recording the outcome in the active run's telemetry.
+
+    When strict parsing fails and `repair` is set, safe local fixes (see
+    utils/json_repair.py) are applied and the result re-validated, so only
+    genuinely wrong output costs another model call. A plan whose total doesn't
+    match its days is schema-valid, so its total is reconciled after strict
+    parsing as well.
 
     Args:
         json_string: The string content from an agent's message, expected to be JSON.
         model: The Pydantic model class to validate against (e.g., ResearchReport).
+        repair: Try local repair before reporting a failure.
 
     Returns:
-        A string indicating success or detailing the validation failure.
+        (instance, verdict): the validated model instance (None on failure) and a
+        string indicating success or detailing the validation failure.
+    """
+    recorder = telemetry.current()
+    with recorder.span("validate", schema=model.__name__) as span:
+        instance, verdict = _parse_json_with_model(json_string, model)
+        outcome = "success" if instance is not None else "failure"
+        if instance is None and repair:
+            instance, verdict, fixes = _repair_and_parse(json_string, model, verdict)
+            if instance is not None:
+                outcome = "repaired"
+                span["fixes"] = fixes
+        elif instance is not None and repair:
+            instance, fixes = reconcile_plan_total(instance)
+            if fixes:
+                logger.info(f"Repaired {model.__name__} locally: {'; '.join(fixes)}")
+                outcome = "repaired"
+                span["fixes"] = fixes
+                verdict = (
+                    f"VALIDATION_SUCCESS: The JSON conforms to the {model.__name__} schema after {len(fixes)} local fix(es)."
+                )
+        span["outcome"] = outcome
+    recorder.count("travel_validations_total", schema=model.__name__, outcome=outcome)
+    return instance, verdict
+
+
+def _parse_json_with_model(json_string: str, model: Type[M]) -> Tuple[Optional[M], str]:
+    """
+    Parses and validates a JSON string against a given Pydantic model.
+
+    Args:
+        json_string: The string content from an agent's message, expected to be JSON.
+        model: The Pydantic model class to validate against (e.g., ResearchReport).
+
+    Returns:
+        (instance, verdict): the validated model instance (None on failure) and a
+        string indicating success or detailing the validation failure.
     """
     try:
         # Attempt to parse the string and validate it against the model's schema.
         # This single line is where Pydantic does its magic.
-        model.model_validate_json(json_string)
-        
+        instance = model.model_validate_json(json_string)
+
         # If the line above doesn't raise an error, the JSON is valid.
-        return f"VALIDATION_SUCCESS: The JSON is valid and conforms to the {model.__name__} schema."
+        return instance, f"VALIDATION_SUCCESS: The JSON is valid and conforms to the {model.__name__} schema."
 
     except ValidationError as e:
         # This error means the JSON was valid, but its structure or data types
         # did not match the Pydantic model's definition.
-        return f"VALIDATION_FAILURE: The JSON structure is invalid. Errors:\n{e}"
-        
+        return None, format_validation_failure(e)
+
     except json.JSONDecodeError as e:
         # This error means the string provided was not even a valid JSON.
-        return f"VALIDATION_FAILURE: The message content is not a valid JSON string. Error: {e}"
+        return None, f"VALIDATION_FAILURE: The message content is not a valid JSON string. Error: {e}"
 
     except Exception as e:
         # Catch any other unexpected errors.
-        return f"VALIDATION_FAILURE: An unexpected error occurred during validation. Error: {e}"
\ No newline at end of file
+        return None, f"VALIDATION_FAILURE: An unexpected error occurred during validation. Error: {e}"
+
+
+def _repair_and_parse(json_string: str, model: Type[M], verdict: str) -> Tuple[Optional[M], str, List[str]]:
+    """
+    Re-validates after local repair. Returns (instance, verdict, fixes); keeps the
+    original verdict if the text is still not JSON.
+    """
+    data, fixes = load_repaired(json_string, model)
+    if data is None:
+        return None, verdict, fixes
+    try:
+        instance = model.model_validate(data)
+    except ValidationError as e:
+        return None, format_validation_failure(e), fixes
+    logger.info(f"Repaired {model.__name__} locally: {'; '.join(fixes)}")
+    return instance, (
+        f"VALIDATION_SUCCESS: The JSON conforms to the {model.__name__} schema after {len(fixes)} local fix(es)."
+    ), fixes
+
+
+def format_validation_failure(error: ValidationError, prefix: str = "") -> str:
+    """
+    A short correction request naming only the failing fields, e.g.
+    "- days.0.est_cost_toman: Input should be a valid integer (got 'about 1M')".
+    `prefix` is prepended to each field path (for errors in a nested item).
+    """
+    lines = []
+    for err in error.errors():
+        parts = ([prefix] if prefix else []) + [str(part) for part in err["loc"]]
+        location = ".".join(parts) or "(root)"
+        line = f"- {location}: {err['msg']}"
+        if err["type"] != "missing":
+            line += f" (got {str(err.get('input'))[:60]!r})"
+        lines.append(line)
+    return (
+        "VALIDATION_FAILURE: Fix only these fields and resend the complete JSON, "
+        "keeping everything else unchanged:\n" + "\n".join(lines)
+    )
+
+
+def validate_json_with_model(json_string: str, model: Type[BaseModel]) -> str:
+    """
+    Validates a JSON string against a given Pydantic model.
+
+    Args:
+        json_string: The string content from an agent's message, expected to be JSON.
+        model: The Pydantic model class to validate against (e.g., ResearchReport).
+
+    Returns:
+        A string indicating success or detailing the validation failure.
+    """
+    return parse_json_with_model(json_string, model)[1]
+
+
+class StreamingValidator:
+    """
+    Validates streamed JSON output item by item, while it is being generated.
+
+    Each element of the model's list-of-model fields (`ResearchReport.findings`,
+    `ItineraryPlan.days`) is checked against its own schema as soon as its
+    closing brace arrives. Violations that local repair can fix are let
+    through; the first one it can't is returned, so the caller can stop the
+    generation instead of paying for the rest of it.
+
+    Args:
+        model: The top-level schema (e.g., ItineraryPlan).
+    """
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.item_models: Dict[str, Type[BaseModel]] = _list_item_models(model)
+        self.scanner = JSONScanner()
+        self.items_checked = 0
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Consume the next streamed chunk. Returns a VALIDATION_FAILURE verdict on
+        the first unrecoverable item, otherwise None.
+        """
+        for path, raw in self.scanner.feed(chunk):
+            if len(path) == 2 and path[0] in self.item_models and isinstance(path[1], int):
+                self.items_checked += 1
+                error = self._check(self.item_models[path[0]], raw, f"{path[0]}.{path[1]}")
+                if error:
+                    return error
+        return None
+
+    @staticmethod
+    def _check(item_model: Type[BaseModel], raw: str, location: str) -> Optional[str]:
+        try:
+            item_model.model_validate_json(raw)
+            return None
+        except ValidationError as e:
+            error = e
+        data, _ = load_repaired(raw, item_model)
+        if data is not None:
+            try:
+                item_model.model_validate(data)
+                return None
+            except ValidationError as e:
+                error = e
+        return format_validation_failure(error, prefix=location).replace(
+            "VALIDATION_FAILURE:", "VALIDATION_FAILURE: Your output was stopped early.", 1
+        )
+
+
+def _list_item_models(model: Type[BaseModel]) -> Dict[str, Type[BaseModel]]:
+    """Top-level fields of `model` typed List[SomeModel], mapped to SomeModel."""
+    items = {}
+    for name, field in model.model_fields.items():
+        args = get_args(field.annotation)
+        if get_origin(field.annotation) is list and args and isinstance(args[0], type) and issubclass(args[0], BaseModel):
+            items[name] = args[0]
+    return items